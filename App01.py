@@ -3,6 +3,7 @@ import pandas as pd
 from io import BytesIO
 from docx import Document
 from datetime import datetime
+from data_access2 import get_data, buscar_por_cuv
 
 
 def generar_informe_en_word(df_filtrado: pd.DataFrame) -> BytesIO:
@@ -59,7 +60,7 @@ def main():
         "2PACX-1vTPdZTyxM6BDLmnlqe246tfBm7H06vXBdQKruh2mPg-rhQSD8olCS30ej4BdtJ1R__3W6K-Va3hm5Ax/"
         "pub?output=csv"
     )
-    df = pd.read_csv(csv_url)
+    df = get_data(csv_url)
 
     # Para diagnosticar nombres de columna
     st.write("Columnas detectadas:", df.columns.tolist())
@@ -71,10 +72,9 @@ def main():
     # 2) Input y botón para filtrar
     input_cuv = st.text_input("Ingresa el CUV:")
     if st.button("Buscar"):
-        # Normalizamos la columna 'CUV' y filtramos
-        df["CUV"] = df["CUV"].astype(str).str.strip()
+        # Búsqueda O(1) sobre el índice de CUV normalizado (se construye una vez por versión de la hoja)
         input_cuv_str = str(input_cuv).strip()
-        st.session_state["df_filtrado"] = df[df["CUV"] == input_cuv_str]
+        st.session_state["df_filtrado"] = buscar_por_cuv(csv_url, input_cuv_str)
 
     # 3) Si tenemos datos filtrados en session_state, los mostramos
     if not st.session_state["df_filtrado"].empty:
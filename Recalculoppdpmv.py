@@ -1,6 +1,13 @@
 import os
+import sys
+import time
 import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
 import pyodbc
+import calentamiento
 from pythermalcomfort.models import pmv_ppd_iso  # Asegúrate de tener instalada la librería correspondiente
 
 # Configuración de la base de datos utilizando variables de entorno
@@ -10,6 +17,9 @@ username = os.getenv('DB_USERNAME', 'usr_ept_modprev')
 password = os.getenv('DB_PASSWORD', 'C(Q5N:6+5sIt')
 driver = '{ODBC Driver 17 for SQL Server}'
 
+# Filas por UPDATE en lote (executemany) y por commit en el recálculo particionado
+RECALCULO_LOTE = int(os.getenv('RECALCULO_LOTE', '1000'))
+
 # Configuración básica de logging (ajústalo según tus necesidades)
 logging.basicConfig(level=logging.INFO)
 
@@ -93,5 +103,197 @@ def actualizar_pmv_ppd():
         except Exception:
             pass
 
+def rangos_id(n_particiones: int, tabla: str = "higiene_mediciones") -> list:
+    """
+    Divide la tabla en 'n_particiones' rangos contiguos de id_medicion [desde, hasta] con una
+    cantidad de filas similar (los id pueden tener huecos, por eso no se divide MIN..MAX en partes iguales).
+    Los límites salen de una sola consulta con NTILE, que recorre el índice de id_medicion una vez.
+    """
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"""
+            SELECT particion, MIN(id_medicion), MAX(id_medicion)
+            FROM (
+                SELECT id_medicion, NTILE(?) OVER (ORDER BY id_medicion) AS particion
+                FROM {tabla}
+            ) AS t
+            GROUP BY particion
+            ORDER BY particion
+            """,
+            (max(1, n_particiones),),
+        )
+        particiones = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+
+    if not particiones:
+        return []
+    # Rangos contiguos: cada uno llega hasta el id anterior al primero del siguiente
+    inicios = [fila[1] for fila in particiones]
+    finales = [inicio - 1 for inicio in inicios[1:]] + [particiones[-1][2]]
+    return list(zip(inicios, finales))
+
+
+def _calcular_pmv_ppd(filas):
+    """
+    PMV/PPD de un bloque de filas (id_medicion, t_bul_seco, t_globo, vel_air, hum_rel, met, clo) en
+    una sola llamada vectorizada. Retorna [(pmv, ppd, id_medicion)] listo para el UPDATE; las filas
+    con algún dato faltante se omiten.
+    """
+    if not filas:
+        return []
+    datos = np.array([tuple(f) for f in filas], dtype=float)
+    completas = ~np.isnan(datos[:, 1:]).any(axis=1)
+    datos = datos[completas]
+    if not len(datos):
+        return []
+    resultados = pmv_ppd_iso(
+        tdb=datos[:, 1],
+        tr=datos[:, 2],
+        vr=datos[:, 3],
+        rh=datos[:, 4],
+        met=datos[:, 5],
+        clo=datos[:, 6],
+        model="7730-2005",
+        limit_inputs=False,
+        round_output=True
+    )
+    pmv = np.atleast_1d(resultados.pmv)
+    ppd = np.atleast_1d(resultados.ppd)
+    ids = [int(f[0]) for f, completa in zip(filas, completas) if completa]
+    return [(float(a), float(b), i) for a, b, i in zip(pmv, ppd, ids)]
+
+
+def recalcular_rango(desde: int, hasta: int, tabla: str = "higiene_mediciones", lote: int = None) -> dict:
+    """
+    Recalcula pmv y ppd de las filas con id_medicion entre 'desde' y 'hasta' (inclusive) con su propia
+    conexión. Lee y escribe en bloques de 'lote' filas: un UPDATE con executemany y un commit por bloque.
+    Cada bloque se lee por paginación de clave (id_medicion > último leído) y se consume completo antes
+    del UPDATE, porque sin MARS la conexión no admite escribir con un resultado de lectura pendiente.
+    Retorna {"desde", "hasta", "filas", "omitidas", "segundos", "filas_por_segundo", "pid"}.
+    """
+    lote = lote or RECALCULO_LOTE
+    inicio = time.perf_counter()
+    leidas = actualizadas = 0
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        if hasattr(cursor, "fast_executemany"):
+            # pyodbc envía cada bloque como un solo arreglo de parámetros
+            cursor.fast_executemany = True
+        ultimo = desde - 1
+        while True:
+            cursor.execute(
+                f"""
+                SELECT id_medicion, t_bul_seco, t_globo, vel_air, hum_rel, met, clo
+                FROM {tabla}
+                WHERE id_medicion > ? AND id_medicion <= ?
+                ORDER BY id_medicion
+                OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
+                """,
+                (ultimo, hasta, lote),
+            )
+            filas = cursor.fetchall()
+            if not filas:
+                break
+            ultimo = filas[-1][0]
+            leidas += len(filas)
+            valores = _calcular_pmv_ppd(filas)
+            if valores:
+                cursor.executemany(f"UPDATE {tabla} SET pmv = ?, ppd = ? WHERE id_medicion = ?", valores)
+                connection.commit()
+            actualizadas += len(valores)
+        cursor.close()
+    finally:
+        connection.close()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "filas": actualizadas,
+        "omitidas": leidas - actualizadas,
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(actualizadas / segundos, 1) if segundos else 0.0,
+        "pid": os.getpid(),
+    }
+
+
+def actualizar_pmv_ppd_particionado(workers: int = None, particiones: int = None,
+                                    tabla: str = "higiene_mediciones", lote: int = None) -> dict:
+    """
+    Recalcula pmv y ppd de toda la tabla repartiéndola por rangos de id_medicion entre 'workers'
+    procesos, cada uno con su propia conexión. Por defecto se crean 4 particiones por proceso para
+    que un rango más lento no deje a los demás procesos sin trabajo al final.
+    Registra y retorna las filas por segundo de cada partición, de cada proceso y del total.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    inicio = time.perf_counter()
+    rangos = rangos_id(particiones or workers * 4, tabla)
+    logging.info(f"Recálculo particionado: {len(rangos)} rangos de id_medicion en {workers} procesos.")
+
+    resultados, errores = [], []
+    with ProcessPoolExecutor(max_workers=workers, initializer=calentamiento.calentar_pmv) as executor:
+        futuros = {executor.submit(recalcular_rango, desde, hasta, tabla, lote): (desde, hasta)
+                   for desde, hasta in rangos}
+        for futuro in as_completed(futuros):
+            desde, hasta = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                logging.error(f"Rango {desde}-{hasta}: {e}")
+                errores.append({"desde": desde, "hasta": hasta, "error": str(e)})
+                continue
+            resultados.append(resultado)
+            logging.info(f"Rango {desde}-{hasta}: {resultado['filas']} filas en {resultado['segundos']} s "
+                         f"({resultado['filas_por_segundo']} filas/s, pid {resultado['pid']}).")
+
+    por_proceso = {}
+    for r in resultados:
+        acumulado = por_proceso.setdefault(r["pid"], {"filas": 0, "segundos": 0.0})
+        acumulado["filas"] += r["filas"]
+        acumulado["segundos"] += r["segundos"]
+    for acumulado in por_proceso.values():
+        acumulado["segundos"] = round(acumulado["segundos"], 3)
+        acumulado["filas_por_segundo"] = round(acumulado["filas"] / acumulado["segundos"], 1) if acumulado["segundos"] else 0.0
+
+    segundos = time.perf_counter() - inicio
+    total = sum(r["filas"] for r in resultados)
+    resumen = {
+        "workers": workers,
+        "particiones": len(rangos),
+        "filas": total,
+        "omitidas": sum(r["omitidas"] for r in resultados),
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(total / segundos, 1) if segundos else 0.0,
+        "por_proceso": por_proceso,
+        "errores": errores,
+    }
+    logging.info(f"Recálculo particionado completado: {total} filas en {resumen['segundos']} s "
+                 f"({resumen['filas_por_segundo']} filas/s) con {workers} procesos.")
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recálculo de PMV/PPD de las mediciones.")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Procesos para el recálculo particionado por rangos de id_medicion "
+                             "(0 = recálculo secuencial original)")
+    parser.add_argument("--particiones", type=int, help="Rangos de id_medicion (por defecto 4 por proceso)")
+    parser.add_argument("--lote", type=int, default=RECALCULO_LOTE, help="Filas por UPDATE en lote y por commit")
+    parser.add_argument("--tabla", default="higiene_mediciones", help="Tabla de mediciones a recalcular")
+    args = parser.parse_args(argv)
+
+    calentamiento.calentar_pmv()
+    if args.workers <= 0:
+        actualizar_pmv_ppd()
+        return 0
+    resumen = actualizar_pmv_ppd_particionado(args.workers, args.particiones, args.tabla, args.lote)
+    return 1 if resumen["errores"] else 0
+
+
 if __name__ == '__main__':
-    actualizar_pmv_ppd()
+    sys.exit(main())
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Almacén local de visitas y mediciones para trabajar sin conexión estable.
+
+El formulario (form.py) guarda cada visita, sus mediciones y la verificación final en una base
+SQLite local (LOCAL_STORE_DB), lo que es inmediato aunque la red esté lenta o caída. Un hilo de
+sincronización envía lo pendiente a SQL Server por lotes, con reintentos y espera creciente,
+y registra los id asignados por el servidor (id_visita, id_medicion) junto a los id locales.
+
+Cada visita y medición lleva un guid_envio generado al guardarla, que el servidor usa para no
+insertarla dos veces (migración 003): si un envío llega a SQL Server pero la respuesta se pierde,
+el reintento devuelve el id ya asignado. Varios procesos pueden sincronizar la misma base local:
+cada uno reserva las visitas que va a enviar (BEGIN IMMEDIATE y un plazo en reservado_hasta).
+
+El sincronizador se inicia con iniciar_sincronizador() (una vez por proceso) o como proceso
+independiente:
+
+    python almacen_local.py
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import socket
+import argparse
+import threading
+import uuid
+from datetime import datetime
+
+LOCAL_STORE_DB = os.getenv('LOCAL_STORE_DB', os.path.join('.cache', 'pendientes.sqlite3'))
+# Segundos entre rondas de sincronización y tope de la espera entre reintentos
+SYNC_INTERVALO = float(os.getenv('SYNC_INTERVALO', '5'))
+SYNC_ESPERA_MAX = float(os.getenv('SYNC_ESPERA_MAX', '300'))
+# Segundos que una visita queda reservada por el proceso que la envía (se renueva por visita)
+SYNC_RESERVA = float(os.getenv('SYNC_RESERVA', '300'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS visitas_locales (
+    id_local INTEGER PRIMARY KEY AUTOINCREMENT,
+    cuv TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    id_remoto INTEGER,
+    verif_final TEXT,
+    verif_sincronizada INTEGER NOT NULL DEFAULT 0,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento REAL NOT NULL DEFAULT 0,
+    ultimo_error TEXT,
+    creado TEXT NOT NULL,
+    guid_envio TEXT,
+    reservado_por TEXT,
+    reservado_hasta REAL
+);
+CREATE TABLE IF NOT EXISTS mediciones_locales (
+    id_local INTEGER PRIMARY KEY AUTOINCREMENT,
+    visita_local INTEGER NOT NULL REFERENCES visitas_locales (id_local),
+    datos TEXT NOT NULL,
+    id_remoto INTEGER,
+    creado TEXT NOT NULL,
+    guid_envio TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_mediciones_locales_visita ON mediciones_locales (visita_local, id_remoto);
+"""
+
+# Columnas agregadas después de la primera versión del almacén: (tabla, columna, tipo)
+_COLUMNAS_AGREGADAS = [
+    ("visitas_locales", "guid_envio", "TEXT"),
+    ("visitas_locales", "reservado_por", "TEXT"),
+    ("visitas_locales", "reservado_hasta", "REAL"),
+    ("mediciones_locales", "guid_envio", "TEXT"),
+]
+
+_sincronizador = {"hilo": None}
+_sincronizador_lock = threading.Lock()
+# Evita que el hilo de fondo y una sincronización forzada envíen lo mismo a la vez
+_envio_lock = threading.Lock()
+
+
+def _conexion() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(LOCAL_STORE_DB) or ".", exist_ok=True)
+    connection = sqlite3.connect(LOCAL_STORE_DB, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=FULL")
+    connection.executescript(_SCHEMA)
+    _actualizar_esquema(connection)
+    return connection
+
+
+def _actualizar_esquema(connection):
+    """Agrega las columnas nuevas a un almacén creado por una versión anterior y asigna guid_envio."""
+    for tabla, columna, tipo in _COLUMNAS_AGREGADAS:
+        existentes = {fila["name"] for fila in connection.execute(f"PRAGMA table_info({tabla})")}
+        if columna not in existentes:
+            connection.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+    for tabla in ("visitas_locales", "mediciones_locales"):
+        sin_guid = connection.execute(f"SELECT id_local FROM {tabla} WHERE guid_envio IS NULL").fetchall()
+        if sin_guid:
+            connection.executemany(f"UPDATE {tabla} SET guid_envio = ? WHERE id_local = ? AND guid_envio IS NULL",
+                                   [(_nuevo_guid(), fila["id_local"]) for fila in sin_guid])
+
+
+def _nuevo_guid() -> str:
+    return str(uuid.uuid4())
+
+
+def _a_json(datos) -> str:
+    # Los valores numpy (p. ej. PMV/PPD de pythermalcomfort) se guardan como números, no como texto
+    return json.dumps(datos, ensure_ascii=False, default=lambda v: v.item() if hasattr(v, "item") else str(v))
+
+
+def _ahora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def guardar_visita(cuv, fecha_visita, hora_medicion, temp_max, motivo_evaluacion,
+                   nombre_personal, cargo, consultor_ist, cod_equipo_t, cod_equipo_v,
+                   patron_tbs, verif_tbs_inicial, patron_tbh, verif_tbh_inicial,
+                   patron_tg, verif_tg_inicial, consultor_cargo, consultor_zonal) -> int:
+    """
+    Guarda la visita localmente (mismos argumentos que data_access.insertar_visita)
+    y retorna su id local. La inserción en SQL Server la hace el sincronizador.
+    """
+    datos = {
+        "cuv": cuv, "fecha_visita": str(fecha_visita), "hora_medicion": str(hora_medicion), "temp_max": temp_max,
+        "motivo_evaluacion": motivo_evaluacion, "nombre_personal": nombre_personal, "cargo": cargo,
+        "consultor_ist": consultor_ist, "cod_equipo_t": cod_equipo_t, "cod_equipo_v": cod_equipo_v,
+        "patron_tbs": patron_tbs, "verif_tbs_inicial": verif_tbs_inicial,
+        "patron_tbh": patron_tbh, "verif_tbh_inicial": verif_tbh_inicial,
+        "patron_tg": patron_tg, "verif_tg_inicial": verif_tg_inicial,
+        "consultor_cargo": consultor_cargo, "consultor_zonal": consultor_zonal,
+    }
+    connection = _conexion()
+    try:
+        cursor = connection.execute(
+            "INSERT INTO visitas_locales (cuv, datos, creado, guid_envio) VALUES (?, ?, ?, ?)",
+            (str(cuv), _a_json(datos), _ahora(), _nuevo_guid()),
+        )
+        logging.info(f"Visita del CUV {cuv} guardada localmente (id local {cursor.lastrowid}).")
+        return cursor.lastrowid
+    finally:
+        connection.close()
+
+
+def guardar_mediciones(id_visita_local: int, rows: list) -> list:
+    """
+    Guarda localmente las mediciones de una visita en una sola transacción.
+    'rows' tiene el formato de data_access.insertar_mediciones_batch. Retorna los id locales.
+    """
+    for row in rows:
+        if "Seleccione..." in (row.get("nombre_area"), row.get("sector_especifico"), row.get("puesto_trabajo")):
+            logging.error("Datos de medición incompletos. No se guardarán.")
+            return None
+
+    connection = _conexion()
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        ids = []
+        for row in rows:
+            cursor = connection.execute(
+                "INSERT INTO mediciones_locales (visita_local, datos, creado, guid_envio) VALUES (?, ?, ?, ?)",
+                (id_visita_local, _a_json(row), _ahora(), _nuevo_guid()),
+            )
+            ids.append(cursor.lastrowid)
+        # Una visita con datos nuevos se intenta de inmediato aunque estuviera en espera
+        connection.execute("UPDATE visitas_locales SET proximo_intento = 0 WHERE id_local = ?", (id_visita_local,))
+        connection.execute("COMMIT")
+        return ids
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+
+def guardar_verif_final(id_visita_local: int, verif_tbs_final, verif_tbh_final, verif_tg_final,
+                        comentarios_finales) -> bool:
+    """Guarda localmente la verificación final de la visita (se envía después de la visita)."""
+    verif = {"verif_tbs_final": verif_tbs_final, "verif_tbh_final": verif_tbh_final,
+             "verif_tg_final": verif_tg_final, "comentarios_finales": comentarios_finales}
+    connection = _conexion()
+    try:
+        cursor = connection.execute(
+            "UPDATE visitas_locales SET verif_final = ?, verif_sincronizada = 0, proximo_intento = 0 "
+            "WHERE id_local = ?",
+            (_a_json(verif), id_visita_local),
+        )
+        return cursor.rowcount > 0
+    finally:
+        connection.close()
+
+
+def estado_visita(id_visita_local: int) -> dict:
+    """
+    Estado de sincronización de una visita:
+    {id_remoto, mediciones_pendientes, verif_pendiente, sincronizada, intentos, ultimo_error}.
+    """
+    connection = _conexion()
+    try:
+        visita = connection.execute("SELECT * FROM visitas_locales WHERE id_local = ?", (id_visita_local,)).fetchone()
+        if visita is None:
+            return None
+        pendientes = connection.execute(
+            "SELECT COUNT(*) FROM mediciones_locales WHERE visita_local = ? AND id_remoto IS NULL", (id_visita_local,)
+        ).fetchone()[0]
+    finally:
+        connection.close()
+    verif_pendiente = visita["verif_final"] is not None and not visita["verif_sincronizada"]
+    return {
+        "id_remoto": visita["id_remoto"],
+        "mediciones_pendientes": pendientes,
+        "verif_pendiente": verif_pendiente,
+        "sincronizada": visita["id_remoto"] is not None and pendientes == 0 and not verif_pendiente,
+        "intentos": visita["intentos"],
+        "ultimo_error": visita["ultimo_error"],
+    }
+
+
+def leer_visita(id_visita_local: int) -> dict:
+    """
+    Contenido guardado de una visita: {cuv, datos, verif_final, id_remoto, mediciones}, donde
+    'mediciones' es la lista de {id_local, id_remoto, datos} en orden de guardado. None si no existe.
+    """
+    connection = _conexion()
+    try:
+        visita = connection.execute("SELECT * FROM visitas_locales WHERE id_local = ?", (id_visita_local,)).fetchone()
+        if visita is None:
+            return None
+        mediciones = connection.execute(
+            "SELECT id_local, id_remoto, datos FROM mediciones_locales WHERE visita_local = ? ORDER BY id_local",
+            (id_visita_local,),
+        ).fetchall()
+    finally:
+        connection.close()
+    return {
+        "cuv": visita["cuv"],
+        "datos": json.loads(visita["datos"]),
+        "verif_final": json.loads(visita["verif_final"]) if visita["verif_final"] else None,
+        "id_remoto": visita["id_remoto"],
+        "mediciones": [{"id_local": m["id_local"], "id_remoto": m["id_remoto"], "datos": json.loads(m["datos"])}
+                       for m in mediciones],
+    }
+
+
+def resumen_pendientes() -> dict:
+    """Cantidad de visitas y mediciones que aún no llegan a SQL Server."""
+    connection = _conexion()
+    try:
+        visitas = connection.execute(
+            "SELECT COUNT(*) FROM visitas_locales "
+            "WHERE id_remoto IS NULL OR (verif_final IS NOT NULL AND verif_sincronizada = 0)"
+        ).fetchone()[0]
+        mediciones = connection.execute("SELECT COUNT(*) FROM mediciones_locales WHERE id_remoto IS NULL").fetchone()[0]
+        return {"visitas": visitas, "mediciones": mediciones}
+    finally:
+        connection.close()
+
+
+def _registrar_fallo(connection, id_local: int, intentos: int, error: str):
+    espera = min(SYNC_ESPERA_MAX, 2 ** intentos)
+    connection.execute(
+        "UPDATE visitas_locales SET intentos = ?, proximo_intento = ?, ultimo_error = ? WHERE id_local = ?",
+        (intentos + 1, time.time() + espera, error, id_local),
+    )
+    logging.warning(f"Sincronización de la visita local {id_local} falló ({error}); reintento en {espera:.0f} s.")
+
+
+def _sincronizar_visita(connection, visita, data_access) -> bool:
+    """
+    Envía la visita, sus mediciones pendientes y la verificación final. Retorna True si quedó al día.
+    Cada envío lleva el guid_envio de la fila, por lo que repetirlo no duplica datos en el servidor.
+    """
+    id_local = visita["id_local"]
+    id_remoto = visita["id_remoto"]
+
+    if id_remoto is None:
+        id_remoto = data_access.insertar_visita(**json.loads(visita["datos"]), guid_envio=visita["guid_envio"])
+        if not id_remoto:
+            _registrar_fallo(connection, id_local, visita["intentos"], "insertar_visita no retornó id")
+            return False
+        # Reconciliación: desde aquí la visita no se vuelve a insertar
+        connection.execute("UPDATE visitas_locales SET id_remoto = ? WHERE id_local = ?", (id_remoto, id_local))
+
+    mediciones = connection.execute(
+        "SELECT id_local, datos, guid_envio FROM mediciones_locales "
+        "WHERE visita_local = ? AND id_remoto IS NULL ORDER BY id_local",
+        (id_local,),
+    ).fetchall()
+    if mediciones:
+        ids = data_access.insertar_mediciones_batch(
+            id_remoto, [{**json.loads(m["datos"]), "guid_envio": m["guid_envio"]} for m in mediciones]
+        )
+        if not ids:
+            _registrar_fallo(connection, id_local, visita["intentos"], "insertar_mediciones_batch falló")
+            return False
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany("UPDATE mediciones_locales SET id_remoto = ? WHERE id_local = ?",
+                               [(id_remoto_m, m["id_local"]) for id_remoto_m, m in zip(ids, mediciones)])
+        connection.execute("COMMIT")
+
+    if visita["verif_final"] is not None and not visita["verif_sincronizada"]:
+        verif = json.loads(visita["verif_final"])
+        if not data_access.insert_verif_final_visita(id_remoto, **verif):
+            _registrar_fallo(connection, id_local, visita["intentos"], "insert_verif_final_visita falló")
+            return False
+        # Solo se marca si la verificación no cambió mientras se enviaba
+        connection.execute("UPDATE visitas_locales SET verif_sincronizada = 1 WHERE id_local = ? AND verif_final = ?",
+                           (id_local, visita["verif_final"]))
+
+    connection.execute("UPDATE visitas_locales SET intentos = 0, ultimo_error = NULL WHERE id_local = ?", (id_local,))
+    return True
+
+
+def _reservar_visitas(connection, dueno: str, limite: int, forzar: bool) -> list:
+    """
+    Reserva para 'dueno' hasta 'limite' visitas con datos pendientes que ningún otro proceso
+    tenga reservadas (o cuya reserva venció) y las retorna, en orden de creación.
+    """
+    ahora = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        visitas = connection.execute(
+            """
+            SELECT * FROM visitas_locales v
+            WHERE (v.id_remoto IS NULL
+                   OR (v.verif_final IS NOT NULL AND v.verif_sincronizada = 0)
+                   OR EXISTS (SELECT 1 FROM mediciones_locales m
+                              WHERE m.visita_local = v.id_local AND m.id_remoto IS NULL))
+              AND (? OR v.proximo_intento <= ?)
+              AND (v.reservado_hasta IS NULL OR v.reservado_hasta < ? OR v.reservado_por = ?)
+            ORDER BY v.id_local
+            LIMIT ?
+            """,
+            (forzar, ahora, ahora, dueno, limite),
+        ).fetchall()
+        connection.executemany(
+            "UPDATE visitas_locales SET reservado_por = ?, reservado_hasta = ? WHERE id_local = ?",
+            [(dueno, ahora + SYNC_RESERVA, v["id_local"]) for v in visitas],
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return visitas
+
+
+def _renovar_reserva(connection, id_local: int, dueno: str) -> bool:
+    """Extiende la reserva antes de enviar la visita; False si otro proceso la tomó al vencer."""
+    cursor = connection.execute(
+        "UPDATE visitas_locales SET reservado_hasta = ? WHERE id_local = ? AND reservado_por = ?",
+        (time.time() + SYNC_RESERVA, id_local, dueno),
+    )
+    return cursor.rowcount > 0
+
+
+def sincronizar_pendientes(limite: int = 50, forzar: bool = False) -> dict:
+    """
+    Envía a SQL Server hasta 'limite' visitas con datos pendientes, en orden de creación.
+    Las visitas que fallaron esperan su próximo intento salvo que 'forzar' sea True.
+    Solo se envían las visitas que este proceso logra reservar, de modo que otros procesos
+    sobre la misma base local no las envían a la vez.
+    Retorna {"sincronizadas": n, "fallidas": n}.
+    """
+    import data_access
+
+    resultado = {"sincronizadas": 0, "fallidas": 0}
+    dueno = f"{socket.gethostname()}:{os.getpid()}"
+    with _envio_lock:
+        connection = _conexion()
+        try:
+            visitas = _reservar_visitas(connection, dueno, limite, forzar)
+            for visita in visitas:
+                if not _renovar_reserva(connection, visita["id_local"], dueno):
+                    continue
+                try:
+                    ok = _sincronizar_visita(connection, visita, data_access)
+                except Exception as e:
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+                    _registrar_fallo(connection, visita["id_local"], visita["intentos"], str(e))
+                    ok = False
+                finally:
+                    connection.execute(
+                        "UPDATE visitas_locales SET reservado_por = NULL, reservado_hasta = NULL "
+                        "WHERE id_local = ? AND reservado_por = ?",
+                        (visita["id_local"], dueno),
+                    )
+                resultado["sincronizadas" if ok else "fallidas"] += 1
+        finally:
+            connection.close()
+
+    if visitas:
+        logging.info(f"Sincronización: {resultado}")
+    return resultado
+
+
+def bucle_sincronizacion(intervalo: float = None):
+    """Sincroniza indefinidamente cada 'intervalo' segundos."""
+    intervalo = SYNC_INTERVALO if intervalo is None else intervalo
+    while True:
+        try:
+            sincronizar_pendientes()
+        except Exception as e:
+            logging.error(f"Error en el ciclo de sincronización: {e}")
+        time.sleep(intervalo)
+
+
+def iniciar_sincronizador(intervalo: float = None) -> threading.Thread:
+    """Inicia (una sola vez por proceso) el hilo de sincronización en segundo plano."""
+    with _sincronizador_lock:
+        hilo = _sincronizador["hilo"]
+        if hilo is None or not hilo.is_alive():
+            hilo = threading.Thread(target=bucle_sincronizacion, args=(intervalo,), name="sincronizador", daemon=True)
+            hilo.start()
+            _sincronizador["hilo"] = hilo
+        return hilo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza con SQL Server las visitas guardadas localmente.")
+    parser.add_argument("--una-vez", action="store_true", help="Sincronizar lo pendiente y terminar")
+    parser.add_argument("--intervalo", type=float, default=SYNC_INTERVALO)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.una_vez:
+        resultado = sincronizar_pendientes(limite=10**6, forzar=True)
+        print(json.dumps({**resultado, "pendientes": resumen_pendientes()}, ensure_ascii=False))
+        return 0 if resultado["fallidas"] == 0 else 1
+    bucle_sincronizacion(args.intervalo)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
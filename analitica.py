@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Analítica de temporada calculada en la base de datos.
+
+Las estadísticas entre CUV (tasa de cumplimiento por región, comuna, área o consultor zonal,
+distribución de PMV, centros con peores resultados) se calculan con GROUP BY en SQL sobre la
+tabla materializada resumen_areas_visita, con una fila por visita y área (migración 002). Ni el
+tablero (dashboard_temporada.py) ni estas consultas leen las mediciones ni generan informes.
+
+El resumen se mantiene así:
+  - refrescar_visitas([id_visita]): data_access lo llama después de insertar mediciones;
+  - refrescar_incremental(): resume las visitas con mediciones nuevas desde la última marca
+    de agua (id_medicion); sirve para inserciones hechas fuera de data_access. Vuelve a revisar
+    los últimos ANALITICA_MARGEN_IDS id bajo la marca, porque una transacción que aún no
+    confirmaba puede tener id menores que el máximo visible al avanzar la marca;
+  - refrescar_completo(): reconstruye todo (por ejemplo, después de Recalculoppdpmv.py, que
+    actualiza pmv y ppd de mediciones ya resumidas).
+
+    python analitica.py               # refresco incremental
+    python analitica.py --completo
+
+El cumplimiento de un área sigue el criterio del informe (doc_utils.calcular_analisis_area):
+con una sola medición, su resultado_medicion; con varias, -1 < PMV < 1 con el PMV de los
+promedios de las entradas, que se calcula con pmv_escalar al refrescar y se escribe en el resumen.
+"""
+import os
+import sys
+import math
+import logging
+import argparse
+
+import pandas as pd
+
+import pmv_escalar
+
+RESUMEN = "resumen_areas_visita"
+ESTADO = "resumen_areas_estado"
+
+# Refrescar el resumen de la visita después de cada inserción de mediciones (data_access)
+ANALITICA_REFRESCO_AL_INSERTAR = os.getenv('ANALITICA_REFRESCO_AL_INSERTAR', '1') == '1'
+# id_medicion bajo la marca de agua que refrescar_incremental() vuelve a revisar
+ANALITICA_MARGEN_IDS = int(os.getenv('ANALITICA_MARGEN_IDS', '1000'))
+
+# Dimensiones por las que se puede agrupar el cumplimiento: nombre -> columna del resumen
+DIMENSIONES = {
+    "region": "region_ct",
+    "comuna": "comuna_ct",
+    "area": "area",
+    "consultor_zonal": "consultor_zonal",
+    "consultor": "consultor_ist",
+}
+
+_COLUMNAS_RESUMEN = (
+    "id_visita, area, cuv, nombre_ct, region_ct, comuna_ct, fecha_visita, consultor_ist, consultor_zonal, "
+    "n_mediciones, t_bul_seco_prom, t_globo_prom, hum_rel_prom, vel_air_prom, pmv_prom, pmv_min, pmv_max, "
+    "ppd_prom, mediciones_cumplen, cumple, max_id_medicion"
+)
+
+# Filas del resumen calculadas desde las tablas base; {filtro} restringe las visitas a resumir.
+# 'cumple' de las áreas con varias mediciones se calcula después en _decidir_areas.
+_SELECT_RESUMEN = """
+    SELECT
+        v.id_visita,
+        UPPER(LTRIM(RTRIM(m.nombre_area))),
+        MAX(v.cuv_visita),
+        MAX(c.nombre_ct),
+        MAX(c.region_ct),
+        MAX(c.comuna_ct),
+        MAX(v.fecha_visita),
+        MAX(v.consultor_ist),
+        MAX(v.consultor_zonal),
+        COUNT(*),
+        AVG(CAST(m.t_bul_seco AS FLOAT)),
+        AVG(CAST(m.t_globo AS FLOAT)),
+        AVG(CAST(m.hum_rel AS FLOAT)),
+        AVG(CAST(m.vel_air AS FLOAT)),
+        AVG(CAST(m.pmv AS FLOAT)),
+        MIN(CAST(m.pmv AS FLOAT)),
+        MAX(CAST(m.pmv AS FLOAT)),
+        AVG(CAST(m.ppd AS FLOAT)),
+        SUM(CASE WHEN UPPER(LTRIM(RTRIM(m.resultado_medicion))) = 'CUMPLE' THEN 1 ELSE 0 END),
+        CASE
+            WHEN COUNT(*) = 1
+                THEN MAX(CASE WHEN UPPER(LTRIM(RTRIM(m.resultado_medicion))) = 'CUMPLE' THEN 1 ELSE 0 END)
+            ELSE 0
+        END,
+        MAX(m.id_medicion)
+    FROM higiene_mediciones_prod m
+    JOIN higiene_Visitas_prod v ON v.id_visita = m.visita_id
+    LEFT JOIN higiene_Centros_Trabajo c ON c.cuv = v.cuv_visita
+    WHERE m.nombre_area IS NOT NULL AND {filtro}
+    GROUP BY v.id_visita, UPPER(LTRIM(RTRIM(m.nombre_area)))
+"""
+
+# Promedios de las entradas del PMV de las áreas con varias mediciones; {filtro} como en _SELECT_RESUMEN
+_SELECT_PROMEDIOS = """
+    SELECT
+        m.visita_id,
+        UPPER(LTRIM(RTRIM(m.nombre_area))),
+        AVG(CAST(m.t_bul_seco AS FLOAT)),
+        AVG(CAST(m.t_globo AS FLOAT)),
+        AVG(CAST(m.vel_air AS FLOAT)),
+        AVG(CAST(m.hum_rel AS FLOAT)),
+        AVG(CAST(m.met AS FLOAT)),
+        AVG(CAST(m.clo AS FLOAT))
+    FROM higiene_mediciones_prod m
+    WHERE m.nombre_area IS NOT NULL AND {filtro}
+    GROUP BY m.visita_id, UPPER(LTRIM(RTRIM(m.nombre_area)))
+    HAVING COUNT(*) > 1
+"""
+
+
+def _data_access():
+    # Se importa al usarlo para respetar data_access_sqlite.usar_como_data_access()
+    import data_access
+    return data_access
+
+
+def _motor(data_access) -> str:
+    return "sqlite" if data_access.__name__ == "data_access_sqlite" else "sqlserver"
+
+
+def _cumple_por_promedios(tdb, tr, vr, rh, met, clo) -> int:
+    """
+    Cumplimiento de un área con varias mediciones, igual que doc_utils.calcular_analisis_area:
+    PMV de los promedios (met y clo por defecto 1.1 y 0.5) y CUMPLE si -1 < PMV < 1.
+    """
+    promedios = [math.nan if x is None else float(x) for x in (tdb, tr, vr, rh, met, clo)]
+    promedios[4] = promedios[4] or 1.1
+    promedios[5] = promedios[5] or 0.5
+    try:
+        pmv = pmv_escalar.pmv(*promedios)
+    except Exception:
+        return 0
+    return 0 if pmv <= -1 or pmv >= 1 else 1
+
+
+def _decidir_areas(connection, filtro: str, params: list):
+    """Escribe 'cumple' de las áreas con varias mediciones de las visitas que cumplen 'filtro'."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(_SELECT_PROMEDIOS.format(filtro=filtro), params)
+        areas = cursor.fetchall()
+        if areas:
+            cursor.executemany(
+                f"UPDATE {RESUMEN} SET cumple = ? WHERE id_visita = ? AND area = ?",
+                [(_cumple_por_promedios(*fila[2:]), fila[0], fila[1]) for fila in areas],
+            )
+    finally:
+        cursor.close()
+
+
+def _refrescar(connection, filtro: str, params: list) -> int:
+    """Reemplaza en el resumen las visitas que cumplen 'filtro' (sobre la tabla de mediciones m)."""
+    cursor = connection.cursor()
+    try:
+        visitas = f"IN (SELECT DISTINCT m.visita_id FROM higiene_mediciones_prod m WHERE {filtro})"
+        cursor.execute(f"DELETE FROM {RESUMEN} WHERE id_visita {visitas}", params)
+        cursor.execute(
+            f"INSERT INTO {RESUMEN} ({_COLUMNAS_RESUMEN}) "
+            + _SELECT_RESUMEN.format(filtro=f"v.id_visita {visitas}"),
+            params,
+        )
+        filas = cursor.rowcount
+    finally:
+        cursor.close()
+    _decidir_areas(connection, f"m.visita_id {visitas}", params)
+    return filas
+
+
+def _guardar_marca(connection, max_id: int):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"UPDATE {ESTADO} SET max_id_medicion = ?, actualizado = CURRENT_TIMESTAMP WHERE id = 1",
+                       (max_id,))
+        if cursor.rowcount == 0:
+            cursor.execute(f"INSERT INTO {ESTADO} (id, max_id_medicion) VALUES (1, ?)", (max_id,))
+    finally:
+        cursor.close()
+
+
+def _max_id_medicion(connection) -> int:
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT MAX(id_medicion) FROM higiene_mediciones_prod")
+        fila = cursor.fetchone()
+        return int(fila[0]) if fila and fila[0] is not None else 0
+    finally:
+        cursor.close()
+
+
+def refrescar_visitas(visita_ids) -> int:
+    """Recalcula las filas del resumen de las visitas indicadas. Retorna las filas escritas."""
+    visita_ids = [int(v) for v in visita_ids if v is not None]
+    if not visita_ids:
+        return 0
+    connection = _data_access().get_db_connection()
+    try:
+        marcadores = ", ".join("?" for _ in visita_ids)
+        filas = _refrescar(connection, f"m.visita_id IN ({marcadores})", visita_ids)
+        connection.commit()
+        return filas
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def refrescar_incremental() -> dict:
+    """
+    Resume las visitas que tienen mediciones con id_medicion mayor que la marca de agua menos
+    ANALITICA_MARGEN_IDS y avanza la marca. El margen recoge las mediciones de transacciones que
+    confirmaron después de que la marca pasó sobre sus id (IDENTITY asigna el id al insertar, no
+    al confirmar); volver a resumir una visita ya resumida no cambia el resultado.
+    Retorna {"desde", "hasta", "filas"}.
+    """
+    connection = _data_access().get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT max_id_medicion FROM {ESTADO} WHERE id = 1")
+        fila = cursor.fetchone()
+        cursor.close()
+        desde = int(fila[0]) if fila else 0
+        # Se fija el tope antes de resumir: lo insertado durante el refresco queda para el siguiente
+        hasta = _max_id_medicion(connection)
+        filas = 0
+        if hasta > 0:
+            filas = _refrescar(connection, "m.id_medicion > ? AND m.id_medicion <= ?",
+                               [max(0, desde - ANALITICA_MARGEN_IDS), hasta])
+            _guardar_marca(connection, hasta)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    logging.info(f"Resumen de temporada: {filas} filas refrescadas (id_medicion {desde} -> {hasta}).")
+    return {"desde": desde, "hasta": hasta, "filas": filas}
+
+
+def refrescar_completo() -> dict:
+    """Reconstruye todo el resumen en una transacción. Retorna {"hasta", "filas"}."""
+    connection = _data_access().get_db_connection()
+    try:
+        hasta = _max_id_medicion(connection)
+        cursor = connection.cursor()
+        cursor.execute(f"DELETE FROM {RESUMEN}")
+        cursor.execute(f"INSERT INTO {RESUMEN} ({_COLUMNAS_RESUMEN}) " + _SELECT_RESUMEN.format(filtro="1 = 1"))
+        filas = cursor.rowcount
+        cursor.close()
+        _decidir_areas(connection, "1 = 1", [])
+        _guardar_marca(connection, hasta)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    logging.info(f"Resumen de temporada reconstruido: {filas} filas.")
+    return {"hasta": hasta, "filas": filas}
+
+
+def refrescar_despues_de_insertar(visita_id):
+    """
+    Llamado por data_access después de insertar mediciones. Un error aquí no afecta la
+    inserción: se registra y el siguiente refrescar_incremental() pone el resumen al día.
+    """
+    if not ANALITICA_REFRESCO_AL_INSERTAR:
+        return
+    try:
+        refrescar_visitas([visita_id])
+    except Exception as e:
+        logging.warning(f"No se pudo refrescar el resumen de la visita {visita_id}: {e}")
+
+
+# -----------------------------------------------
+# Consultas sobre el resumen
+# -----------------------------------------------
+def _filtros(fecha_desde=None, fecha_hasta=None, region=None):
+    condiciones, params = [], []
+    for condicion, valor in (("fecha_visita >= ?", fecha_desde), ("fecha_visita <= ?", fecha_hasta),
+                             ("region_ct = ?", region)):
+        if valor:
+            condiciones.append(condicion)
+            params.append(str(valor))
+    return (" WHERE " + " AND ".join(condiciones) if condiciones else ""), params
+
+
+def _leer(query: str, params=None) -> pd.DataFrame:
+    connection = _data_access().get_db_connection()
+    try:
+        return pd.read_sql(query, connection, params=params)
+    finally:
+        connection.close()
+
+
+def resumen_general(fecha_desde=None, fecha_hasta=None, region=None) -> dict:
+    """{"centros", "visitas", "areas", "areas_cumplen", "tasa_cumplimiento", "pmv_prom", "mediciones"}."""
+    where, params = _filtros(fecha_desde, fecha_hasta, region)
+    df = _leer(
+        f"""
+        SELECT COUNT(DISTINCT cuv) AS centros, COUNT(DISTINCT id_visita) AS visitas, COUNT(*) AS areas,
+               SUM(cumple) AS areas_cumplen, AVG(pmv_prom) AS pmv_prom, SUM(n_mediciones) AS mediciones
+        FROM {RESUMEN}{where}
+        """,
+        params,
+    )
+    fila = {k: (None if pd.isna(v) else v) for k, v in df.iloc[0].items()}
+    fila["tasa_cumplimiento"] = (fila["areas_cumplen"] or 0) / fila["areas"] if fila["areas"] else None
+    return fila
+
+
+def cumplimiento_por(dimension: str, fecha_desde=None, fecha_hasta=None, region=None) -> pd.DataFrame:
+    """
+    Áreas evaluadas, áreas que cumplen, tasa de cumplimiento y PMV promedio agrupados por
+    'dimension' (una de DIMENSIONES), de menor a mayor tasa.
+    """
+    if dimension not in DIMENSIONES:
+        raise ValueError(f"Dimensión desconocida: {dimension}. Opciones: {', '.join(DIMENSIONES)}")
+    columna = DIMENSIONES[dimension]
+    where, params = _filtros(fecha_desde, fecha_hasta, region)
+    return _leer(
+        f"""
+        SELECT {columna} AS {dimension}, COUNT(*) AS areas, SUM(cumple) AS areas_cumplen,
+               1.0 * SUM(cumple) / COUNT(*) AS tasa_cumplimiento, AVG(pmv_prom) AS pmv_prom,
+               COUNT(DISTINCT cuv) AS centros
+        FROM {RESUMEN}{where}
+        GROUP BY {columna}
+        ORDER BY tasa_cumplimiento, areas DESC
+        """,
+        params,
+    )
+
+
+def distribucion_pmv(ancho: float = 0.5, fecha_desde=None, fecha_hasta=None, region=None) -> pd.DataFrame:
+    """Histograma del PMV promedio de las áreas en tramos de 'ancho': columnas desde, hasta, areas."""
+    ancho = float(ancho)
+    if ancho <= 0:
+        raise ValueError("El ancho del tramo debe ser positivo.")
+    where, params = _filtros(fecha_desde, fecha_hasta, region)
+    where = (where + " AND" if where else " WHERE") + " pmv_prom IS NOT NULL"
+    # CAST trunca hacia cero en ambos motores; el desplazamiento lo convierte en piso para PMV negativos
+    df = _leer(
+        f"""
+        SELECT tramo, COUNT(*) AS areas
+        FROM (SELECT CAST(pmv_prom / {ancho!r} + 1000 AS INTEGER) - 1000 AS tramo FROM {RESUMEN}{where}) t
+        GROUP BY tramo
+        ORDER BY tramo
+        """,
+        params,
+    )
+    df.insert(0, "desde", df.pop("tramo") * ancho)
+    df.insert(1, "hasta", df["desde"] + ancho)
+    return df
+
+
+def peores_centros(limite: int = 20, fecha_desde=None, fecha_hasta=None, region=None) -> pd.DataFrame:
+    """Centros con más áreas que no cumplen (y, a igualdad, con el PMV más alejado de 0)."""
+    where, params = _filtros(fecha_desde, fecha_hasta, region)
+    limite = int(limite)
+    tope = "" if _motor(_data_access()) == "sqlite" else f"TOP ({limite}) "
+    limit = f" LIMIT {limite}" if not tope else ""
+    return _leer(
+        f"""
+        SELECT {tope}cuv, MAX(nombre_ct) AS nombre_ct, MAX(region_ct) AS region_ct, MAX(comuna_ct) AS comuna_ct,
+               COUNT(*) AS areas, SUM(1 - cumple) AS areas_no_cumplen, MAX(ABS(pmv_prom)) AS pmv_abs_max,
+               MAX(fecha_visita) AS ultima_visita
+        FROM {RESUMEN}{where}
+        GROUP BY cuv
+        ORDER BY areas_no_cumplen DESC, pmv_abs_max DESC{limit}
+        """,
+        params,
+    )
+
+
+def regiones() -> list:
+    """Regiones presentes en el resumen, para los filtros del tablero."""
+    df = _leer(f"SELECT DISTINCT region_ct FROM {RESUMEN} WHERE region_ct IS NOT NULL ORDER BY region_ct")
+    return df["region_ct"].tolist()
+
+
+def estado_resumen() -> dict:
+    """{"max_id_medicion", "actualizado"} del último refresco, o valores None si nunca se refrescó."""
+    df = _leer(f"SELECT max_id_medicion, actualizado FROM {ESTADO} WHERE id = 1")
+    if df.empty:
+        return {"max_id_medicion": None, "actualizado": None}
+    return df.iloc[0].to_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresca el resumen de temporada (resumen_areas_visita).")
+    parser.add_argument("--completo", action="store_true", help="Reconstruye todo el resumen")
+    parser.add_argument("--sqlite", action="store_true", help="Usa la base local de data_access_sqlite")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.sqlite:
+        import data_access_sqlite
+        data_access_sqlite.usar_como_data_access()
+    resultado = refrescar_completo() if args.completo else refrescar_incremental()
+    print(resultado)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
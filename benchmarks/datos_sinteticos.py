@@ -0,0 +1,116 @@
+"""
+Generador de datos sintéticos de centros, visitas, mediciones y equipos con distribuciones
+similares a las de una temporada real (N CUV x 1-10 áreas x 1-3 mediciones por área).
+"""
+import os
+import numpy as np
+import pandas as pd
+from pythermalcomfort.models import pmv_ppd_iso
+
+REGIONES = ["Metropolitana", "Valparaíso", "Biobío", "Maule", "Los Lagos", "Antofagasta", "Coquimbo", "Araucanía"]
+COMUNAS = ["Santiago", "Viña del Mar", "Concepción", "Talca", "Puerto Montt", "Antofagasta", "La Serena", "Temuco"]
+AREAS = ["Linea de cajas", "Sala de venta", "Bodega", "Recepción", "Oficina", "Casino",
+         "Panadería", "Carnicería", "Fiambrería", "Sala de basura"]
+PUESTOS = {"Linea de cajas": "Cajera(o)", "Sala de venta": "Reponedor(a)", "Bodega": "Bodeguero(a)",
+           "Recepción": "Recepcionista"}
+MET_PUESTO = {"Cajera(o)": 1.1, "Reponedor(a)": 1.2, "Bodeguero(a)": 1.89, "Recepcionista": 1.89}
+CONSULTORES = ["Evelyn Toro Toro", "Gonzalo Barria Trujillo", "Mariana Marin Mendez", "Claudio San Martin Catril"]
+ZONALES = ["Gerencia Zonal Metropolitana", "Gerencia Zonal Sur", "Gerencia Zonal Norte"]
+
+
+def generar_equipos(n_temp: int = 32, n_vel: int = 15, dir_imagenes: str = "imagenes_pdf") -> pd.DataFrame:
+    """Catálogo de equipos T1..Tn y V1..Vn; los id se toman de las carpetas de certificados existentes."""
+    ids_existentes = sorted(int(d) for d in os.listdir(dir_imagenes) if d.isdigit()) if os.path.isdir(dir_imagenes) else []
+    filas = []
+    for k, (prefijo, nombre) in enumerate([("T", "Monitor de estrés térmico")] * n_temp + [("V", "Anemómetro")] * n_vel):
+        numero = k + 1 if prefijo == "T" else k - n_temp + 1
+        id_equipo = ids_existentes[k] if k < len(ids_existentes) else 9_000_000 + k
+        filas.append({
+            "id_equipo": id_equipo,
+            "equipo_dicc": f"{prefijo}{numero}",
+            "nombre_equipo": nombre,
+            "cod_equipo": f"{prefijo}{numero}",
+            "n_serie_equipo": f"SN{100000 + k}",
+            "marca_equipo": "Marca",
+            "modelo_equipo": "Modelo",
+            "fecha_calibracion": "2024-10-01",
+            "prox_calibracion": "2025-10-01",
+            "empresa_certificadora": "Certificadora",
+            "num_certificado": f"C-{k:04d}",
+            "url_certificado": f"https://example.invalid/certificados/{id_equipo}.pdf",
+        })
+    return pd.DataFrame(filas)
+
+
+def generar_dataset(n_cuvs: int, semilla: int = 0, df_equipos: pd.DataFrame = None) -> dict:
+    """
+    Retorna {tabla: DataFrame} listo para data_access_sqlite.cargar_tablas.
+    Áreas por visita ~ 1-10 (más frecuente 2-5); mediciones por área 1-3.
+    """
+    rng = np.random.default_rng(semilla)
+    df_equipos = generar_equipos() if df_equipos is None else df_equipos
+    ids_t = df_equipos.loc[df_equipos["equipo_dicc"].str.startswith("T"), "id_equipo"].to_numpy()
+    ids_v = df_equipos.loc[df_equipos["equipo_dicc"].str.startswith("V"), "id_equipo"].to_numpy()
+
+    centros, visitas, mediciones = [], [], []
+    id_visita = 0
+    for i in range(n_cuvs):
+        cuv = str(100000 + i)
+        r = rng.integers(len(REGIONES))
+        centros.append({
+            "cuv": cuv, "razon_social": "RENDIC HERMANOS S.A.", "rut": "81537600-5",
+            "nombre_ct": f"LOCAL {i}", "direccion_ct": f"Avenida {i}", "comuna_ct": COMUNAS[r], "region_ct": REGIONES[r],
+        })
+
+        id_visita += 1
+        consultor = CONSULTORES[rng.integers(len(CONSULTORES))]
+        fecha = pd.Timestamp("2025-01-01") + pd.Timedelta(days=int(rng.integers(0, 90)))
+        patrones = {"tbs": 46.4, "tbh": 12.7, "tg": 69.8}
+        visita = {
+            "id_visita": id_visita, "cuv_visita": cuv, "fecha_visita": fecha.strftime("%Y-%m-%d"),
+            "hora_visita": f"{int(rng.integers(9, 17)):02d}:00", "temperatura_dia": round(float(rng.normal(30, 3)), 1),
+            "motivo_evaluacion": "Programa de trabajo", "nombre_personal_visita": "persona acompañante",
+            "cargo_personal_visita": "administrador", "consultor_ist": consultor,
+            "equipo_temp": int(rng.choice(ids_t)), "equipo_vel_air": int(rng.choice(ids_v)),
+            "consultor_cargo": "Consultor en Higiene Ocupacional", "consultor_zonal": ZONALES[rng.integers(len(ZONALES))],
+            "note_visita": "",
+        }
+        for clave, patron in patrones.items():
+            visita[f"patron_{clave}"] = patron
+            visita[f"ver_{clave}_ini"] = round(patron + float(rng.normal(0, 0.2)), 1)
+            visita[f"ver_{clave}_fin"] = round(patron + float(rng.normal(0, 0.3)), 1)
+        visitas.append(visita)
+
+        n_areas = int(np.clip(rng.poisson(3.5), 1, 10))
+        for area in rng.choice(AREAS, size=n_areas, replace=False):
+            puesto = PUESTOS.get(area, "Reponedor(a)")
+            for _ in range(int(rng.integers(1, 4))):
+                tdb = float(rng.normal(27, 3))
+                mediciones.append({
+                    "visita_id": id_visita, "nombre_area": area, "sector_especifico": "Centro",
+                    "puesto_trabajo": puesto, "posicion_trabajador": "De pie", "vestimenta_trabajador": "Ligera",
+                    "t_bul_seco": round(tdb, 1), "t_globo": round(tdb + float(rng.normal(1, 1)), 1),
+                    "hum_rel": round(float(rng.uniform(30, 75)), 1),
+                    "vel_air": round(float(np.clip(rng.lognormal(-2, 0.8), 0, 2)), 2),
+                    "ppd": None, "pmv": None, "resultado_medicion": None,
+                    "met": MET_PUESTO[puesto], "clo": 0.5,
+                    "caract_constructivas": "Muros de hormigón, techumbre metálica",
+                    "ingreso_salida_aire": "Puertas de acceso y extractores",
+                })
+
+    # PMV/PPD calculados igual que en form.py, en una sola llamada vectorizada
+    df_mediciones = pd.DataFrame(mediciones)
+    resultados = pmv_ppd_iso(tdb=df_mediciones["t_bul_seco"], tr=df_mediciones["t_globo"],
+                             vr=df_mediciones["vel_air"], rh=df_mediciones["hum_rel"],
+                             met=df_mediciones["met"], clo=df_mediciones["clo"],
+                             model="7730-2005", limit_inputs=False)
+    df_mediciones["pmv"] = np.round(resultados.pmv, 2)
+    df_mediciones["ppd"] = np.round(resultados.ppd, 1)
+    df_mediciones["resultado_medicion"] = np.where(df_mediciones["pmv"].abs() <= 1, "Cumple", "No cumple")
+
+    return {
+        "higiene_Centros_Trabajo": pd.DataFrame(centros),
+        "higiene_Equipos_Medicion": df_equipos,
+        "higiene_Visitas_prod": pd.DataFrame(visitas),
+        "higiene_mediciones_prod": df_mediciones,
+    }
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Benchmarks reproducibles sin acceso al SQL Server de producción.
+
+Genera un conjunto de datos sintético, lo carga en una base SQLite temporal (data_access_sqlite)
+y mide:
+    - latencia de un informe (consulta + generación del .docx, sin cache), p50/p95;
+    - rendimiento de la exportación masiva (generar_informes_cli.ejecutar) con N procesos;
+    - recálculo de PMV/PPD por registro, como en Recalculoppdpmv.py;
+    - tiempo del optimizador de confortista.calcular_ajuste_optimo;
+    - calentamiento del cálculo de PMV (compilación numba o carga desde su cache).
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.run --cuvs 200 --workers 4
+    python -m benchmarks.run --cuvs 200 --comparar benchmarks/resultados/<base>.json
+
+Los resultados se guardan como JSON en benchmarks/resultados/ junto con el commit y los
+parámetros, para comparar regresiones entre commits.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import logging
+import platform
+import tempfile
+import argparse
+import subprocess
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import calentamiento  # noqa: E402  (antes de pythermalcomfort)
+DIR_RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados")
+
+
+def _percentiles(muestras: list) -> dict:
+    ordenadas = sorted(muestras)
+    if not ordenadas:
+        return {}
+
+    def p(q):
+        k = (len(ordenadas) - 1) * q
+        i = int(k)
+        j = min(i + 1, len(ordenadas) - 1)
+        return ordenadas[i] + (ordenadas[j] - ordenadas[i]) * (k - i)
+
+    return {"n": len(ordenadas), "p50_ms": round(p(0.50) * 1000, 2), "p95_ms": round(p(0.95) * 1000, 2),
+            "max_ms": round(ordenadas[-1] * 1000, 2)}
+
+
+def _commit_actual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def preparar_entorno(n_cuvs: int, semilla: int, directorio: str):
+    """Apunta la base local y la cache de informes a 'directorio' y carga los datos sintéticos."""
+    os.environ["DB_SQLITE_PATH"] = os.path.join(directorio, "higiene.sqlite3")
+    os.environ["REPORT_CACHE_DIR"] = os.path.join(directorio, "cache_informes")
+
+    import migrar
+    import data_access_sqlite
+    from benchmarks.datos_sinteticos import generar_dataset
+
+    data_access_sqlite.DB_SQLITE_PATH = os.environ["DB_SQLITE_PATH"]
+    tablas = generar_dataset(n_cuvs, semilla)
+    data_access_sqlite.cargar_tablas(tablas)
+    # Mismos índices que producción (migraciones/sqlite)
+    migrar.aplicar_migraciones("sqlite")
+    # Debe ir antes de importar cualquier consumidor de data_access
+    data_access_sqlite.usar_como_data_access()
+    return tablas
+
+
+def bench_informe(cuvs: list, repeticiones: int) -> dict:
+    """Latencia de un informe: consulta de datos + generar_informe_en_word (sin cache en disco)."""
+    from data_access import get_datos_informe, get_equipos
+    from doc_utils import generar_informe_en_word
+
+    df_equipos = get_equipos()
+    consulta, generacion, total = [], [], []
+    for cuv in cuvs[:repeticiones]:
+        inicio = time.perf_counter()
+        datos = get_datos_informe(cuv, df_equipos)
+        t_consulta = time.perf_counter()
+        generar_informe_en_word(*datos)
+        fin = time.perf_counter()
+        consulta.append(t_consulta - inicio)
+        generacion.append(fin - t_consulta)
+        total.append(fin - inicio)
+    return {"consulta": _percentiles(consulta), "generacion": _percentiles(generacion), "total": _percentiles(total)}
+
+
+def bench_exportacion(cuvs: list, workers: int, directorio: str) -> dict:
+    """Rendimiento de la exportación masiva con la cache de informes vacía."""
+    from generar_informes_cli import ejecutar
+
+    shutil.rmtree(os.environ["REPORT_CACHE_DIR"], ignore_errors=True)
+    salida = os.path.join(directorio, f"export_{workers}")
+    shutil.rmtree(salida, ignore_errors=True)
+
+    inicio = time.perf_counter()
+    resumen = ejecutar(cuvs, salida, workers)
+    segundos = time.perf_counter() - inicio
+    return {"workers": workers, "informes": resumen["ok"], "errores": resumen["error"],
+            "segundos": round(segundos, 2), "informes_por_segundo": round(resumen["ok"] / segundos, 2)}
+
+
+def bench_recalculo_pmv(mediciones, limite: int) -> dict:
+    """
+    Recálculo por registro de PMV/PPD con los mismos argumentos que Recalculoppdpmv.py.
+    Si hay menos mediciones que 'limite', se recorren de nuevo desde el principio.
+    """
+    from pythermalcomfort.models import pmv_ppd_iso
+
+    columnas = mediciones[["t_bul_seco", "t_globo", "vel_air", "hum_rel", "met", "clo"]]
+    filas = columnas.iloc[[i % len(columnas) for i in range(limite)]].itertuples(index=False)
+    inicio = time.perf_counter()
+    n = 0
+    for tdb, tr, vr, rh, met, clo in filas:
+        pmv_ppd_iso(tdb=tdb, tr=tr, vr=vr, rh=rh, met=met, clo=clo, model="7730-2005",
+                    limit_inputs=False, round_output=True)
+        n += 1
+    segundos = time.perf_counter() - inicio
+    return {"registros": n, "segundos": round(segundos, 3), "registros_por_segundo": round(n / segundos, 1)}
+
+
+def bench_optimizador(mediciones, casos: int) -> dict:
+    """Tiempo de calcular_ajuste_optimo sobre las mediciones más calurosas (objetivo PMV 0)."""
+    try:
+        # confortista construye su formulario de Streamlit al importarse
+        logging.getLogger("streamlit").setLevel(logging.ERROR)
+        from confortista import calcular_ajuste_optimo
+    except Exception as e:
+        return {"omitido": f"No se pudo importar confortista: {e}"}
+    from pythermalcomfort.models import pmv_ppd_iso
+
+    muestras, iteraciones = [], []
+    for fila in mediciones.sort_values("t_bul_seco", ascending=False).head(casos).itertuples(index=False):
+        pmv = pmv_ppd_iso(fila.t_bul_seco, fila.t_globo, fila.vel_air, fila.hum_rel, fila.met, fila.clo,
+                          limit_inputs=False).pmv
+        inicio = time.perf_counter()
+        *_, historial = calcular_ajuste_optimo(pmv, fila.t_bul_seco, fila.t_globo, fila.vel_air,
+                                               fila.hum_rel, fila.met, fila.clo, 0.0)
+        muestras.append(time.perf_counter() - inicio)
+        iteraciones.append(len(historial))
+    resultado = _percentiles(muestras)
+    resultado["iteraciones_promedio"] = round(sum(iteraciones) / max(1, len(iteraciones)), 1)
+    return resultado
+
+
+def comparar(actual: dict, base: dict):
+    """Imprime la razón actual/base de cada métrica numérica (>1 en tiempos = regresión)."""
+    def aplanar(d, prefijo=""):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                yield from aplanar(v, f"{prefijo}{k}.")
+            elif isinstance(v, (int, float)) and not isinstance(v, bool):
+                yield f"{prefijo}{k}", v
+
+    valores_base = dict(aplanar(base["resultados"]))
+    print(f"Comparación con {base.get('commit')} ({base.get('fecha')}):")
+    for clave, valor in aplanar(actual["resultados"]):
+        if valores_base.get(clave):
+            print(f"  {clave:55s} {valores_base[clave]:>12} -> {valor:>12}  x{valor / valores_base[clave]:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks con datos sintéticos y base SQLite local.")
+    parser.add_argument("--cuvs", type=int, default=100, help="CUV sintéticos a generar")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=20, help="Informes para medir la latencia")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="Procesos para la exportación masiva (uno o más valores)")
+    parser.add_argument("--registros-pmv", type=int, default=2000, help="Registros para el recálculo de PMV")
+    parser.add_argument("--casos-optimizador", type=int, default=10)
+    parser.add_argument("--omitir", nargs="*", default=[],
+                        choices=["informe", "exportacion", "pmv", "optimizador"])
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    os.chdir(RAIZ)  # doc_utils usa rutas relativas a la raíz (IST.jpg, imagenes-firma, ...)
+    random.seed(args.semilla)
+
+    directorio = tempfile.mkdtemp(prefix="bench_informes_")
+    try:
+        tablas = preparar_entorno(args.cuvs, args.semilla, directorio)
+        cuvs = tablas["higiene_Centros_Trabajo"]["cuv"].tolist()
+        mediciones = tablas["higiene_mediciones_prod"]
+
+        resultados = {"calentamiento_pmv": {"segundos": round(calentamiento.calentar_pmv(), 3),
+                                            "cache_numba": os.environ.get('NUMBA_CACHE_DIR')}}
+        if "informe" not in args.omitir:
+            resultados["informe"] = bench_informe(cuvs, args.repeticiones)
+        if "exportacion" not in args.omitir:
+            resultados["exportacion"] = {f"workers_{w}": bench_exportacion(cuvs, w, directorio) for w in args.workers}
+        if "pmv" not in args.omitir:
+            resultados["recalculo_pmv"] = bench_recalculo_pmv(mediciones, args.registros_pmv)
+        if "optimizador" not in args.omitir:
+            resultados["optimizador"] = bench_optimizador(mediciones, args.casos_optimizador)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    commit = _commit_actual()
+    informe = {
+        "commit": commit,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": {"cuvs": args.cuvs, "semilla": args.semilla, "repeticiones": args.repeticiones,
+                       "workers": args.workers, "registros_pmv": args.registros_pmv,
+                       "casos_optimizador": args.casos_optimizador,
+                       "mediciones": len(mediciones)},
+        "resultados": resultados,
+    }
+
+    ruta = args.salida or os.path.join(DIR_RESULTADOS, f"{datetime.now():%Y%m%d-%H%M%S}_{commit}.json")
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(json.dumps(informe["resultados"], ensure_ascii=False, indent=2))
+    print(f"Resultados guardados en {ruta}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(informe, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Calentamiento del cálculo de PMV/PPD al iniciar un proceso.
+
+pythermalcomfort compila con numba sus modelos al importarse (varios segundos si no hay cache).
+Este módulo:
+  - fija NUMBA_CACHE_DIR en un directorio escribible (.cache/numba por defecto), para que el código
+    compilado se guarde en disco y los procesos siguientes solo lo carguen. Por eso debe importarse
+    antes que cualquier módulo que importe pythermalcomfort (doc_utils, confortista, ...);
+  - ejecuta una vez cada variante de pmv_ppd_iso que usa la aplicación, antes de atender usuarios
+    o de comenzar un lote;
+  - registra la duración en instrumentacion bajo la etapa "arranque.calentamiento_pmv".
+
+Uso (al inicio del script de Streamlit o del proceso de trabajo):
+    import calentamiento
+    calentamiento.calentar_pmv()
+"""
+import os
+import time
+import logging
+import threading
+
+os.environ.setdefault('NUMBA_CACHE_DIR', os.path.abspath(os.path.join('.cache', 'numba')))
+
+_estado = {"segundos": None}
+_lock = threading.Lock()
+
+
+def _variantes_pmv():
+    """Llamadas representativas de cada forma en que la aplicación usa pythermalcomfort."""
+    from pythermalcomfort.models import pmv_ppd_iso
+    from pythermalcomfort.utilities import v_relative
+
+    # form.py, doc_utils.py, Recalculoppdpmv.py
+    pmv_ppd_iso(tdb=27.0, tr=28.0, vr=0.1, rh=50.0, met=1.2, clo=0.5, model="7730-2005",
+                limit_inputs=False, round_output=True)
+    pmv_ppd_iso(tdb=27.0, tr=28.0, vr=0.1, rh=50.0, met=1.2, clo=0.5, model="7730-2005", limit_inputs=False)
+    # confortista.py / mapa*.py (modelo por defecto, argumentos posicionales)
+    pmv_ppd_iso(27.0, 28.0, 0.1, 50.0, 1.2, 0.5, limit_inputs=False)
+    # Cálculo vectorizado (benchmarks/datos_sinteticos.py y recálculos por lote)
+    pmv_ppd_iso(tdb=[27.0, 24.0], tr=[28.0, 24.0], vr=[0.1, 0.3], rh=[50.0, 60.0], met=[1.2, 1.89],
+                clo=[0.5, 0.5], model="7730-2005", limit_inputs=False)
+    v_relative(v=0.1, met=1.2)
+    # Optimizador de confortista.py / mapa10.py
+    import pmv_escalar
+    pmv_escalar.pmv_ppd(27.0, 28.0, 0.1, 50.0, 1.2, 0.5)
+
+
+def calentar_pmv() -> float:
+    """
+    Compila (o carga desde la cache de numba) el cálculo de PMV/PPD. Solo trabaja la primera vez
+    en cada proceso; retorna los segundos que tomó el calentamiento.
+    """
+    with _lock:
+        if _estado["segundos"] is not None:
+            return _estado["segundos"]
+        inicio = time.perf_counter()
+        try:
+            _variantes_pmv()
+        except Exception as e:
+            # El calentamiento nunca debe impedir que el proceso arranque
+            logging.warning(f"No se pudo calentar el cálculo de PMV: {e}")
+        segundos = time.perf_counter() - inicio
+        _estado["segundos"] = segundos
+
+    import instrumentacion
+    instrumentacion.registrar("arranque.calentamiento_pmv", segundos, cache_numba=os.environ.get('NUMBA_CACHE_DIR'))
+    logging.info(f"Cálculo de PMV listo en {segundos:.2f} s (pid {os.getpid()}).")
+    return segundos
+
+
+def duracion_calentamiento():
+    """Segundos que tomó el calentamiento en este proceso, o None si aún no se ejecuta."""
+    return _estado["segundos"]
@@ -1,9 +1,13 @@
 import streamlit as st
+import calentamiento
+import pmv_escalar
 from pythermalcomfort.models import pmv_ppd_iso
 from scipy.optimize import brentq
 import numpy as np
 import pandas as pd
 
+calentamiento.calentar_pmv()
+
 st.header("CONFORTISTA 1.1.20250305")
 st.subheader("Asistente de Control de Confort Térmico")
 
@@ -196,7 +200,7 @@ def calcular_ajuste_optimo(pmv_initial,tdb_initial, tr_initial, vr_initial, rh,
 
     for i in range(max_iter):
 
-        current_pmv = pmv_ppd_iso(tdb_adj, tr_adj, vr_adj, rh, met, clo, limit_inputs=False).pmv
+        current_pmv = pmv_escalar.pmv(tdb_adj, tr_adj, vr_adj, rh, met, clo)
 
         # --- Ajuste dinámico de VR dentro de la iteración ---
         # Regla de ajuste de VR solo si estamos fuera de confort
@@ -207,7 +211,7 @@ def calcular_ajuste_optimo(pmv_initial,tdb_initial, tr_initial, vr_initial, rh,
             elif current_pmv < -1.0 and vr > 1:
                 vr_adj = 1.0
 
-        current_pmv = pmv_ppd_iso(tdb_adj, tr_adj, vr_adj, rh, met, clo, limit_inputs=False).pmv
+        current_pmv = pmv_escalar.pmv(tdb_adj, tr_adj, vr_adj, rh, met, clo)
 
         # --- Optimización de temperaturas considerando VR actual ---
         if target_pmv < current_pmv:  # Enfriar
@@ -235,9 +239,7 @@ def calcular_ajuste_optimo(pmv_initial,tdb_initial, tr_initial, vr_initial, rh,
 
         try:
             candidate2 = brentq(
-                lambda x: pmv_ppd_iso(
-                    tdb=x, tr=x, vr=vr, rh=rh, met=met, clo=clo, limit_inputs=False
-                ).pmv - target_pmv,
+                lambda x: pmv_escalar.pmv(x, x, vr, rh, met, clo) - target_pmv,
                 lower_bound, upper_bound, xtol=0.01
             )
         except Exception as e:
@@ -261,8 +263,7 @@ def calcular_ajuste_optimo(pmv_initial,tdb_initial, tr_initial, vr_initial, rh,
 
         # Recalcular PMV con los nuevos valores
         try:
-            new_pmv = pmv_ppd_iso(tdb_adj, tr_adj, vr_adj, rh, met, clo, limit_inputs=False).pmv
-            new_ppd = pmv_ppd_iso(tdb_adj, tr_adj, vr_adj, rh, met, clo, limit_inputs=False).ppd
+            new_pmv, new_ppd = pmv_escalar.pmv_ppd(tdb_adj, tr_adj, vr_adj, rh, met, clo)
         except Exception as e:
             st.error(f"Error al recalcular PMV en la iteración {i+1}: {str(e)}")
             new_pmv = np.nan
@@ -0,0 +1,323 @@
+"""
+Conversión de informes .docx a PDF con un pool de procesos LibreOffice (headless) ya iniciados.
+
+Cada trabajador mantiene su propio soffice abierto (perfil y puerto propios) y convierte los
+documentos que toma de una cola común, de modo que el costo de arranque de LibreOffice se paga
+una sola vez por trabajador y no por documento. Cada conversión tiene un tiempo máximo; si se
+excede, el soffice del trabajador se termina y se vuelve a iniciar antes del siguiente documento.
+
+La conversión usa el puente UNO de LibreOffice (módulo 'uno', incluido con LibreOffice o en el
+paquete python3-uno), que es obligatorio: sin él no hay forma de mantener soffice abierto entre
+documentos, así que pdf_disponible() retorna False y crear el pool lanza ConversionPDFError.
+Cada soffice corre en su propio grupo de procesos; al excederse el tiempo máximo se termina el
+grupo completo (soffice y soffice.bin), sin dejar procesos huérfanos.
+
+Uso:
+    pdf = convertir_a_pdf(informe_docx)                 # BytesIO -> BytesIO
+    pdfs = convertir_varios({"a.docx": bytes_a, ...})   # conversión concurrente
+    conversiones = ConversionesEnCurso(guardar_pdf)     # lotes: cada PDF se entrega al terminar
+"""
+import os
+import time
+import atexit
+import queue
+import shutil
+import signal
+import socket
+import logging
+import tempfile
+import threading
+import subprocess
+from io import BytesIO
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+SOFFICE_PATH = os.getenv('SOFFICE_PATH') or shutil.which('soffice') or shutil.which('libreoffice') or 'soffice'
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', '2'))
+# Segundos máximos por documento y para que un soffice recién lanzado acepte conexiones
+PDF_TIMEOUT = float(os.getenv('PDF_TIMEOUT', '120'))
+PDF_TIMEOUT_ARRANQUE = float(os.getenv('PDF_TIMEOUT_ARRANQUE', '60'))
+# Se recicla el soffice de un trabajador después de esta cantidad de documentos (fugas de memoria)
+PDF_MAX_DOCS_POR_TRABAJADOR = int(os.getenv('PDF_MAX_DOCS_POR_TRABAJADOR', '200'))
+PDF_PUERTO_BASE = int(os.getenv('PDF_PUERTO_BASE', '2002'))
+# Documentos enviados al pool y aún sin entregar en ConversionesEnCurso (0 = dos por trabajador)
+PDF_MAX_EN_CURSO = int(os.getenv('PDF_MAX_EN_CURSO', '0')) or 2 * PDF_WORKERS
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+_pool = {"pool": None}
+_pool_lock = threading.Lock()
+
+
+class ConversionPDFError(Exception):
+    """Error al convertir un documento a PDF (incluye el tiempo máximo excedido)."""
+
+
+def pdf_disponible() -> bool:
+    """Indica si se puede convertir a PDF: ejecutable de LibreOffice y módulo UNO en el intérprete."""
+    if uno is None:
+        return False
+    return shutil.which(SOFFICE_PATH) is not None or os.path.isfile(SOFFICE_PATH)
+
+
+def _propiedades(**valores):
+    propiedades = []
+    for nombre, valor in valores.items():
+        p = PropertyValue()
+        p.Name = nombre
+        p.Value = valor
+        propiedades.append(p)
+    return tuple(propiedades)
+
+
+class _TrabajadorOffice:
+    """Un proceso soffice headless con perfil y puerto propios."""
+
+    def __init__(self, numero: int, directorio: str):
+        self.numero = numero
+        self.puerto = PDF_PUERTO_BASE + numero
+        self.perfil = os.path.join(directorio, f"perfil_{numero}")
+        self.directorio = os.path.join(directorio, f"trabajo_{numero}")
+        os.makedirs(self.directorio, exist_ok=True)
+        self.proceso = None
+        self.desktop = None
+        self.documentos = 0
+
+    def _comando_base(self) -> list:
+        return [SOFFICE_PATH, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+                "--nolockcheck", f"-env:UserInstallation=file://{os.path.abspath(self.perfil)}"]
+
+    def iniciar(self):
+        # Sesión propia: el grupo de procesos incluye soffice.bin, que soffice lanza como hijo
+        self.proceso = subprocess.Popen(
+            self._comando_base() + [f"--accept=socket,host=127.0.0.1,port={self.puerto};urp;"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+        )
+        contexto_local = uno.getComponentContext()
+        resolver = contexto_local.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", contexto_local
+        )
+        limite = time.monotonic() + PDF_TIMEOUT_ARRANQUE
+        while True:
+            try:
+                contexto = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={self.puerto};urp;StarOffice.ComponentContext"
+                )
+                break
+            except Exception:
+                if time.monotonic() > limite or self.proceso.poll() is not None:
+                    self.terminar()
+                    raise ConversionPDFError(f"LibreOffice (trabajador {self.numero}) no inició a tiempo.")
+                time.sleep(0.25)
+        self.desktop = contexto.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", contexto)
+        self.documentos = 0
+        logging.info(f"Trabajador PDF {self.numero} listo (puerto {self.puerto}).")
+
+    def terminar(self):
+        """Termina el soffice del trabajador (también se usa para cortar una conversión colgada)."""
+        self.desktop = None
+        if self.proceso is not None:
+            try:
+                os.killpg(self.proceso.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            try:
+                self.proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+        self.proceso = None
+
+    def listo(self) -> bool:
+        return self.desktop is not None and self.proceso is not None and self.proceso.poll() is None
+
+    def convertir(self, contenido: bytes, timeout: float) -> bytes:
+        ruta_docx = os.path.join(self.directorio, "entrada.docx")
+        ruta_pdf = os.path.join(self.directorio, "entrada.pdf")
+        with open(ruta_docx, "wb") as f:
+            f.write(contenido)
+        if os.path.exists(ruta_pdf):
+            os.remove(ruta_pdf)
+
+        # Si la conversión se cuelga, el temporizador termina soffice y la llamada UNO falla
+        vencido = threading.Event()
+
+        def cortar():
+            vencido.set()
+            self.terminar()
+
+        vigilante = threading.Timer(timeout, cortar)
+        vigilante.start()
+        try:
+            documento = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(ruta_docx)), "_blank", 0, _propiedades(Hidden=True)
+            )
+            try:
+                documento.storeToURL(uno.systemPathToFileUrl(os.path.abspath(ruta_pdf)),
+                                     _propiedades(FilterName="writer_pdf_Export"))
+            finally:
+                documento.close(True)
+        except Exception as e:
+            if vencido.is_set():
+                raise ConversionPDFError(f"La conversión excedió {timeout:.0f} s.")
+            raise ConversionPDFError(f"Error de LibreOffice: {e}")
+        finally:
+            vigilante.cancel()
+        self.documentos += 1
+
+        if not os.path.exists(ruta_pdf):
+            raise ConversionPDFError("LibreOffice no generó el PDF.")
+        with open(ruta_pdf, "rb") as f:
+            return f.read()
+
+
+class PoolPDF:
+    """Cola de documentos atendida por 'workers' trabajadores LibreOffice."""
+
+    def __init__(self, workers: int = None, timeout: float = None):
+        if uno is None:
+            raise ConversionPDFError(
+                "La conversión a PDF requiere el módulo 'uno' de LibreOffice (paquete python3-uno) "
+                "en el intérprete que ejecuta la aplicación."
+            )
+        self.workers = max(1, workers or PDF_WORKERS)
+        self.timeout = timeout or PDF_TIMEOUT
+        self.cola = queue.Queue()
+        self.directorio = tempfile.mkdtemp(prefix="pool_pdf_")
+        self.hilos = []
+        for numero in range(self.workers):
+            hilo = threading.Thread(target=self._atender, args=(_TrabajadorOffice(numero, self.directorio),),
+                                    name=f"pdf-{numero}", daemon=True)
+            hilo.start()
+            self.hilos.append(hilo)
+
+    def _atender(self, trabajador: _TrabajadorOffice):
+        # Se inicia LibreOffice al crear el pool, antes de que llegue el primer documento
+        try:
+            trabajador.iniciar()
+        except Exception as e:
+            logging.error(f"No se pudo iniciar el trabajador PDF {trabajador.numero}: {e}")
+        while True:
+            tarea = self.cola.get()
+            if tarea is None:
+                trabajador.terminar()
+                return
+            contenido, timeout, futuro = tarea
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                if not trabajador.listo() or trabajador.documentos >= PDF_MAX_DOCS_POR_TRABAJADOR:
+                    trabajador.terminar()
+                    trabajador.iniciar()
+                futuro.set_result(trabajador.convertir(contenido, timeout or self.timeout))
+            except Exception as e:
+                logging.error(f"Trabajador PDF {trabajador.numero}: {e}")
+                # Se recicla el soffice para que el siguiente documento no herede un estado inválido
+                trabajador.terminar()
+                futuro.set_exception(e if isinstance(e, ConversionPDFError) else ConversionPDFError(str(e)))
+
+    def enviar(self, contenido: bytes, timeout: float = None) -> Future:
+        """Encola un .docx (bytes) y retorna un Future con los bytes del PDF."""
+        futuro = Future()
+        self.cola.put((contenido, timeout, futuro))
+        return futuro
+
+    def cerrar(self):
+        for _ in self.hilos:
+            self.cola.put(None)
+        for hilo in self.hilos:
+            hilo.join(timeout=30)
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+def _puerto_libre(puerto: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        return s.connect_ex(("127.0.0.1", puerto)) != 0
+
+
+def obtener_pool() -> PoolPDF:
+    """Pool compartido del proceso (se crea en el primer uso)."""
+    global PDF_PUERTO_BASE
+    with _pool_lock:
+        if _pool["pool"] is None:
+            # Otro proceso (por ejemplo, otro worker de jobs.py) puede estar usando los puertos por defecto
+            while not all(_puerto_libre(PDF_PUERTO_BASE + i) for i in range(PDF_WORKERS)):
+                PDF_PUERTO_BASE += PDF_WORKERS
+            _pool["pool"] = PoolPDF()
+        return _pool["pool"]
+
+
+def cerrar_pool():
+    """Termina los procesos LibreOffice del pool compartido."""
+    with _pool_lock:
+        if _pool["pool"] is not None:
+            _pool["pool"].cerrar()
+            _pool["pool"] = None
+
+
+# Los soffice son procesos aparte: se terminan al salir para no dejarlos huérfanos
+atexit.register(cerrar_pool)
+
+
+def convertir_a_pdf(docx, timeout: float = None) -> BytesIO:
+    """Convierte un informe .docx (BytesIO o bytes) a PDF usando el pool compartido."""
+    contenido = docx.getvalue() if isinstance(docx, BytesIO) else docx
+    return BytesIO(obtener_pool().enviar(contenido, timeout).result())
+
+
+def convertir_varios(documentos: dict, timeout: float = None) -> dict:
+    """
+    Convierte concurrentemente {nombre: bytes_docx}. Retorna {nombre: bytes_pdf o ConversionPDFError}.
+    """
+    pool = obtener_pool()
+    futuros = {nombre: pool.enviar(contenido, timeout) for nombre, contenido in documentos.items()}
+    resultados = {}
+    for nombre, futuro in futuros.items():
+        try:
+            resultados[nombre] = futuro.result()
+        except ConversionPDFError as e:
+            resultados[nombre] = e
+    return resultados
+
+
+class ConversionesEnCurso:
+    """
+    Conversiones de un lote con un máximo de documentos en curso. Cada resultado se entrega a
+    al_terminar(clave, bytes_pdf o ConversionPDFError) apenas está listo, en el hilo del llamador
+    (dentro de enviar(), recoger() o terminar()), de modo que los PDF se guardan a medida que se
+    convierten y el lote no acumula en memoria los documentos ya convertidos.
+    """
+
+    def __init__(self, al_terminar, max_en_curso: int = None, timeout: float = None):
+        self.al_terminar = al_terminar
+        self.max_en_curso = max(1, max_en_curso or PDF_MAX_EN_CURSO)
+        self.timeout = timeout
+        self.pool = obtener_pool()
+        self.futuros = {}
+
+    def _entregar(self, futuros):
+        for futuro in futuros:
+            clave = self.futuros.pop(futuro)
+            try:
+                resultado = futuro.result()
+            except ConversionPDFError as e:
+                resultado = e
+            self.al_terminar(clave, resultado)
+
+    def enviar(self, clave, contenido: bytes):
+        """Encola un .docx; si ya hay max_en_curso documentos en curso, espera a que termine alguno."""
+        while len(self.futuros) >= self.max_en_curso:
+            listos, _ = wait(self.futuros, return_when=FIRST_COMPLETED)
+            self._entregar(listos)
+        self.futuros[self.pool.enviar(contenido, self.timeout)] = clave
+
+    def recoger(self):
+        """Entrega los resultados ya listos sin esperar."""
+        self._entregar([f for f in self.futuros if f.done()])
+
+    def terminar(self):
+        """Espera y entrega todos los resultados pendientes."""
+        listos, _ = wait(self.futuros)
+        self._entregar(listos)
@@ -0,0 +1,96 @@
+import streamlit as st
+from datetime import date
+
+import analitica
+import datos_compartidos
+
+st.set_page_config(page_title="Temporada Confort Térmico", layout="wide")
+datos_compartidos.activar_copy_on_write()
+
+# Segundos que se reutilizan los resultados de una consulta entre sesiones
+ANALITICA_TTL = 300
+
+ETIQUETAS = {
+    "region": "Región",
+    "comuna": "Comuna",
+    "area": "Área",
+    "consultor_zonal": "Consultor zonal",
+    "consultor": "Consultor IST",
+}
+
+
+def consultar(nombre, funcion, *args):
+    """Resultado de analitica.<funcion>(*args), compartido por las sesiones durante ANALITICA_TTL."""
+    clave = f"analitica:{nombre}:{args!r}"
+    return datos_compartidos.obtener_o_cargar(clave, lambda: funcion(*args), ttl=ANALITICA_TTL)
+
+
+def main():
+    st.header("Temporada de evaluaciones de confort térmico")
+    st.caption("Todas las cifras se calculan en la base de datos a partir del resumen por visita y área.")
+
+    hoy = date.today()
+    with st.sidebar:
+        fecha_desde = st.date_input("Desde", value=date(hoy.year, 1, 1))
+        fecha_hasta = st.date_input("Hasta", value=hoy)
+        opciones_region = ["Todas"] + list(consultar("regiones", analitica.regiones))
+        region = st.selectbox("Región", opciones_region)
+        if st.button("Actualizar resumen"):
+            resultado = analitica.refrescar_incremental()
+            datos_compartidos.invalidar(prefijo="analitica:")
+            st.success(f"{resultado['filas']} filas actualizadas.")
+        estado = consultar("estado", analitica.estado_resumen)
+        st.caption(f"Resumen actualizado: {estado['actualizado'] or 'nunca'}")
+
+    filtros = (fecha_desde.isoformat(), fecha_hasta.isoformat(), None if region == "Todas" else region)
+
+    general = consultar("general", analitica.resumen_general, *filtros)
+    if not general["areas"]:
+        st.info("No hay evaluaciones en el período seleccionado.")
+        return
+
+    cols = st.columns(4)
+    cols[0].metric("Centros evaluados", int(general["centros"]))
+    cols[1].metric("Visitas", int(general["visitas"]))
+    cols[2].metric("Áreas evaluadas", int(general["areas"]))
+    cols[3].metric("Áreas que cumplen", f"{general['tasa_cumplimiento'] * 100:.1f}%")
+
+    st.subheader("Cumplimiento")
+    dimension = st.radio("Agrupar por", list(ETIQUETAS), format_func=ETIQUETAS.get, horizontal=True)
+    df_cumplimiento = consultar(f"cumplimiento:{dimension}", analitica.cumplimiento_por, dimension, *filtros)
+    df_cumplimiento = df_cumplimiento.assign(
+        tasa_cumplimiento=(df_cumplimiento["tasa_cumplimiento"] * 100).round(1),
+        pmv_prom=df_cumplimiento["pmv_prom"].round(2),
+    )
+    if dimension == "area":
+        df_cumplimiento["area"] = df_cumplimiento["area"].str.capitalize()
+    st.bar_chart(df_cumplimiento.set_index(dimension)["tasa_cumplimiento"])
+    st.dataframe(
+        df_cumplimiento.rename(columns={
+            dimension: ETIQUETAS[dimension], "areas": "Áreas", "areas_cumplen": "Cumplen",
+            "tasa_cumplimiento": "Cumplimiento (%)", "pmv_prom": "PMV promedio", "centros": "Centros",
+        }),
+        hide_index=True,
+    )
+
+    st.subheader("Distribución del PMV por área")
+    df_pmv = consultar("pmv", analitica.distribucion_pmv, 0.5, *filtros)
+    df_pmv["tramo"] = [f"{d:+.1f} a {h:+.1f}" for d, h in zip(df_pmv["desde"], df_pmv["hasta"])]
+    st.bar_chart(df_pmv.set_index("tramo")["areas"])
+
+    st.subheader("Centros con más áreas que no cumplen")
+    df_peores = consultar("peores", analitica.peores_centros, 20, *filtros)
+    st.dataframe(
+        df_peores.assign(pmv_abs_max=df_peores["pmv_abs_max"].round(2)).rename(columns={
+            "cuv": "CUV", "nombre_ct": "Centro", "region_ct": "Región", "comuna_ct": "Comuna",
+            "areas": "Áreas", "areas_no_cumplen": "No cumplen", "pmv_abs_max": "|PMV| máximo",
+            "ultima_visita": "Última visita",
+        }),
+        hide_index=True,
+    )
+
+    datos_compartidos.mostrar_memoria_sesion()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,22 @@
 import os
+import re
+import time
+import threading
 import pyodbc
 import pandas as pd
 import logging
 
+import analitica
+from instrumentacion import medido
+from esquema_informe import (
+    COLUMNAS_CENTRO_INFORME,
+    COLUMNAS_VISITA_INFORME,
+    COLUMNAS_MEDICION_INFORME,
+    COLUMNAS_EQUIPO_INFORME,
+    aplicar_tipos_informe,
+    normalizar_mediciones,
+)
+
 # Configuración de la base de datos utilizando variables de entorno
 server = os.getenv('DB_SERVER', '170.110.40.38')
 database = os.getenv('DB_DATABASE', 'ept_modprev')
@@ -32,6 +46,7 @@ def get_db_connection():
         logging.error(f"Error al conectar a la base de datos: {e}")
         raise
 
+@medido("db.get_centro")
 def get_centro(cuv: str) -> pd.DataFrame:
     """
     Obtiene la información del centro de trabajo (tabla higiene_Centros_Trabajo)
@@ -43,6 +58,7 @@ def get_centro(cuv: str) -> pd.DataFrame:
     connection.close()
     return df
 
+@medido("db.get_visita")
 def get_visita(cuv: str) -> pd.DataFrame:
     """
     Obtiene las visitas de la tabla higiene_Visitas para el CUV indicado, ordenadas
@@ -58,6 +74,7 @@ def get_visita(cuv: str) -> pd.DataFrame:
     connection.close()
     return df
 
+@medido("db.get_mediciones")
 def get_mediciones(visita_id: int) -> pd.DataFrame:
     """
     Obtiene las mediciones de la tabla higiene_Mediciones asociadas a la visita indicada.
@@ -67,8 +84,9 @@ def get_mediciones(visita_id: int) -> pd.DataFrame:
     # Convertimos visita_id a entero (tipo int) para evitar el error de parámetro
     df = pd.read_sql(query, connection, params=[int(visita_id)])
     connection.close()
-    return df
+    return normalizar_mediciones(df)
 
+@medido("db.get_equipos")
 def get_equipos() -> pd.DataFrame:
     """
     Obtiene toda la información de los equipos de medición de la tabla higiene_Equipos_Medicion.
@@ -79,6 +97,56 @@ def get_equipos() -> pd.DataFrame:
     connection.close()
     return df
 
+# Mapa equipo_dicc -> id_equipo cargado una vez por proceso. Los códigos ("T3", "V7", ...)
+# cambian muy rara vez, por lo que se recarga solo al vencer el TTL o al invalidarlo.
+EQUIPOS_DICC_TTL = int(os.getenv('EQUIPOS_DICC_TTL', '86400'))
+_mapa_equipos = {"mapa": None, "cargado": 0.0}
+_mapa_equipos_lock = threading.Lock()
+
+
+def get_mapa_equipos(forzar: bool = False) -> dict:
+    """
+    Retorna el diccionario equipo_dicc -> id_equipo de higiene_Equipos_Medicion.
+    Se consulta la base de datos solo la primera vez, al vencer el TTL o si 'forzar' es True.
+    """
+    with _mapa_equipos_lock:
+        vigente = time.monotonic() - _mapa_equipos["cargado"] < EQUIPOS_DICC_TTL
+        if _mapa_equipos["mapa"] is not None and vigente and not forzar:
+            return _mapa_equipos["mapa"]
+
+        connection = get_db_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "SELECT equipo_dicc, id_equipo FROM higiene_Equipos_Medicion WHERE equipo_dicc IS NOT NULL"
+            )
+            mapa = {str(codigo).strip(): id_equipo for codigo, id_equipo in cursor.fetchall()}
+            cursor.close()
+        finally:
+            connection.close()
+
+        _mapa_equipos["mapa"] = mapa
+        _mapa_equipos["cargado"] = time.monotonic()
+        logging.info(f"Mapa de equipos cargado ({len(mapa)} códigos).")
+        return mapa
+
+
+def invalidar_mapa_equipos():
+    """Descarta el mapa de equipos para que se recargue en la próxima consulta."""
+    with _mapa_equipos_lock:
+        _mapa_equipos["mapa"] = None
+
+
+def get_codigos_equipo(prefijo: str) -> list:
+    """
+    Retorna los códigos de equipo que comienzan con 'prefijo' ("T" temperatura, "V" velocidad de aire),
+    ordenados numéricamente (T1, T2, ..., T10).
+    """
+    codigos = [c for c in get_mapa_equipos() if c.upper().startswith(prefijo.upper())]
+    return sorted(codigos, key=lambda c: [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", c)])
+
+
+@medido("db.get_all_cuvs_with_visits")
 def get_all_cuvs_with_visits():
     """Obtiene todos los CUV únicos que tienen visitas registradas."""
     connection = get_db_connection()
@@ -88,44 +156,160 @@ def get_all_cuvs_with_visits():
     return df['cuv_visita'].tolist()
 
 
+@medido("db.get_cuvs_filtrados")
+def get_cuvs_filtrados(fecha_desde=None, fecha_hasta=None, region=None, consultor=None) -> list:
+    """
+    Obtiene los CUV con visitas registradas que cumplen los filtros indicados
+    (rango de fecha de visita, región del centro y/o nombre del consultor IST).
+    Los filtros en None no se aplican.
+    """
+    condiciones = []
+    params = []
+    if fecha_desde is not None:
+        condiciones.append("v.fecha_visita >= ?")
+        params.append(fecha_desde)
+    if fecha_hasta is not None:
+        condiciones.append("v.fecha_visita <= ?")
+        params.append(fecha_hasta)
+    if region:
+        condiciones.append("c.region_ct = ?")
+        params.append(region)
+    if consultor:
+        condiciones.append("v.consultor_ist = ?")
+        params.append(consultor)
+
+    query = """
+        SELECT DISTINCT v.cuv_visita
+        FROM higiene_Visitas_prod v
+        LEFT JOIN higiene_Centros_Trabajo c ON c.cuv = v.cuv_visita
+    """
+    if condiciones:
+        query += " WHERE " + " AND ".join(condiciones)
+
+    connection = get_db_connection()
+    df = pd.read_sql(query, connection, params=params)
+    connection.close()
+    return df['cuv_visita'].tolist()
+
+
+def _leer_informe(query: str, params=None) -> pd.DataFrame:
+    connection = get_db_connection()
+    try:
+        df = pd.read_sql(query, connection, params=params)
+    finally:
+        connection.close()
+    return aplicar_tipos_informe(df)
+
+
+@medido("db.get_centro_informe")
+def get_centro_informe(cuv: str) -> pd.DataFrame:
+    """Como get_centro, pero solo con las columnas que usa el informe."""
+    query = f"SELECT {', '.join(COLUMNAS_CENTRO_INFORME)} FROM higiene_Centros_Trabajo WHERE cuv = ?"
+    return _leer_informe(query, [cuv])
+
+
+@medido("db.get_ultima_visita")
+def get_ultima_visita(cuv: str) -> pd.DataFrame:
+    """
+    Visita más reciente del CUV (una fila como máximo), con las columnas que usa el informe.
+    A diferencia de get_visita, no trae el historial completo de visitas.
+    """
+    query = f"""
+        SELECT TOP 1 {', '.join(COLUMNAS_VISITA_INFORME)}
+        FROM higiene_Visitas_prod
+        WHERE cuv_visita = ?
+        ORDER BY fecha_visita DESC, hora_visita DESC
+    """
+    return _leer_informe(query, [cuv])
+
+
+@medido("db.get_mediciones_informe")
+def get_mediciones_informe(visita_id: int) -> pd.DataFrame:
+    """Como get_mediciones, pero solo con las columnas que usa el informe y con tipos declarados."""
+    query = f"SELECT {', '.join(COLUMNAS_MEDICION_INFORME)} FROM higiene_mediciones_prod WHERE visita_id = ?"
+    return normalizar_mediciones(_leer_informe(query, [int(visita_id)]))
+
+
+@medido("db.get_equipos_informe")
+def get_equipos_informe() -> pd.DataFrame:
+    """Catálogo de equipos con las columnas del Anexo 2 del informe."""
+    return _leer_informe(f"SELECT {', '.join(COLUMNAS_EQUIPO_INFORME)} FROM higiene_Equipos_Medicion")
+
+
+def get_datos_informe(cuv: str, df_equipos: pd.DataFrame = None):
+    """
+    Reúne los DataFrames necesarios para generar el informe de un CUV:
+    (df_centro, df_visitas, df_mediciones, df_equipos).
+    Solo se consulta la última visita y las columnas que usa el informe.
+    Si se entrega 'df_equipos', se reutiliza en vez de consultarlo nuevamente.
+    """
+    df_centro = get_centro_informe(cuv)
+    df_visitas = get_ultima_visita(cuv)
+    if df_visitas.empty:
+        df_mediciones = pd.DataFrame(columns=COLUMNAS_MEDICION_INFORME)
+    else:
+        df_mediciones = get_mediciones_informe(df_visitas.iloc[0]["id_visita"])
+    if df_equipos is None:
+        df_equipos = get_equipos_informe()
+    return df_centro, df_visitas, df_mediciones, df_equipos
+
+
+@medido("db.insertar_visita")
 def insertar_visita(cuv, fecha_visita, hora_medicion, temp_max, motivo_evaluacion,
                     nombre_personal, cargo, consultor_ist, cod_equipo_t, cod_equipo_v,
                     patron_tbs, verif_tbs_inicial, patron_tbh, verif_tbh_inicial,
-                    patron_tg, verif_tg_inicial, consultor_cargo, consultor_zonal):
+                    patron_tg, verif_tg_inicial, consultor_cargo, consultor_zonal, guid_envio=None):
+    """
+    Inserta la visita y retorna su id_visita (None si falla).
+    Si se entrega 'guid_envio' (identificador generado por el cliente, ver almacen_local) y ya
+    existe una visita con ese valor, no se inserta otra y se retorna la existente.
+    """
+
+    # Resolución de códigos de equipo desde el mapa en memoria; si algún código no está
+    # (equipo recién agregado), se recarga el mapa una vez antes de rechazar la visita.
+    mapa = get_mapa_equipos()
+    if cod_equipo_t not in mapa or cod_equipo_v not in mapa:
+        mapa = get_mapa_equipos(forzar=True)
+    id_equipo_t = mapa.get(cod_equipo_t)
+    id_equipo_v = mapa.get(cod_equipo_v)
+
+    if id_equipo_t is None or id_equipo_v is None:
+        logging.error(f"No se encontraron equipos en higiene_Equipos_Medicion para: "
+                      f"T={cod_equipo_t}, V={cod_equipo_v}")
+        return None
 
     connection = get_db_connection()
     cursor = connection.cursor()
 
     try:
-        cursor.execute("SELECT id_equipo FROM higiene_Equipos_Medicion WHERE equipo_dicc = ?", (cod_equipo_t,))
-        row_temp = cursor.fetchone()
-        id_equipo_t = row_temp[0] if row_temp else None
-
-        cursor.execute("SELECT id_equipo FROM higiene_Equipos_Medicion WHERE equipo_dicc = ?", (cod_equipo_v,))
-        row_vel = cursor.fetchone()
-        id_equipo_v = row_vel[0] if row_vel else None
-
-        if id_equipo_t is None or id_equipo_v is None:
-            logging.error(f"No se encontraron equipos en higiene_Equipos_Medicion para: "
-                          f"T={cod_equipo_t}, V={cod_equipo_v}")
-            return None
+        if guid_envio:
+            # UPDLOCK + HOLDLOCK: dos envíos simultáneos del mismo guid no pueden insertar ambos
+            cursor.execute(
+                "SELECT id_visita FROM higiene_Visitas_prod WITH (UPDLOCK, HOLDLOCK) WHERE guid_envio = ?",
+                (guid_envio,)
+            )
+            existente = cursor.fetchone()
+            if existente:
+                connection.commit()
+                logging.info(f"Visita con guid_envio {guid_envio} ya registrada (id_visita {existente[0]}).")
+                return existente[0]
 
         insert_query = """
         INSERT INTO higiene_Visitas_prod (
             cuv_visita, fecha_visita, hora_visita, temperatura_dia, motivo_evaluacion,
             nombre_personal_visita, cargo_personal_visita, consultor_ist,
             equipo_temp, equipo_vel_air, patron_tbs, ver_tbs_ini, 
-            patron_tbh, ver_tbh_ini, patron_tg, ver_tg_ini, consultor_cargo, consultor_zonal
+            patron_tbh, ver_tbh_ini, patron_tg, ver_tg_ini, consultor_cargo, consultor_zonal, guid_envio
         ) 
         OUTPUT INSERTED.id_visita
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
 
         cursor.execute(insert_query, (
             cuv, fecha_visita, hora_medicion, temp_max, motivo_evaluacion,
             nombre_personal, cargo, consultor_ist, id_equipo_t, id_equipo_v,
             patron_tbs, verif_tbs_inicial, patron_tbh, verif_tbh_inicial,
-            patron_tg, verif_tg_inicial, consultor_cargo, consultor_zonal
+            patron_tg, verif_tg_inicial, consultor_cargo, consultor_zonal, guid_envio
         ))
 
         id_visita = cursor.fetchone()[0]
@@ -144,6 +328,7 @@ def insertar_visita(cuv, fecha_visita, hora_medicion, temp_max, motivo_evaluacio
         cursor.close()
         connection.close()
 
+@medido("db.insert_verif_final_visita")
 def insert_verif_final_visita(id_visita, verif_tbs_final, verif_tbh_final, verif_tg_final, comentarios_finales):
     connection = get_db_connection()
     cursor = connection.cursor()
@@ -176,6 +361,7 @@ def insert_verif_final_visita(id_visita, verif_tbs_final, verif_tbh_final, verif
         connection.close()
 
 
+@medido("db.insertar_medicion")
 def insertar_medicion(visita_id, nombre_area, sector_especifico, puesto_trabajo,
                       posicion_trabajador, vestimenta_trabajador, t_bul_seco, t_globo,
                       hum_rel, vel_air, ppd, pmv, resultado_medicion, cond_techumbre,
@@ -215,6 +401,7 @@ def insertar_medicion(visita_id, nombre_area, sector_especifico, puesto_trabajo,
         id_medicion = cursor.fetchone()[0]  # Obtener el ID insertado
         connection.commit()
         logging.info(f"Medición insertada con éxito. ID: {id_medicion}")
+        analitica.refrescar_despues_de_insertar(visita_id)
 
         return id_medicion
 
@@ -225,4 +412,88 @@ def insertar_medicion(visita_id, nombre_area, sector_especifico, puesto_trabajo,
 
     finally:
         cursor.close()
-        connection.close()
\ No newline at end of file
+        connection.close()
+
+# Columnas de higiene_mediciones_prod en el orden en que se insertan
+# (mismo orden que los parámetros de insertar_medicion).
+MEDICION_COLUMNS = [
+    "visita_id", "nombre_area", "sector_especifico", "puesto_trabajo", "posicion_trabajador", "vestimenta_trabajador",
+    "t_bul_seco", "t_globo", "hum_rel", "vel_air", "ppd", "pmv", "resultado_medicion", "cond_techumbre", "obs_techumbre",
+    "cond_paredes", "obs_paredes", "cond_vantanal", "obs_ventanal", "cond_aire_acond", "obs_aire_acond",
+    "cond_ventiladores", "obs_ventiladores", "cond_inyeccion_extraccion", "obs_inyeccion_extraccion",
+    "cond_ventanas", "obs_ventanas", "cond_puertas", "obs_puertas", "cond_otras", "obs_otras", "met", "clo"
+]
+
+# SQL Server admite como máximo 2100 parámetros por sentencia.
+_MAX_FILAS_POR_INSERT = 2000 // (len(MEDICION_COLUMNS) + 2)
+
+
+@medido("db.insertar_mediciones_batch")
+def insertar_mediciones_batch(visita_id, rows):
+    """
+    Inserta todas las mediciones de una visita en una sola conexión y transacción.
+
+    'rows' es una lista de diccionarios con las claves de MEDICION_COLUMNS (sin 'visita_id').
+    Cada bloque de filas es un único round-trip: un MERGE sobre una tabla VALUES que numera las
+    filas (rn); las filas sin 'guid_envio' nunca coinciden, de modo que se insertan. A diferencia de
+    INSERT ... OUTPUT INSERTED, el OUTPUT de un MERGE puede devolver columnas del origen, así que
+    cada id_medicion se asocia a su fila por rn y no por el orden en que SQL Server lo entrega
+    (que no está garantizado).
+
+    Si una fila trae 'guid_envio' (identificador generado por el cliente, ver almacen_local) y
+    ya existe una medición con ese valor, no se inserta de nuevo: la rama WHEN MATCHED no cambia
+    la fila pero hace que el OUTPUT entregue su id_medicion.
+
+    Retorna la lista de id_medicion en el mismo orden de 'rows', o None si falla
+    (en cuyo caso no queda ninguna medición escrita).
+    """
+    if not visita_id or not rows:
+        logging.error("Datos de medición incompletos. No se insertará en la base de datos.")
+        return None
+
+    for row in rows:
+        if "Seleccione..." in (row.get("nombre_area"), row.get("sector_especifico"), row.get("puesto_trabajo")):
+            logging.error("Datos de medición incompletos. No se insertará en la base de datos.")
+            return None
+
+    columnas = ", ".join(MEDICION_COLUMNS + ["guid_envio"])
+    columnas_origen = ", ".join(f"src.{col}" for col in MEDICION_COLUMNS + ["guid_envio"])
+    placeholder_fila = "(" + ", ".join("?" for _ in range(len(MEDICION_COLUMNS) + 2)) + ")"
+
+    connection = get_db_connection()
+    cursor = connection.cursor()
+
+    try:
+        ids = [None] * len(rows)
+        for inicio in range(0, len(rows), _MAX_FILAS_POR_INSERT):
+            bloque = rows[inicio:inicio + _MAX_FILAS_POR_INSERT]
+            insert_query = (
+                f"MERGE INTO higiene_mediciones_prod WITH (HOLDLOCK) AS dst "
+                f"USING (VALUES {', '.join(placeholder_fila for _ in bloque)}) AS src (rn, {columnas}) "
+                f"ON dst.guid_envio = src.guid_envio "
+                f"WHEN MATCHED THEN UPDATE SET dst.guid_envio = src.guid_envio "
+                f"WHEN NOT MATCHED THEN INSERT ({columnas}) VALUES ({columnas_origen}) "
+                f"OUTPUT src.rn, INSERTED.id_medicion;"
+            )
+            params = []
+            for rn, row in enumerate(bloque, start=inicio):
+                params.extend([rn, visita_id] + [row.get(col) for col in MEDICION_COLUMNS[1:]] + [row.get("guid_envio")])
+
+            cursor.execute(insert_query, params)
+            for rn, id_medicion in cursor.fetchall():
+                ids[rn] = id_medicion
+
+        connection.commit()
+        logging.info(f"{len(ids)} mediciones insertadas para la visita {visita_id}. IDs: {ids}")
+        analitica.refrescar_despues_de_insertar(visita_id)
+
+        return ids
+
+    except pyodbc.Error as e:
+        logging.error(f"Error al insertar las mediciones de la visita {visita_id}: {e}")
+        connection.rollback()
+        return None
+
+    finally:
+        cursor.close()
+        connection.close()
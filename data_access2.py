@@ -1,8 +1,140 @@
+import io
+import os
+import time
+import logging
+import threading
+import requests
 import pandas as pd
 
+import datos_compartidos
+
+# Tiempo (segundos) durante el cual se confía en la copia local de cada hoja publicada.
+# Pasado ese tiempo se revalida contra Google con ETag / Last-Modified.
+SHEETS_TTL = int(os.getenv('SHEETS_TTL', '300'))
+
+# Cache en memoria del proceso: url -> {"df", "etag", "last_modified", "fetched_at", "indices"}
+_sheets_cache = {}
+_sheets_lock = threading.Lock()
+
+
+def _descargar_csv(csv_url: str, entrada=None):
+    """
+    Descarga el CSV publicado. Si existe una entrada previa en cache, envía los
+    encabezados condicionales para que el servidor responda 304 cuando no haya cambios.
+    Retorna (response, contenido_cambiado).
+    """
+    headers = {}
+    if entrada is not None:
+        if entrada.get("etag"):
+            headers["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            headers["If-Modified-Since"] = entrada["last_modified"]
+
+    response = requests.get(csv_url, headers=headers, timeout=30)
+    if response.status_code == 304:
+        return response, False
+    response.raise_for_status()
+    return response, True
+
+
+def get_data_cached(csv_url: str, ttl: int = None) -> pd.DataFrame:
+    """
+    Lee un CSV remoto usando una cache con TTL y revalidación por ETag.
+    Dentro del TTL se retorna la copia en memoria sin tocar la red; al vencer,
+    se hace un GET condicional y solo se vuelve a parsear si el contenido cambió.
+    Si la revalidación falla por red, se sigue sirviendo la última copia conocida.
+    La hoja se guarda una sola vez por proceso y cada llamada recibe una vista (Copy-on-Write),
+    de modo que una sesión que la modifique no altera la de las demás.
+    """
+    ttl = SHEETS_TTL if ttl is None else ttl
+    ahora = time.monotonic()
+
+    with _sheets_lock:
+        entrada = _sheets_cache.get(csv_url)
+        if entrada is not None and ahora - entrada["fetched_at"] < ttl:
+            return datos_compartidos.vista(entrada["df"])
+
+    try:
+        response, cambiado = _descargar_csv(csv_url, entrada)
+    except requests.RequestException as e:
+        if entrada is not None:
+            logging.warning(f"No se pudo revalidar la hoja {csv_url}, se usa la copia en cache: {e}")
+            return datos_compartidos.vista(entrada["df"])
+        raise
+
+    with _sheets_lock:
+        if not cambiado and entrada is not None:
+            entrada["fetched_at"] = ahora
+            return datos_compartidos.vista(entrada["df"])
+
+        df = pd.read_csv(io.BytesIO(response.content))
+        _sheets_cache[csv_url] = {
+            "df": df,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": ahora,
+            "indices": {},
+        }
+        logging.info(f"Hoja {csv_url} descargada ({len(df)} filas).")
+        return datos_compartidos.vista(df)
+
+
 def get_data(csv_url: str) -> pd.DataFrame:
     """
     Lee los datos desde un CSV remoto (o local) y retorna un DataFrame de pandas.
+    Las URL http(s) pasan por la cache con TTL; las rutas locales se leen directamente.
     """
+    if csv_url.startswith(("http://", "https://")):
+        return get_data_cached(csv_url)
     df = pd.read_csv(csv_url)
     return df
+
+
+def _indice_cuv(csv_url: str, cuv_col: str):
+    """
+    (df, indice) de la misma versión de la hoja, leídos juntos bajo el lock.
+    La columna de CUV normalizada (str + strip) se calcula en una serie aparte: el DataFrame
+    compartido con las demás sesiones no se modifica.
+    """
+    get_data_cached(csv_url)
+    with _sheets_lock:
+        entrada = _sheets_cache[csv_url]
+        df = entrada["df"]
+        indice = entrada["indices"].get(cuv_col)
+        if indice is None:
+            if cuv_col in df.columns:
+                claves = df[cuv_col].astype(str).str.strip()
+                indice = claves.groupby(claves, sort=False).indices
+            else:
+                indice = {}
+            entrada["indices"][cuv_col] = indice
+        return datos_compartidos.vista(df), indice
+
+
+def get_cuv_index(csv_url: str, cuv_col: str = "CUV") -> dict:
+    """
+    Retorna un diccionario CUV -> posiciones de fila para la hoja indicada.
+    La columna de CUV se normaliza (str + strip) una sola vez por versión de la hoja,
+    por lo que cada búsqueda posterior es O(1).
+    """
+    return _indice_cuv(csv_url, cuv_col)[1]
+
+
+def buscar_por_cuv(csv_url: str, cuv, cuv_col: str = "CUV") -> pd.DataFrame:
+    """
+    Retorna las filas de la hoja cuyo CUV coincide con el indicado, usando el índice en memoria.
+    """
+    df, indice = _indice_cuv(csv_url, cuv_col)
+    posiciones = indice.get(str(cuv).strip())
+    if posiciones is None:
+        return df.iloc[0:0]
+    return df.iloc[posiciones]
+
+
+def invalidar_cache_hojas(csv_url: str = None):
+    """Elimina de la cache una hoja concreta o todas si no se indica URL."""
+    with _sheets_lock:
+        if csv_url is None:
+            _sheets_cache.clear()
+        else:
+            _sheets_cache.pop(csv_url, None)
@@ -0,0 +1,338 @@
+"""
+Implementación local (SQLite) de las funciones de data_access, para desarrollo y benchmarks
+sin acceso al SQL Server de producción.
+
+Expone la misma API pública que data_access. Para usarla en lugar de la original sin
+modificar a los consumidores (informe.py, generar_informes_cli.py, ...):
+
+    import sys, data_access_sqlite
+    data_access_sqlite.usar_como_data_access()
+
+La base se toma de DB_SQLITE_PATH y el esquema se crea con crear_esquema().
+"""
+import os
+import sys
+import sqlite3
+import logging
+import pandas as pd
+
+import analitica
+from instrumentacion import medido
+from esquema_informe import (
+    COLUMNAS_CENTRO_INFORME,
+    COLUMNAS_VISITA_INFORME,
+    COLUMNAS_MEDICION_INFORME,
+    COLUMNAS_EQUIPO_INFORME,
+    aplicar_tipos_informe,
+    normalizar_mediciones,
+)
+
+DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', os.path.join('.cache', 'higiene_local.sqlite3'))
+
+# Mismas columnas (y mismo orden) que data_access.MEDICION_COLUMNS
+MEDICION_COLUMNS = [
+    "visita_id", "nombre_area", "sector_especifico", "puesto_trabajo", "posicion_trabajador", "vestimenta_trabajador",
+    "t_bul_seco", "t_globo", "hum_rel", "vel_air", "ppd", "pmv", "resultado_medicion", "cond_techumbre", "obs_techumbre",
+    "cond_paredes", "obs_paredes", "cond_vantanal", "obs_ventanal", "cond_aire_acond", "obs_aire_acond",
+    "cond_ventiladores", "obs_ventiladores", "cond_inyeccion_extraccion", "obs_inyeccion_extraccion",
+    "cond_ventanas", "obs_ventanas", "cond_puertas", "obs_puertas", "cond_otras", "obs_otras", "met", "clo"
+]
+
+# Esquema equivalente a las tablas de producción usadas por la aplicación
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS higiene_Centros_Trabajo (
+    cuv TEXT PRIMARY KEY,
+    razon_social TEXT, rut TEXT, CIIU TEXT, nombre_ct TEXT,
+    direccion_ct TEXT, comuna_ct TEXT, region_ct TEXT
+);
+CREATE TABLE IF NOT EXISTS higiene_Equipos_Medicion (
+    id_equipo INTEGER PRIMARY KEY,
+    equipo_dicc TEXT, nombre_equipo TEXT, cod_equipo TEXT, n_serie_equipo TEXT,
+    marca_equipo TEXT, modelo_equipo TEXT, fecha_calibracion TEXT, prox_calibracion TEXT,
+    empresa_certificadora TEXT, num_certificado TEXT, url_certificado TEXT
+);
+CREATE TABLE IF NOT EXISTS higiene_Visitas_prod (
+    id_visita INTEGER PRIMARY KEY AUTOINCREMENT,
+    cuv_visita TEXT, fecha_visita TEXT, hora_visita TEXT, temperatura_dia REAL, motivo_evaluacion TEXT,
+    nombre_personal_visita TEXT, cargo_personal_visita TEXT, consultor_ist TEXT,
+    equipo_temp INTEGER, equipo_vel_air INTEGER,
+    patron_tbs REAL, ver_tbs_ini REAL, ver_tbs_fin REAL,
+    patron_tbh REAL, ver_tbh_ini REAL, ver_tbh_fin REAL,
+    patron_tg REAL, ver_tg_ini REAL, ver_tg_fin REAL,
+    note_visita TEXT, consultor_cargo TEXT, consultor_zonal TEXT, guid_envio TEXT
+);
+CREATE VIEW IF NOT EXISTS higiene_Visitas AS SELECT * FROM higiene_Visitas_prod;
+CREATE TABLE IF NOT EXISTS higiene_mediciones_prod (
+    id_medicion INTEGER PRIMARY KEY AUTOINCREMENT,
+    visita_id INTEGER, nombre_area TEXT, sector_especifico TEXT, puesto_trabajo TEXT,
+    posicion_trabajador TEXT, vestimenta_trabajador TEXT,
+    t_bul_seco REAL, t_globo REAL, hum_rel REAL, vel_air REAL, ppd REAL, pmv REAL, resultado_medicion TEXT,
+    cond_techumbre INTEGER, obs_techumbre TEXT, cond_paredes INTEGER, obs_paredes TEXT,
+    cond_vantanal INTEGER, obs_ventanal TEXT, cond_aire_acond INTEGER, obs_aire_acond TEXT,
+    cond_ventiladores INTEGER, obs_ventiladores TEXT, cond_inyeccion_extraccion INTEGER,
+    obs_inyeccion_extraccion TEXT, cond_ventanas INTEGER, obs_ventanas TEXT,
+    cond_puertas INTEGER, obs_puertas TEXT, cond_otras INTEGER, obs_otras TEXT,
+    met REAL, clo REAL, caract_constructivas TEXT, ingreso_salida_aire TEXT, guid_envio TEXT
+);
+"""
+
+# Columnas agregadas después de la creación inicial: (tabla, columna, tipo)
+COLUMNAS_AGREGADAS = [
+    ("higiene_Visitas_prod", "guid_envio", "TEXT"),
+    ("higiene_mediciones_prod", "guid_envio", "TEXT"),
+]
+
+
+def get_db_connection():
+    """Abre la base SQLite local (se crea el directorio si no existe)."""
+    os.makedirs(os.path.dirname(DB_SQLITE_PATH) or ".", exist_ok=True)
+    connection = sqlite3.connect(DB_SQLITE_PATH, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+def crear_esquema(connection=None):
+    """Crea las tablas si no existen y agrega a las existentes las columnas de COLUMNAS_AGREGADAS."""
+    propia = connection is None
+    connection = connection or get_db_connection()
+    connection.executescript(ESQUEMA)
+    for tabla, columna, tipo in COLUMNAS_AGREGADAS:
+        existentes = {fila[1] for fila in connection.execute(f"PRAGMA table_info({tabla})")}
+        if columna not in existentes:
+            connection.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+    connection.commit()
+    if propia:
+        connection.close()
+
+
+def cargar_tablas(tablas: dict, reemplazar: bool = True):
+    """
+    Carga DataFrames en las tablas indicadas ({"higiene_Centros_Trabajo": df, ...}).
+    Si 'reemplazar' es True se vacía cada tabla antes de insertar.
+    """
+    connection = get_db_connection()
+    try:
+        crear_esquema(connection)
+        for tabla, df in tablas.items():
+            if reemplazar:
+                connection.execute(f"DELETE FROM {tabla}")
+            df.to_sql(tabla, connection, if_exists="append", index=False)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _leer(query, params=None) -> pd.DataFrame:
+    connection = get_db_connection()
+    try:
+        return pd.read_sql(query, connection, params=params)
+    finally:
+        connection.close()
+
+
+@medido("db.get_centro")
+def get_centro(cuv: str) -> pd.DataFrame:
+    return _leer("SELECT * FROM higiene_Centros_Trabajo WHERE cuv = ?", [str(cuv)])
+
+
+@medido("db.get_visita")
+def get_visita(cuv: str) -> pd.DataFrame:
+    return _leer(
+        "SELECT * FROM higiene_Visitas_prod WHERE cuv_visita = ? ORDER BY fecha_visita DESC, hora_visita DESC",
+        [str(cuv)],
+    )
+
+
+@medido("db.get_mediciones")
+def get_mediciones(visita_id: int) -> pd.DataFrame:
+    return normalizar_mediciones(_leer("SELECT * FROM higiene_mediciones_prod WHERE visita_id = ?", [int(visita_id)]))
+
+
+@medido("db.get_equipos")
+def get_equipos() -> pd.DataFrame:
+    return _leer("SELECT * FROM higiene_Equipos_Medicion")
+
+
+def get_mapa_equipos(forzar: bool = False) -> dict:
+    df = _leer("SELECT equipo_dicc, id_equipo FROM higiene_Equipos_Medicion WHERE equipo_dicc IS NOT NULL")
+    return dict(zip(df["equipo_dicc"].astype(str).str.strip(), df["id_equipo"]))
+
+
+def invalidar_mapa_equipos():
+    pass
+
+
+def get_codigos_equipo(prefijo: str) -> list:
+    codigos = [c for c in get_mapa_equipos() if c.upper().startswith(prefijo.upper())]
+    return sorted(codigos, key=lambda c: int("".join(filter(str.isdigit, c)) or 0))
+
+
+@medido("db.get_all_cuvs_with_visits")
+def get_all_cuvs_with_visits():
+    return _leer("SELECT DISTINCT cuv_visita FROM higiene_Visitas")["cuv_visita"].tolist()
+
+
+@medido("db.get_cuvs_filtrados")
+def get_cuvs_filtrados(fecha_desde=None, fecha_hasta=None, region=None, consultor=None) -> list:
+    condiciones, params = [], []
+    for condicion, valor in (("v.fecha_visita >= ?", fecha_desde), ("v.fecha_visita <= ?", fecha_hasta),
+                             ("c.region_ct = ?", region), ("v.consultor_ist = ?", consultor)):
+        if valor:
+            condiciones.append(condicion)
+            params.append(valor)
+    query = ("SELECT DISTINCT v.cuv_visita FROM higiene_Visitas_prod v "
+             "LEFT JOIN higiene_Centros_Trabajo c ON c.cuv = v.cuv_visita")
+    if condiciones:
+        query += " WHERE " + " AND ".join(condiciones)
+    return _leer(query, params)["cuv_visita"].tolist()
+
+
+@medido("db.get_centro_informe")
+def get_centro_informe(cuv: str) -> pd.DataFrame:
+    query = f"SELECT {', '.join(COLUMNAS_CENTRO_INFORME)} FROM higiene_Centros_Trabajo WHERE cuv = ?"
+    return aplicar_tipos_informe(_leer(query, [str(cuv)]))
+
+
+@medido("db.get_ultima_visita")
+def get_ultima_visita(cuv: str) -> pd.DataFrame:
+    # Equivalente SQLite del SELECT TOP 1 de data_access
+    query = (f"SELECT {', '.join(COLUMNAS_VISITA_INFORME)} FROM higiene_Visitas_prod WHERE cuv_visita = ? "
+             "ORDER BY fecha_visita DESC, hora_visita DESC LIMIT 1")
+    return aplicar_tipos_informe(_leer(query, [str(cuv)]))
+
+
+@medido("db.get_mediciones_informe")
+def get_mediciones_informe(visita_id: int) -> pd.DataFrame:
+    query = f"SELECT {', '.join(COLUMNAS_MEDICION_INFORME)} FROM higiene_mediciones_prod WHERE visita_id = ?"
+    return normalizar_mediciones(_leer(query, [int(visita_id)]))
+
+
+@medido("db.get_equipos_informe")
+def get_equipos_informe() -> pd.DataFrame:
+    return aplicar_tipos_informe(_leer(f"SELECT {', '.join(COLUMNAS_EQUIPO_INFORME)} FROM higiene_Equipos_Medicion"))
+
+
+def get_datos_informe(cuv: str, df_equipos: pd.DataFrame = None):
+    df_centro = get_centro_informe(cuv)
+    df_visitas = get_ultima_visita(cuv)
+    if df_visitas.empty:
+        df_mediciones = pd.DataFrame(columns=COLUMNAS_MEDICION_INFORME)
+    else:
+        df_mediciones = get_mediciones_informe(df_visitas.iloc[0]["id_visita"])
+    if df_equipos is None:
+        df_equipos = get_equipos_informe()
+    return df_centro, df_visitas, df_mediciones, df_equipos
+
+
+@medido("db.insertar_visita")
+def insertar_visita(cuv, fecha_visita, hora_medicion, temp_max, motivo_evaluacion,
+                    nombre_personal, cargo, consultor_ist, cod_equipo_t, cod_equipo_v,
+                    patron_tbs, verif_tbs_inicial, patron_tbh, verif_tbh_inicial,
+                    patron_tg, verif_tg_inicial, consultor_cargo, consultor_zonal, guid_envio=None):
+    mapa = get_mapa_equipos()
+    id_equipo_t, id_equipo_v = mapa.get(cod_equipo_t), mapa.get(cod_equipo_v)
+    if id_equipo_t is None or id_equipo_v is None:
+        logging.error(f"No se encontraron equipos para: T={cod_equipo_t}, V={cod_equipo_v}")
+        return None
+
+    connection = get_db_connection()
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        if guid_envio:
+            fila = connection.execute(
+                "SELECT id_visita FROM higiene_Visitas_prod WHERE guid_envio = ?", (guid_envio,)
+            ).fetchone()
+            if fila:
+                connection.rollback()
+                logging.info(f"Visita con guid_envio {guid_envio} ya registrada (id_visita {fila[0]}).")
+                return fila[0]
+        cursor = connection.execute(
+            """
+            INSERT INTO higiene_Visitas_prod (
+                cuv_visita, fecha_visita, hora_visita, temperatura_dia, motivo_evaluacion,
+                nombre_personal_visita, cargo_personal_visita, consultor_ist,
+                equipo_temp, equipo_vel_air, patron_tbs, ver_tbs_ini,
+                patron_tbh, ver_tbh_ini, patron_tg, ver_tg_ini, consultor_cargo, consultor_zonal, guid_envio
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (str(cuv), str(fecha_visita), str(hora_medicion), temp_max, motivo_evaluacion,
+             nombre_personal, cargo, consultor_ist, id_equipo_t, id_equipo_v,
+             patron_tbs, verif_tbs_inicial, patron_tbh, verif_tbh_inicial,
+             patron_tg, verif_tg_inicial, consultor_cargo, consultor_zonal, guid_envio),
+        )
+        connection.commit()
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        logging.error(f"Error al insertar la visita: {e}")
+        connection.rollback()
+        return None
+    finally:
+        connection.close()
+
+
+@medido("db.insert_verif_final_visita")
+def insert_verif_final_visita(id_visita, verif_tbs_final, verif_tbh_final, verif_tg_final, comentarios_finales):
+    connection = get_db_connection()
+    try:
+        cursor = connection.execute(
+            "UPDATE higiene_Visitas_prod SET ver_tbs_fin = ?, ver_tbh_fin = ?, ver_tg_fin = ?, note_visita = ? "
+            "WHERE id_visita = ?",
+            (verif_tbs_final, verif_tbh_final, verif_tg_final, comentarios_finales, id_visita),
+        )
+        connection.commit()
+        return cursor.rowcount > 0
+    finally:
+        connection.close()
+
+
+@medido("db.insertar_mediciones_batch")
+def insertar_mediciones_batch(visita_id, rows):
+    """
+    Igual que data_access.insertar_mediciones_batch: una fila con 'guid_envio' ya registrado no
+    se vuelve a insertar y se retorna el id_medicion existente.
+    """
+    if not visita_id or not rows:
+        return None
+    columnas = ", ".join(MEDICION_COLUMNS + ["guid_envio"])
+    placeholders = ", ".join("?" for _ in range(len(MEDICION_COLUMNS) + 1))
+    connection = get_db_connection()
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        ids = []
+        for row in rows:
+            guid_envio = row.get("guid_envio")
+            if guid_envio:
+                fila = connection.execute(
+                    "SELECT id_medicion FROM higiene_mediciones_prod WHERE guid_envio = ?", (guid_envio,)
+                ).fetchone()
+                if fila:
+                    ids.append(fila[0])
+                    continue
+            cursor = connection.execute(
+                f"INSERT INTO higiene_mediciones_prod ({columnas}) VALUES ({placeholders})",
+                [visita_id] + [row.get(col) for col in MEDICION_COLUMNS[1:]] + [guid_envio],
+            )
+            ids.append(cursor.lastrowid)
+        connection.commit()
+        analitica.refrescar_despues_de_insertar(visita_id)
+        return ids
+    except sqlite3.Error as e:
+        logging.error(f"Error al insertar las mediciones de la visita {visita_id}: {e}")
+        connection.rollback()
+        return None
+    finally:
+        connection.close()
+
+
+def insertar_medicion(visita_id, *valores):
+    ids = insertar_mediciones_batch(visita_id, [dict(zip(MEDICION_COLUMNS[1:], valores))])
+    return ids[0] if ids else None
+
+
+def usar_como_data_access():
+    """
+    Registra este módulo como 'data_access' en sys.modules, de modo que los módulos que se
+    importen a continuación (y los procesos hijos creados por fork) usen la base SQLite local.
+    """
+    crear_esquema()
+    sys.modules["data_access"] = sys.modules[__name__]
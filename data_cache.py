@@ -0,0 +1,67 @@
+import os
+import pandas as pd
+
+import datos_compartidos
+from data_access import get_equipos_informe, get_all_cuvs_with_visits, invalidar_mapa_equipos
+
+# TTL (segundos) de las tablas que cambian poco. Se pueden ajustar por variable de entorno.
+EQUIPOS_TTL = int(os.getenv('EQUIPOS_TTL', '3600'))
+CUVS_TTL = int(os.getenv('CUVS_TTL', '300'))
+CENTROS_TTL = int(os.getenv('CENTROS_TTL', '3600'))
+# Datos de un CUV consultado ("cuv:<cuv>"): se descartan aunque ninguna sesión los vuelva a pedir
+CUV_TTL = int(os.getenv('CUV_TTL', '900'))
+
+
+def get_equipos_cached() -> pd.DataFrame:
+    """
+    Catálogo de equipos de medición (higiene_Equipos_Medicion) compartido entre
+    reruns y sesiones. Se guarda una sola vez por proceso en datos_compartidos y cada
+    llamada recibe una vista (Copy-on-Write): el llamador puede modificarla sin afectar
+    a otras sesiones y sin que se copie el catálogo completo.
+    Solo trae las columnas que usa el informe.
+    """
+    return datos_compartidos.obtener_o_cargar("equipos", get_equipos_informe, ttl=EQUIPOS_TTL)
+
+
+def get_all_cuvs_cached() -> list:
+    """Lista de CUV con visitas registradas, compartida entre reruns y sesiones."""
+    return list(datos_compartidos.obtener_o_cargar("cuvs", get_all_cuvs_with_visits, ttl=CUVS_TTL))
+
+
+def get_datos_cuv_cached(cuv: str, recargar: bool = False):
+    """
+    (df_centro, df_visitas, df_mediciones) del CUV para el informe, compartidos entre sesiones
+    bajo la clave "cuv:<cuv>". La sesión solo necesita guardar el CUV; con recargar=True se
+    vuelve a consultar la base de datos (por ejemplo, al presionar "Buscar").
+    """
+    from data_access import get_datos_informe
+
+    clave = f"cuv:{cuv}"
+    if recargar:
+        datos_compartidos.invalidar(clave)
+    return datos_compartidos.obtener_o_cargar(
+        clave, lambda: get_datos_informe(cuv, get_equipos_cached())[:3], ttl=CUV_TTL
+    )
+
+
+def get_centro_cached(cuv: str, recargar: bool = False) -> pd.DataFrame:
+    """Centro de trabajo del CUV (higiene_Centros_Trabajo), compartido bajo la clave "centro:<cuv>"."""
+    from data_access import get_centro
+
+    clave = f"centro:{cuv}"
+    if recargar:
+        datos_compartidos.invalidar(clave)
+    return datos_compartidos.obtener_o_cargar(clave, lambda: get_centro(cuv), ttl=CENTROS_TTL)
+
+
+def invalidar_cache_visitas():
+    """Debe llamarse después de insertar una visita para que la lista de CUV se recalcule."""
+    datos_compartidos.invalidar("cuvs")
+    datos_compartidos.invalidar(prefijo="cuv:")
+
+
+def invalidar_cache_equipos():
+    """Fuerza la recarga del catálogo de equipos (y del mapa de códigos) en la próxima llamada."""
+    datos_compartidos.invalidar("equipos")
+    invalidar_mapa_equipos()
+
@@ -0,0 +1,210 @@
+"""
+Almacén de datos de referencia compartido por todas las sesiones de Streamlit del proceso.
+
+Los DataFrames de referencia (catálogo de equipos, lista de CUV, datos de un CUV consultado)
+se guardan una sola vez por proceso y con versión. Las sesiones guardan en st.session_state
+solo la clave, y en cada rerun obtienen una vista del DataFrame compartido. Con Copy-on-Write
+de pandas, la vista no copia datos; si una sesión modifica su vista (por ejemplo,
+doc_utils.format_columns), solo se copian las columnas modificadas y el original no cambia.
+En pandas 2 Copy-on-Write se activa con activar_copy_on_write() desde los puntos de entrada de
+la aplicación; mientras no esté activo, vista() entrega copias completas.
+
+Uso:
+    datos_compartidos.activar_copy_on_write()    # al inicio de la aplicación
+    df = datos_compartidos.obtener_o_cargar("equipos", get_equipos_informe, ttl=3600)
+    version = datos_compartidos.publicar(f"cuv:{cuv}", (df_centro, df_visitas, df_mediciones))
+    uso = datos_compartidos.uso_memoria_sesion(st.session_state)
+    datos_compartidos.mostrar_memoria_sesion()   # en la barra lateral
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+import pandas as pd
+
+# Límite de memoria del almacén; al superarlo se expulsan las entradas usadas hace más tiempo
+DATOS_COMPARTIDOS_MAX_MB = int(os.getenv('DATOS_COMPARTIDOS_MAX_MB', '256'))
+
+_PANDAS_3 = int(pd.__version__.split(".")[0]) >= 3
+
+# clave -> {"valor", "version", "bytes", "cargado"}
+_almacen = OrderedDict()
+_estado = {"bytes": 0, "version": 0}
+_lock = threading.Lock()
+# Un lock por clave para que varias sesiones no carguen lo mismo a la vez
+_locks_carga = {}
+
+
+def _tamano(valor) -> int:
+    """Memoria aproximada de un valor (DataFrames con memory_usage(deep=True))."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, BytesIO):
+        return len(valor.getbuffer())
+    if isinstance(valor, (tuple, list)):
+        return sys.getsizeof(valor) + sum(_tamano(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_tamano(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+
+def activar_copy_on_write():
+    """
+    Activa Copy-on-Write en pandas 2 (en pandas 3 siempre está activo). Se llama desde los puntos
+    de entrada de la aplicación (supermain.py, form.py, main4.py, dashboard_temporada.py) y no al
+    importar este módulo, porque cambia el comportamiento de pandas en todo el proceso.
+    """
+    if not _PANDAS_3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def _copy_on_write_activo() -> bool:
+    return _PANDAS_3 or pd.get_option("mode.copy_on_write") is True
+
+
+def vista(valor):
+    """
+    Copia del valor que el llamador puede modificar sin afectar el original: con Copy-on-Write,
+    los DataFrames se entregan como copia diferida (sin copiar datos); sin él, como copia completa.
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy(deep=not _copy_on_write_activo())
+    if isinstance(valor, tuple):
+        return tuple(vista(v) for v in valor)
+    return valor
+
+
+def _congelar(valor):
+    # Las listas se guardan como tuplas para que ninguna sesión las modifique
+    if isinstance(valor, list):
+        return tuple(_congelar(v) for v in valor)
+    if isinstance(valor, tuple):
+        return tuple(_congelar(v) for v in valor)
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return vista(valor)
+    return valor
+
+
+def _expulsar():
+    maximo = DATOS_COMPARTIDOS_MAX_MB * 1024 * 1024
+    while _estado["bytes"] > maximo and len(_almacen) > 1:
+        clave, entrada = _almacen.popitem(last=False)
+        _estado["bytes"] -= entrada["bytes"]
+        logging.info(f"Datos compartidos: se expulsa '{clave}' ({entrada['bytes'] / 1024 / 1024:.1f} MB).")
+
+
+def publicar(clave: str, valor) -> int:
+    """Guarda (o reemplaza) el valor de 'clave' y retorna su nueva versión."""
+    valor = _congelar(valor)
+    tamano = _tamano(valor)
+    with _lock:
+        anterior = _almacen.pop(clave, None)
+        if anterior is not None:
+            _estado["bytes"] -= anterior["bytes"]
+        _estado["version"] += 1
+        _almacen[clave] = {"valor": valor, "version": _estado["version"], "bytes": tamano,
+                           "cargado": time.monotonic()}
+        _estado["bytes"] += tamano
+        _expulsar()
+        return _estado["version"]
+
+
+def obtener(clave: str, ttl: float = None):
+    """Vista del valor de 'clave', o None si no existe (o venció su 'ttl' en segundos)."""
+    with _lock:
+        entrada = _almacen.get(clave)
+        if entrada is None:
+            return None
+        if ttl is not None and time.monotonic() - entrada["cargado"] >= ttl:
+            return None
+        _almacen.move_to_end(clave)
+        return vista(entrada["valor"])
+
+
+def obtener_o_cargar(clave: str, cargar, ttl: float = None):
+    """
+    Vista del valor de 'clave'. Si no existe o venció, se llama a cargar() una sola vez aunque
+    varias sesiones lo pidan al mismo tiempo, y el resultado se publica.
+    """
+    valor = obtener(clave, ttl)
+    if valor is not None:
+        return valor
+    with _lock:
+        lock_carga = _locks_carga.setdefault(clave, threading.Lock())
+    with lock_carga:
+        # Otra sesión pudo cargarlo mientras se esperaba el lock
+        valor = obtener(clave, ttl)
+        if valor is not None:
+            return valor
+        publicar(clave, cargar())
+    return obtener(clave)
+
+
+def version(clave: str):
+    """Versión actual de 'clave', o None si no está en el almacén."""
+    with _lock:
+        entrada = _almacen.get(clave)
+        return entrada["version"] if entrada is not None else None
+
+
+def invalidar(clave: str = None, prefijo: str = None):
+    """Elimina una clave, todas las que comienzan con 'prefijo', o todo el almacén."""
+    with _lock:
+        if clave is None and prefijo is None:
+            claves = list(_almacen)
+        elif clave is not None:
+            claves = [clave] if clave in _almacen else []
+        else:
+            claves = [c for c in _almacen if c.startswith(prefijo)]
+        for c in claves:
+            _estado["bytes"] -= _almacen.pop(c)["bytes"]
+
+
+def estadisticas() -> dict:
+    """{"entradas", "bytes", "claves": {clave: {"version", "bytes"}}} del almacén del proceso."""
+    with _lock:
+        return {
+            "entradas": len(_almacen),
+            "bytes": _estado["bytes"],
+            "claves": {c: {"version": e["version"], "bytes": e["bytes"]} for c, e in _almacen.items()},
+        }
+
+
+def uso_memoria_sesion(session_state) -> dict:
+    """
+    Memoria aproximada de lo que guarda una sesión en st.session_state (sin contar el almacén
+    compartido) y del almacén compartido del proceso.
+    Retorna {"sesion_bytes", "por_clave": {clave: bytes}, "compartido_bytes", "compartido_entradas"}.
+    """
+    por_clave = {}
+    for clave in list(session_state.keys()):
+        try:
+            por_clave[str(clave)] = _tamano(session_state[clave])
+        except Exception:
+            # Algunos valores de widgets no se pueden leer fuera de su rerun
+            continue
+    compartido = estadisticas()
+    return {
+        "sesion_bytes": sum(por_clave.values()),
+        "por_clave": dict(sorted(por_clave.items(), key=lambda kv: kv[1], reverse=True)),
+        "compartido_bytes": compartido["bytes"],
+        "compartido_entradas": compartido["entradas"],
+    }
+
+
+def mostrar_memoria_sesion():
+    """Muestra en la barra lateral de Streamlit la memoria de la sesión actual y del almacén compartido."""
+    import streamlit as st
+
+    uso = uso_memoria_sesion(st.session_state)
+    st.sidebar.caption(
+        f"Memoria de la sesión: {uso['sesion_bytes'] / 1024:.0f} KB · "
+        f"datos compartidos: {uso['compartido_bytes'] / 1024 / 1024:.1f} MB "
+        f"({uso['compartido_entradas']} entradas)"
+    )
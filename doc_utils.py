@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 import logging
 import re
+import hashlib
+import threading
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor, Cm
 from docx.oxml import parse_xml, OxmlElement
 from docx.oxml.ns import nsdecls, qn
+from docx.table import _Cell
+from lxml import etree
 from pythermalcomfort.models import pmv_ppd_iso
 import qrcode
 from PIL import ImageOps  # Asegúrate de tener Pillow instalado
@@ -17,6 +21,11 @@ import os
 from natsort import natsorted
 from collections import OrderedDict
 from datetime import datetime, date
+from xml.sax.saxutils import escape as xml_escape
+import pandas as pd
+from instrumentacion import medir, medido
+from esquema_informe import normalizar_texto, normalizar_mediciones
+import incertidumbre
 
 # Configuración básica del logging
 # logging.basicConfig(level=logging.INFO)
@@ -53,13 +62,13 @@ def ftemp(valor):
 def calcular_analisis_area(group):
     """Determina si un área cumple o no basado en mediciones."""
     if len(group) > 1:
-        # Cálculo de promedios
-        avg_t_bul = group["t_bul_seco"].astype(float).mean()
-        avg_t_globo = group["t_globo"].astype(float).mean()
-        avg_hum = group["hum_rel"].astype(float).mean()
-        avg_vel = group["vel_air"].astype(float).mean()
-        avg_met = group["met"].astype(float).mean() or 1.1
-        avg_clo = group["clo"].astype(float).mean() or 0.5
+        # Cálculo de promedios (las columnas ya son float64, ver normalizar_mediciones)
+        avg_t_bul = group["t_bul_seco"].mean()
+        avg_t_globo = group["t_globo"].mean()
+        avg_hum = group["hum_rel"].mean()
+        avg_vel = group["vel_air"].mean()
+        avg_met = group["met"].mean() or 1.1
+        avg_clo = group["clo"].mean() or 0.5
 
         # Cálculo PMV/PPD
         try:
@@ -89,7 +98,7 @@ def procesar_areas(df_mediciones):
     areas_no_cumplen = []
 
     if not df_mediciones.empty:
-        grouped = df_mediciones.groupby("nombre_area")
+        grouped = df_mediciones.groupby("nombre_area", observed=True)
         for area, group in grouped:
             analisis = calcular_analisis_area(group)
             if analisis == "CUMPLE":
@@ -123,32 +132,43 @@ def format_columns(df, columns, mode="title"):
     """
     for col in columns:
         if col in df.columns:
-            # Convertir a cadena y eliminar espacios al inicio y final
-            df[col] = df[col].astype(str).str.strip()
-            # Aplicar la transformación según el modo
-            if mode == "title":
-                df[col] = df[col].str.lower().str.title()
-            elif mode == "capitalize":
-                df[col] = df[col].str.lower().str.capitalize()
-            elif mode == "upper":
-                df[col] = df[col].str.upper()
-            else:
-                raise ValueError(f"Modo '{mode}' no reconocido. Use 'title', 'capitalize' o 'upper'.")
+            # strip + transformación en una sola pasada sobre los valores distintos
+            df[col] = normalizar_texto(df[col], mode)
     return df
 
 
+def _tcs_de_columna(tbl, col_index):
+    """
+    Retorna los elementos <w:tc> que ocupan la columna 'col_index' de la grilla en cada fila,
+    recorriendo el XML una sola vez y respetando las celdas fusionadas horizontalmente (gridSpan).
+    """
+    tcs = []
+    for tr in tbl.tr_lst:
+        offset = 0
+        for tc in tr.tc_lst:
+            span = tc.grid_span
+            if offset <= col_index < offset + span:
+                tcs.append(tc)
+                break
+            offset += span
+    return tcs
+
+
 def set_column_width(table, col_index, width):
     """
     Establece el ancho de la columna 'col_index' de la tabla 'table' al valor 'width' (un objeto de docx.shared, por ejemplo Cm(4)).
+    Si la celda ya tenía un ancho definido, se reemplaza en lugar de agregar otro <w:tcW>.
     """
-    # width._value retorna el ancho en unidades dxa (1 dxa = 1/20 de punto)
-    for cell in table.columns[col_index].cells:
-        tc = cell._tc
-        tcPr = tc.get_or_add_tcPr()
-        tcW = OxmlElement('w:tcW')
-        tcW.set(qn('w:w'), str(int(width.inches * 1440)))
+    # El ancho se expresa en unidades dxa (1 dxa = 1/20 de punto)
+    dxa = str(int(width.inches * 1440))
+    tbl = table._tbl
+    grid_cols = tbl.tblGrid.gridCol_lst
+    if col_index < len(grid_cols):
+        grid_cols[col_index].w = width
+    for tc in _tcs_de_columna(tbl, col_index):
+        tcW = tc.get_or_add_tcPr().get_or_add_tcW()
+        tcW.set(qn('w:w'), dxa)
         tcW.set(qn('w:type'), 'dxa')
-        tcPr.append(tcW)
 
 
 def merge_column_cells(tabla, col_index, start_row=1):
@@ -158,27 +178,119 @@ def merge_column_cells(tabla, col_index, start_row=1):
     Se fusionan las celdas cuando se encuentran celdas vacías, es decir, se asume
     que solo la primera celda del grupo contiene el valor.
     """
-    num_filas = len(tabla.rows)
-    current_value = None
-    start_index = None
-
-    for i in range(start_row, num_filas):
-        cell = tabla.cell(i, col_index)
-        text = cell.text.strip()
-        # Si la celda tiene contenido, se considera el inicio de un grupo
-        if text:
-            # Si ya había un grupo iniciado y abarca más de una fila, se fusionan las celdas anteriores
-            if current_value is not None and start_index is not None and i - start_index > 1:
-                primera_celda = tabla.cell(start_index, col_index)
-                for j in range(start_index + 1, i):
-                    primera_celda = primera_celda.merge(tabla.cell(j, col_index))
-            current_value = text
-            start_index = i
-    # Fusionar el último grupo pendiente (si abarca más de una fila)
-    if current_value is not None and start_index is not None and num_filas - start_index > 1:
-        primera_celda = tabla.cell(start_index, col_index)
-        for j in range(start_index + 1, num_filas):
-            primera_celda = primera_celda.merge(tabla.cell(j, col_index))
+    tcs = _tcs_de_columna(tabla._tbl, col_index)[start_row:]
+    grupos = []
+    for i, tc in enumerate(tcs):
+        if "".join(tc.itertext()).strip():
+            grupos.append([i, i])
+        elif grupos:
+            grupos[-1][1] = i
+
+    # Cada grupo se fusiona con una sola operación (primera celda con la última)
+    for inicio, fin in grupos:
+        if fin > inicio:
+            _Cell(tcs[inicio], tabla).merge(_Cell(tcs[fin], tabla))
+
+
+def _xml_celda(valor, ancho_dxa, negrita=False, blanco=False, shading_color=None, v_align=None, v_merge=None):
+    """
+    Construye el XML de una celda <w:tc>. 'valor' puede ser un texto (los saltos de línea se
+    convierten en <w:br/>) o una lista de textos, en cuyo caso cada uno es un párrafo.
+    """
+    rpr = ""
+    if negrita or blanco:
+        rpr = "<w:rPr>" + ("<w:b/>" if negrita else "") + \
+              ('<w:color w:val="FFFFFF"/><w:sz w:val="20"/>' if blanco else "") + "</w:rPr>"
+
+    tcpr = f'<w:tcW w:w="{ancho_dxa}" w:type="dxa"/>'
+    if v_merge == "restart":
+        tcpr += '<w:vMerge w:val="restart"/>'
+    elif v_merge == "continue":
+        tcpr += '<w:vMerge/>'
+    if shading_color:
+        tcpr += f'<w:shd w:val="clear" w:color="auto" w:fill="{shading_color}"/>'
+    if v_align:
+        tcpr += f'<w:vAlign w:val="{v_align}"/>'
+
+    if v_merge == "continue":
+        parrafos = [""]
+    elif isinstance(valor, (list, tuple)):
+        parrafos = list(valor) or [""]
+    else:
+        parrafos = [valor]
+
+    xml_parrafos = []
+    for texto in parrafos:
+        texto = "" if texto is None else str(texto)
+        runs = "<w:r><w:br/></w:r>".join(
+            f'<w:r>{rpr}<w:t xml:space="preserve">{xml_escape(linea)}</w:t></w:r>' for linea in texto.split("\n")
+        )
+        xml_parrafos.append(f"<w:p>{runs}</w:p>")
+    return f"<w:tc><w:tcPr>{tcpr}</w:tcPr>{''.join(xml_parrafos)}</w:tc>"
+
+
+def construir_tabla(doc, df, columnas, shading_color="4f0b7b", style='Table Grid'):
+    """
+    Agrega al documento una tabla construida en una sola pasada sobre el XML, sin pasar
+    por table.add_row()/cell() de python-docx. El costo es lineal en el número de filas.
+
+    Parámetros:
+        doc: Documento (o contenedor con add_table) donde se inserta la tabla.
+        df (DataFrame | list): Filas de datos. Si es DataFrame, se usan las columnas indicadas
+            en 'columnas'; si es lista, cada elemento es una lista de valores en orden.
+        columnas (list): Especificación por columna, diccionarios con las claves:
+            - "titulo": texto del encabezado (si ninguna columna lo define, no hay encabezado).
+            - "columna": nombre de la columna del DataFrame (por defecto, el título).
+            - "ancho": ancho de la columna (docx.shared, por ejemplo Cm(3)).
+            - "negrita": si el contenido de la columna va en negrita.
+            - "merge": fusiona verticalmente filas consecutivas con el mismo valor.
+            - "v_align": alineación vertical del contenido ("top", "center", "bottom").
+        shading_color (str): Color de fondo del encabezado (mismo formato que apply_style).
+
+    Retorna:
+        La tabla de python-docx creada.
+    """
+    n_cols = len(columnas)
+    anchos = [col.get("ancho", Cm(17 / n_cols)) for col in columnas]
+    anchos_dxa = [int(ancho.inches * 1440) for ancho in anchos]
+
+    if isinstance(df, pd.DataFrame):
+        nombres = [col.get("columna", col.get("titulo")) for col in columnas]
+        filas = df[nombres].itertuples(index=False, name=None)
+    else:
+        filas = df
+
+    partes = []
+    if any("titulo" in col for col in columnas):
+        celdas = "".join(
+            _xml_celda(col.get("titulo", ""), anchos_dxa[j], negrita=True, blanco=True, shading_color=shading_color)
+            for j, col in enumerate(columnas)
+        )
+        partes.append(f"<w:tr>{celdas}</w:tr>")
+
+    anteriores = [object()] * n_cols
+    for fila in filas:
+        celdas = []
+        for j, col in enumerate(columnas):
+            valor = fila[j]
+            v_merge = None
+            if col.get("merge"):
+                v_merge = "continue" if valor == anteriores[j] else "restart"
+                anteriores[j] = valor
+            celdas.append(_xml_celda(valor, anchos_dxa[j], negrita=col.get("negrita", False),
+                                     v_align=col.get("v_align"), v_merge=v_merge))
+        partes.append(f"<w:tr>{''.join(celdas)}</w:tr>")
+
+    table = doc.add_table(rows=0, cols=n_cols)
+    table.style = style
+    tbl = table._tbl
+    for grid_col, ancho in zip(tbl.tblGrid.gridCol_lst, anchos):
+        grid_col.w = ancho
+
+    fragmento = parse_xml(f"<w:tbl {nsdecls('w')}>{''.join(partes)}</w:tbl>")
+    for tr in list(fragmento):
+        tbl.append(tr)
+    return table
 
 
 def generate_qr_code(url, border=10, box_size=2):
@@ -637,38 +749,17 @@ def generar_recomendaciones(pmv, tdb_initial, tr_initial, vr, rh, met, clo):
 
 def crear_tabla_recomendaciones(doc, tipo_medida, medidas):
     """Crea tabla de recomendaciones por tipo de medida"""
-    # Configurar encabezados según el tipo
-    headers = ["Área", "Prescripción de medidas", "Plazo"]
-    col_widths = [Cm(2), Cm(14), Cm(4)]
-
-    # Crear tabla
-    table = doc.add_table(rows=1, cols=3)
-    table.style = 'Table Grid'
-
-    # Configurar anchos de columna
-    for idx, width in enumerate(col_widths):
-        set_column_width(table, idx, width)
-
-    # Formatear cabecera
-    hdr_cells = table.rows[0].cells
-    for idx, header in enumerate(headers):
-        hdr_cells[idx].text = header
-    format_row(table.rows[0], shading_color="4F0B7B")  # Morado corporativo
-
-    table = agregar_medidas_por_accion(table, medidas)
-
-    '''
-    # Llenar con medidas
-    for medida in medidas:
-        row_cells = table.add_row().cells
-        agregar_contenido(row_cells[0],medida['areas'])
-        agregar_contenido(row_cells[1], medida['acciones'])
-        row_cells[2].text = medida['plazo']
-        # Formato vertical centrado
-        for cell in row_cells:
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-    return table
-    '''
+    # Una fila por cada acción de cada medida, repitiendo 'areas' y 'plazo' en cada fila
+    filas = [
+        [medida['areas'], [accion], medida['plazo']]
+        for medida in medidas
+        for accion in medida['acciones']
+    ]
+    return construir_tabla(doc, filas, [
+        {"titulo": "Área", "ancho": Cm(2), "v_align": "center"},
+        {"titulo": "Prescripción de medidas", "ancho": Cm(14), "v_align": "center"},
+        {"titulo": "Plazo", "ancho": Cm(4), "v_align": "center"},
+    ], shading_color="4F0B7B")  # Morado corporativo
 
 def agregar_medidas_correctivas(doc, df_mediciones, areas_no_cumplen):
     # 1. Medidas Ingenieriles (solo para áreas no conformes)
@@ -791,37 +882,141 @@ def generar_texto_areas(areas, tipo):
 ######
 
 # -----------------------------------------------
-# FUNCIÓN PARA GENERAR EL DOCUMENTO WORD
+# CACHE DE SECCIONES DEL INFORME
 # -----------------------------------------------
-def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -> BytesIO:
+# Cada sección del informe se guarda en memoria como el XML de sus párrafos y tablas más las
+# imágenes que referencia, con una clave calculada a partir de los datos que usa. Al corregir
+# una medición solo se vuelven a construir las secciones que dependen de ella; el resto se
+# copia desde la cache.
+INFORME_SECCIONES_MAX_MB = int(os.getenv('INFORME_SECCIONES_MAX_MB', '200'))
+
+_cache_secciones = OrderedDict()
+_secciones_estado = {"bytes": 0}
+_secciones_lock = threading.Lock()
+
+_ATRIBUTOS_RELACION = (qn("r:embed"), qn("r:id"), qn("r:link"))
+
+
+def _huella_valor(h, valor):
+    if isinstance(valor, pd.DataFrame):
+        # Las tablas de un informe tienen pocas filas: repr de los valores es más rápido que
+        # hash_pandas_object, que con columnas categóricas cuesta varios ms por tabla
+        h.update(repr(list(valor.columns)).encode())
+        h.update(repr([str(t) for t in valor.dtypes]).encode())
+        h.update(repr(valor.to_numpy(dtype=object).tolist()).encode())
+    else:
+        h.update(repr(valor).encode())
+    h.update(b"|")
+
+
+def _huella_archivos(h, rutas):
+    """Agrega al hash la ruta, tamaño y fecha de modificación de los archivos bajo 'rutas'."""
+    for base in rutas:
+        if os.path.isfile(base):
+            archivos = [base]
+        else:
+            archivos = [os.path.join(raiz, f) for raiz, _, fs in os.walk(base) for f in fs]
+        for ruta in sorted(archivos):
+            info = os.stat(ruta)
+            h.update(f"{ruta}|{info.st_size}|{info.st_mtime_ns}\n".encode())
+
+
+def _directorios_equipos(df_visitas, df_equipos) -> list:
+    """Directorios de imágenes de certificados de los equipos usados en la visita."""
+    if df_visitas.empty:
+        return []
+    row_visita = df_visitas.iloc[0]
+    en_uso = [row_visita.get('equipo_temp', ''), row_visita.get('equipo_vel_air', '')]
+    ids = df_equipos.loc[df_equipos['id_equipo'].isin(en_uso), 'id_equipo'] if not df_equipos.empty else []
+    return [os.path.join("imagenes_pdf", str(id_equipo)) for id_equipo in ids]
+
+
+def _guardar_seccion(clave, elementos, doc) -> None:
+    imagenes = {}
+    for elemento in elementos:
+        for nodo in elemento.iter():
+            for atributo in _ATRIBUTOS_RELACION:
+                rid = nodo.get(atributo)
+                if rid is None or rid in imagenes:
+                    continue
+                parte = doc.part.related_parts.get(rid)
+                if parte is None or not parte.content_type.startswith("image/"):
+                    # Relación que no es una imagen del documento (p. ej. un hipervínculo): no se cachea
+                    return
+                imagenes[rid] = parte.blob
+    xml = [etree.tostring(elemento, encoding="unicode") for elemento in elementos]
+    tamano = sum(len(x) for x in xml) + sum(len(b) for b in imagenes.values())
+    with _secciones_lock:
+        if clave in _cache_secciones:
+            return
+        _cache_secciones[clave] = {"xml": xml, "imagenes": imagenes, "bytes": tamano}
+        _secciones_estado["bytes"] += tamano
+        maximo = INFORME_SECCIONES_MAX_MB * 1024 * 1024
+        while _secciones_estado["bytes"] > maximo and len(_cache_secciones) > 1:
+            _, expulsada = _cache_secciones.popitem(last=False)
+            _secciones_estado["bytes"] -= expulsada["bytes"]
+
+
+def _insertar_seccion(doc, entrada) -> None:
+    """Copia una sección cacheada al final del documento, volviendo a relacionar sus imágenes."""
+    nuevos = {rid: doc.part.get_or_add_image(BytesIO(blob))[0] for rid, blob in entrada["imagenes"].items()}
+    sect_pr = doc.element.body.sectPr
+    for xml in entrada["xml"]:
+        elemento = parse_xml(xml)
+        if nuevos:
+            for nodo in elemento.iter():
+                for atributo in _ATRIBUTOS_RELACION:
+                    rid = nodo.get(atributo)
+                    if rid in nuevos:
+                        nodo.set(atributo, nuevos[rid])
+        sect_pr.addprevious(elemento)
+
+
+def _agregar_seccion(doc, nombre, funcion, *datos, archivos=()):
     """
-    Genera el informe en Word utilizando:
-      - df_centros: información del centro de trabajo (tabla higiene_Centros_Trabajo)
-      - df_visitas: información de visitas (tabla higiene_Visitas); se selecciona la visita más reciente.
-      - df_mediciones: mediciones asociadas a la visita (tabla higiene_Mediciones)
-      - df_equipos: información de equipos de medición (tabla higiene_Equipos_Medicion)
+    Agrega al documento la sección 'nombre'. Si ya se construyó antes con los mismos 'datos'
+    (y los 'archivos' que usa no cambiaron) se copia desde la cache; si no, se construye con
+    funcion(doc, *datos) y se guarda.
     """
+    h = hashlib.sha256(nombre.encode())
+    for valor in datos:
+        _huella_valor(h, valor)
+    _huella_archivos(h, archivos)
+    clave = h.hexdigest()
+
+    with _secciones_lock:
+        entrada = _cache_secciones.get(clave)
+        if entrada is not None:
+            _cache_secciones.move_to_end(clave)
+
+    with medir(f"informe.seccion.{nombre}", cache=entrada is not None):
+        if entrada is not None:
+            _insertar_seccion(doc, entrada)
+            return
+        body = doc.element.body
+        inicio = len(body) - 1  # el último hijo del cuerpo es sectPr
+        funcion(doc, *datos)
+        _guardar_seccion(clave, list(body)[inicio:len(body) - 1], doc)
 
-    format_columns(df_visitas, ['nombre_personal_visita', 'consultor_ist'], mode="title")
-    format_columns(df_visitas, 'cargo_personal_visita', mode="capitalize")
-    format_columns(df_mediciones, ['nombre_area', 'sector_especifico','puesto_trabajo'], mode="capitalize")
 
-    doc = Document()
-    look_informe(doc)
-    set_vertical_alignment(doc, section_index=0, alignment='top')
+def limpiar_cache_secciones():
+    """Vacía la cache de secciones del proceso."""
+    with _secciones_lock:
+        _cache_secciones.clear()
+        _secciones_estado["bytes"] = 0
 
-    # Cabecera con logo
-    section = doc.sections[0]
-    section.header_distance = Inches(0.4)
-    header = section.header
-    if header.paragraphs:
-        paragraph = header.paragraphs[0]
-    else:
-        paragraph = header.add_paragraph()
-    paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    run = paragraph.add_run()
-    run.add_picture('IST.jpg', width=Cm(2))
 
+def _renumerar_imagenes(doc):
+    """Las secciones copiadas traen los id de dibujo originales; se renumeran para que no se repitan."""
+    for numero, doc_pr in enumerate(doc.element.body.iter(qn("wp:docPr")), start=1):
+        doc_pr.set("id", str(numero))
+
+
+# -----------------------------------------------
+# SECCIONES DEL INFORME
+# -----------------------------------------------
+def _seccion_identificacion(doc, df_centros, df_visitas):
+    """Título, antecedentes, identificación de la actividad (1) y metodología (2)."""
     # Título del informe: se alinea a la derecha
     titulo = doc.add_heading("INFORME EVALUACIÓN CONFORT TÉRMICO", level=1)
     titulo.alignment = WD_ALIGN_PARAGRAPH.LEFT
@@ -924,13 +1119,12 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
     p2.add_run(
         " (Predicted Percentage Dissatisfied) correspondiente al porcentaje de personas que sentirán algún grado de disconfort en un ambiente de trabajo evaluado.")
 
+
+def _seccion_resultados(doc, df_mediciones):
+    """Resultados de las mediciones (3): tabla resumen por área."""
     # -------------------------------
     # Resultados de mediciones y evaluación
     # -------------------------------
-    # Crear listas para las áreas que cumplen y no cumplen
-    areas_cumplen = []
-    areas_no_cumplen = []
-
     paragraph = doc.add_heading("3. Resultados de las mediciones y evaluación", level=2)
     paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
 
@@ -953,17 +1147,11 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
             "PMV"
         ]
 
-        # Creamos la tabla con tantas columnas como la lista anterior
-        tabla_resumen = doc.add_table(rows=1, cols=len(columnas_resumen))
-        tabla_resumen.style = 'Table Grid'
-
-        # Encabezados
-        hdr_cells = tabla_resumen.rows[0].cells
-        for idx, col_name in enumerate(columnas_resumen):
-            hdr_cells[idx].text = col_name
+        # Filas de la tabla; se construye al final en una sola pasada
+        filas_resumen = []
 
         # Agrupamos por área
-        grouped = df_mediciones.groupby("nombre_area")
+        grouped = df_mediciones.groupby("nombre_area", observed=True)
 
         # Recorremos cada grupo (cada área)
         for area, group in grouped:
@@ -971,12 +1159,12 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
             # si solo hay una, usamos directamente esa.
             if len(group) > 1:
                 # Calculamos promedios
-                avg_t_bul = group["t_bul_seco"].astype(float).mean()
-                avg_t_globo = group["t_globo"].astype(float).mean()
-                avg_hum = group["hum_rel"].astype(float).mean()
-                avg_vel = group["vel_air"].astype(float).mean()
-                avg_met = group["met"].astype(float).mean()
-                avg_clo = group["clo"].astype(float).mean()
+                avg_t_bul = group["t_bul_seco"].mean()
+                avg_t_globo = group["t_globo"].mean()
+                avg_hum = group["hum_rel"].mean()
+                avg_vel = group["vel_air"].mean()
+                avg_met = group["met"].mean()
+                avg_clo = group["clo"].mean()
 
                 # Calcular pmv/ppd a partir de la función pmv_ppd_iso
                 # (ajusta según tu propia lógica)
@@ -1016,20 +1204,17 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
                 puesto_trabajo = "\n".join(str(x) for x in valores_unicos)
 
                 # Creamos la fila final
-                row_cells = tabla_resumen.add_row().cells
-                paragraph_0 = row_cells[0].paragraphs[0]
-                run_0 = paragraph_0.add_run(str(area))
-                run_0.bold = True
-                paragraph_1 = row_cells[1].paragraphs[0]
-                run_1 = paragraph_1.add_run(analisis.upper())
-                run_1.bold = True
-                row_cells[2].text = puesto_trabajo
-                row_cells[3].text = ftemp(f"{avg_t_bul:.1f}")
-                row_cells[4].text = ftemp(f"{avg_t_globo:.1f}")
-                row_cells[5].text = ftemp(f"{avg_hum:.1f}")
-                row_cells[6].text = ftemp(f"{avg_vel:.2f}")
-                row_cells[7].text = ftemp(f"{avg_ppd:.1f}")
-                row_cells[8].text = ftemp(f"{avg_pmv:.2f}")
+                filas_resumen.append([
+                    str(area),
+                    analisis.upper(),
+                    puesto_trabajo,
+                    ftemp(f"{avg_t_bul:.1f}"),
+                    ftemp(f"{avg_t_globo:.1f}"),
+                    ftemp(f"{avg_hum:.1f}"),
+                    ftemp(f"{avg_vel:.2f}"),
+                    ftemp(f"{avg_ppd:.1f}"),
+                    ftemp(f"{avg_pmv:.2f}"),
+                ])
 
             else:
                 # Solo hay una medición en el área, la usamos directamente
@@ -1044,40 +1229,74 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
                 puesto_trabajo = str(row.get("puesto_trabajo", ""))
 
                 # Creamos la fila con los datos únicos
-                row_cells = tabla_resumen.add_row().cells
-                paragraph_0 = row_cells[0].paragraphs[0]
-                run_0 = paragraph_0.add_run(str(area))
-                run_0.bold = True
-                paragraph_1 = row_cells[1].paragraphs[0]
-                run_1 = paragraph_1.add_run(analisis.upper())
-                run_1.bold = True
-                row_cells[2].text = puesto_trabajo
-                row_cells[3].text = ftemp(f"{t_bul:.1f}")
-                row_cells[4].text = ftemp(f"{t_globo:.1f}")
-                row_cells[5].text = ftemp(f"{hum:.1f}")
-                row_cells[6].text = ftemp(f"{vel:.2f}")
-                row_cells[7].text = ftemp(f"{ppd:.1f}")
-                row_cells[8].text = ftemp(f"{pmv:.2f}")
-
-        # Opcional: Ajustar anchos de columna si lo deseas
-        set_column_width(tabla_resumen, 0, Cm(3))
-        set_column_width(tabla_resumen, 1, Cm(3))
-        set_column_width(tabla_resumen, 2, Cm(3))
-        set_column_width(tabla_resumen, 3, Cm(1.5))
-        set_column_width(tabla_resumen, 4, Cm(1.5))
-        set_column_width(tabla_resumen, 5, Cm(1.5))
-        set_column_width(tabla_resumen, 6, Cm(1.5))
-        set_column_width(tabla_resumen, 7, Cm(1.5))
-        set_column_width(tabla_resumen, 8, Cm(1.5))
-
-        # Formato de la fila de encabezado (opcional)
-        format_row(tabla_resumen.rows[0])
+                filas_resumen.append([
+                    str(area),
+                    analisis.upper(),
+                    puesto_trabajo,
+                    ftemp(f"{t_bul:.1f}"),
+                    ftemp(f"{t_globo:.1f}"),
+                    ftemp(f"{hum:.1f}"),
+                    ftemp(f"{vel:.2f}"),
+                    ftemp(f"{ppd:.1f}"),
+                    ftemp(f"{pmv:.2f}"),
+                ])
+
+        # Anchos: 3 cm para las columnas de texto y 1,5 cm para las numéricas
+        anchos = [Cm(3), Cm(3), Cm(3)] + [Cm(1.5)] * 6
+        spec = [
+            {"titulo": titulo, "ancho": ancho, "negrita": idx < 2}
+            for idx, (titulo, ancho) in enumerate(zip(columnas_resumen, anchos))
+        ]
+        construir_tabla(doc, filas_resumen, spec)
 
     generar_tabla_resumen(doc, df_mediciones)
 
-    # Procesar áreas antes del resumen
-    areas_cumplen, areas_no_cumplen = procesar_areas(df_mediciones)
 
+def _seccion_incertidumbre(doc, df_incertidumbre):
+    """Incertidumbre de medición (3): probabilidad de cumplir de cada área y resultados limítrofes."""
+    if df_incertidumbre.empty:
+        return
+
+    doc.add_paragraph()
+    doc.add_heading("Incertidumbre de la evaluación", level=3)
+    simulaciones = f"{incertidumbre.INCERTIDUMBRE_MUESTRAS:,}".replace(",", ".")
+    doc.add_paragraph(
+        f"Se estimó la probabilidad de que cada área cumpla con el estándar (PMV entre -1 y +1) "
+        f"considerando la exactitud de los instrumentos y la diferencia con el patrón registrada en la "
+        f"verificación en terreno, mediante {simulaciones} simulaciones por área. "
+        f"Se indica como limítrofe el resultado de las áreas en que menos del "
+        f"{incertidumbre.INCERTIDUMBRE_CONFIANZA * 100:.0f}% de las simulaciones coincide con él."
+    )
+
+    filas = [
+        [
+            fila.nombre_area,
+            fila.decision,
+            ftemp(f"{fila.prob_cumple * 100:.1f}"),
+            f"{ftemp(f'{fila.pmv_min:.2f}')} a {ftemp(f'{fila.pmv_max:.2f}')}",
+            "Resultado limítrofe" if fila.limitrofe else "",
+        ]
+        for fila in df_incertidumbre.itertuples(index=False)
+    ]
+    construir_tabla(doc, filas, [
+        {"titulo": "Área", "ancho": Cm(4), "negrita": True},
+        {"titulo": "Estándar confortabilidad", "ancho": Cm(3), "negrita": True},
+        {"titulo": "Probabilidad de cumplir (%)", "ancho": Cm(3)},
+        {"titulo": f"PMV (intervalo {incertidumbre.INCERTIDUMBRE_CONFIANZA * 100:.0f}%)", "ancho": Cm(3.5)},
+        {"titulo": "Observación", "ancho": Cm(3.5), "negrita": True},
+    ])
+
+    limitrofes = df_incertidumbre.loc[df_incertidumbre["limitrofe"], "nombre_area"].tolist()
+    if limitrofes:
+        texto_areas = f"del área {limitrofes[0]}" if len(limitrofes) == 1 else f"de las áreas {join_with_and(limitrofes)}"
+        doc.add_paragraph(
+            f"El resultado {texto_areas} depende de la incertidumbre de medición; se recomienda "
+            f"repetir la evaluación o confirmarla con mediciones adicionales."
+        )
+
+
+def _seccion_conclusiones(doc, df_centros, areas_cumplen, areas_no_cumplen):
+    """Conclusiones según las áreas que cumplen y no cumplen."""
     # Encabezado principal del contenido: Conclusiones
     doc.add_paragraph()
 
@@ -1196,6 +1415,9 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
 
     '''
 
+
+def _seccion_medidas(doc, df_centros, df_mediciones, areas_no_cumplen):
+    """Prescripción de medidas (4)."""
     # -------------------------------
     # 4) MEDIDAS CORRECTIVAS
     # -------------------------------
@@ -1204,7 +1426,7 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
     paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
 
     # Asumiendo que row_centro ya está definido y contiene la información de la empresa:
-    razon_social = row_centro.get('razon_social', 'RENDIC HERMANOS S.A.')
+    razon_social = df_centros.iloc[0].get('razon_social', 'RENDIC HERMANOS S.A.')
 
     ##CAMBIO
     # Luego, en el cuerpo del documento:
@@ -1233,6 +1455,9 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
 
     doc.add_paragraph()
 
+
+def _seccion_vigencia(doc, df_visitas, areas_no_cumplen):
+    """Vigencia del informe (5) y firma del consultor."""
     # -------------------------------
     # 5) VIGENCIA DEL INFORME
     # -------------------------------
@@ -1298,6 +1523,9 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
     p_zonal.alignment = WD_ALIGN_PARAGRAPH.CENTER
     run_zonal = p_zonal.add_run(consultor_zonal)
 
+
+def _seccion_anexo_tecnico(doc, df_visitas, df_mediciones):
+    """Anexo 1: verificación de equipos, vestimenta y características de las áreas."""
     # -------------------------------
     # 6) ANEXOS
     # -------------------------------
@@ -1320,6 +1548,8 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
 
     # Si hay datos en df_visitas, agrega las filas para cada equipo
     if not df_visitas.empty:
+        row_visita = df_visitas.iloc[0]
+
         # Para TBS
         row_cells = table_calib.add_row().cells
         row_cells[0].text = "TBS"
@@ -1364,33 +1594,21 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
     doc.add_paragraph()
     doc.add_heading("c)     Características generales de las areas evaluadas", level=3)
 
-    # Crear la tabla con 3 columnas: Área, Características constructivas y Condiciones de ventilación
-    tabla_caract = doc.add_table(rows=1, cols=3)
-    tabla_caract.style = 'Table Grid'
-
-    # Agregar la fila de encabezado
-    hdr_cells = tabla_caract.rows[0].cells
-    hdr_cells[0].text = "Área"
-    hdr_cells[1].text = "Características constructivas"
-    hdr_cells[2].text = "Condiciones de ventilación"
-
-    # Agrupar el DataFrame por "nombre_area"
-    grouped = df_mediciones.groupby("nombre_area")
-    for area, group in grouped:
-        # Usar el primer registro del grupo para extraer los datos de instalación
-        registro = group.iloc[0]
-
-        # Agregar una fila para el área con sus respectivos datos
-        row_cells = tabla_caract.add_row().cells
-        row_cells[0].text = area
-        row_cells[1].text = str(registro["caract_constructivas"])
-        row_cells[2].text = str(registro["ingreso_salida_aire"])
-
-    set_column_width(tabla_caract, 0, Cm(3))
-    set_column_width(tabla_caract, 1, Cm(7))
-    set_column_width(tabla_caract, 2, Cm(7))
-    format_row(tabla_caract.rows[0])
+    # Tabla con 3 columnas: Área, Características constructivas y Condiciones de ventilación.
+    # Se usa el primer registro de cada área para extraer los datos de instalación.
+    filas_caract = [
+        [area, str(group.iloc[0]["caract_constructivas"]), str(group.iloc[0]["ingreso_salida_aire"])]
+        for area, group in df_mediciones.groupby("nombre_area", observed=True)
+    ]
+    construir_tabla(doc, filas_caract, [
+        {"titulo": "Área", "ancho": Cm(3)},
+        {"titulo": "Características constructivas", "ancho": Cm(7)},
+        {"titulo": "Condiciones de ventilación", "ancho": Cm(7)},
+    ])
 
+
+def _seccion_anexo_equipos(doc, df_visitas, df_equipos):
+    """Anexo 2: fichas y certificados de los instrumentos de medición."""
     # Salto de página y título del anexo
     doc.add_page_break()
     doc.add_heading("Anexo 2. Instrumentos de medición utilizados", level=2)
@@ -1420,30 +1638,23 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
         }
 
         if not df_equipos_filtrado.empty:
+            fila_qr = list(field_mapping).index("url_certificado")
             for idx, row_eq in df_equipos_filtrado.iterrows():
-                # Crear una tabla de dos columnas para los datos del equipo
-                tabla_equipo = doc.add_table(rows=len(field_mapping), cols=2)
-                tabla_equipo.style = 'Table Grid'
-                for row_num, (key, display_name) in enumerate(field_mapping.items()):
-                    tabla_equipo.rows[row_num].cells[0].text = display_name
-                    if key == "url_certificado":
-                        url = str(row_eq.get(key, ""))
-                        if url.strip():
-                            # Genera un código QR (función asumida)
-                            qr_img = generate_qr_code(url)
-                            cell = tabla_equipo.rows[row_num].cells[1]
-                            cell.text = ""
-                            run = cell.paragraphs[0].add_run()
-                            run.add_break()
-                            run.add_picture(qr_img, width=Inches(1))
-                            run.add_break()
-                        else:
-                            tabla_equipo.rows[row_num].cells[1].text = ""
-                    else:
-                        tabla_equipo.rows[row_num].cells[1].text = str(row_eq.get(key, ""))
-                # Ajustar anchos de columnas para toda la tabla (se recomienda hacerlo fuera del bucle interno)
-                set_column_width(tabla_equipo, 0, Cm(3.5))
-                set_column_width(tabla_equipo, 1, Cm(13.5))
+                # Tabla de dos columnas con los datos del equipo; la celda del QR se completa después
+                filas = [
+                    [display_name, "" if key == "url_certificado" else str(row_eq.get(key, ""))]
+                    for key, display_name in field_mapping.items()
+                ]
+                tabla_equipo = construir_tabla(doc, filas, [{"ancho": Cm(3.5)}, {"ancho": Cm(13.5)}])
+
+                url = str(row_eq.get("url_certificado", ""))
+                if url.strip():
+                    # Código QR con el enlace al certificado (única celda que requiere python-docx)
+                    qr_img = generate_qr_code(url)
+                    run = tabla_equipo.rows[fila_qr].cells[1].paragraphs[0].add_run()
+                    run.add_break()
+                    run.add_picture(qr_img, width=Inches(1))
+                    run.add_break()
 
                 doc.add_paragraph("")  # Separador entre tablas
 
@@ -1476,12 +1687,76 @@ def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -
     else:
         doc.add_paragraph("No se encontró información de la visita o de los equipos.")
 
+
+# -----------------------------------------------
+# FUNCIÓN PARA GENERAR EL DOCUMENTO WORD
+# -----------------------------------------------
+@medido("informe.total")
+def generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos) -> BytesIO:
+    """
+    Genera el informe en Word utilizando:
+      - df_centros: información del centro de trabajo (tabla higiene_Centros_Trabajo)
+      - df_visitas: información de visitas (tabla higiene_Visitas); se selecciona la visita más reciente.
+      - df_mediciones: mediciones asociadas a la visita (tabla higiene_Mediciones)
+      - df_equipos: información de equipos de medición (tabla higiene_Equipos_Medicion)
+    """
+
+    with medir("informe.formato_columnas"):
+        format_columns(df_visitas, ['nombre_personal_visita', 'consultor_ist'], mode="title")
+        format_columns(df_visitas, 'cargo_personal_visita', mode="capitalize")
+        # Normalmente ya viene normalizado desde la carga; sobre datos ya normalizados no cambia nada
+        df_mediciones = normalizar_mediciones(df_mediciones)
+
+    with medir("informe.estilos"):
+        doc = Document()
+        look_informe(doc)
+        set_vertical_alignment(doc, section_index=0, alignment='top')
+
+    # Cabecera con logo
+    section = doc.sections[0]
+    section.header_distance = Inches(0.4)
+    header = section.header
+    if header.paragraphs:
+        paragraph = header.paragraphs[0]
+    else:
+        paragraph = header.add_paragraph()
+    paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    run = paragraph.add_run()
+    run.add_picture('IST.jpg', width=Cm(2))
+
+    # Cada sección se toma de la cache de secciones si sus datos no cambiaron
+    _agregar_seccion(doc, "identificacion", _seccion_identificacion, df_centros, df_visitas)
+
+    _agregar_seccion(doc, "resultados", _seccion_resultados, df_mediciones)
+
+    # Procesar áreas antes del resumen
+    with medir("informe.pmv_areas"):
+        areas_cumplen, areas_no_cumplen = procesar_areas(df_mediciones)
+
+    with medir("informe.incertidumbre"):
+        decisiones = {**{str(a): "CUMPLE" for a in areas_cumplen}, **{str(a): "NO CUMPLE" for a in areas_no_cumplen}}
+        df_incertidumbre = incertidumbre.analizar_areas(df_mediciones, df_visitas, decisiones)
+    _agregar_seccion(doc, "incertidumbre", _seccion_incertidumbre, df_incertidumbre)
+
+    _agregar_seccion(doc, "conclusiones", _seccion_conclusiones, df_centros, areas_cumplen, areas_no_cumplen)
+    _agregar_seccion(doc, "medidas", _seccion_medidas, df_centros, df_mediciones, areas_no_cumplen)
+    _agregar_seccion(doc, "vigencia", _seccion_vigencia, df_visitas, areas_no_cumplen,
+                     archivos=["imagenes-firma"])
+    # El anexo técnico solo usa las características de cada área, no las mediciones
+    caracteristicas = df_mediciones[[c for c in ("nombre_area", "caract_constructivas", "ingreso_salida_aire")
+                                     if c in df_mediciones.columns]]
+    _agregar_seccion(doc, "anexo_tecnico", _seccion_anexo_tecnico, df_visitas, caracteristicas)
+    _agregar_seccion(doc, "anexo_equipos", _seccion_anexo_equipos, df_visitas, df_equipos,
+                     archivos=_directorios_equipos(df_visitas, df_equipos))
+    _renumerar_imagenes(doc)
+
     # (Continúa el resto del script si es necesario)
 
     # -------------------------------
     # Finaliza el documento y lo retorna como BytesIO
     # -------------------------------
     buffer = BytesIO()
-    doc.save(buffer)
+    with medir("informe.guardar"):
+        doc.save(buffer)
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
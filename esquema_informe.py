@@ -0,0 +1,108 @@
+"""
+Columnas y tipos de datos que usa el informe (doc_utils.generar_informe_en_word).
+
+Las consultas del informe (data_access y data_access_sqlite) traen solo estas columnas en vez
+de SELECT * y las convierten a tipos declarados, en lugar de dejar que pandas los infiera.
+Las mediciones pasan además por normalizar_mediciones una sola vez al cargarse: tipos
+declarados y texto de área, sector y puesto ya formateado para el informe.
+"""
+import numpy as np
+import pandas as pd
+
+# Columnas de cada tabla que se leen para el informe
+COLUMNAS_CENTRO_INFORME = [
+    "cuv", "razon_social", "rut", "CIIU", "nombre_ct", "direccion_ct", "comuna_ct", "region_ct"
+]
+COLUMNAS_VISITA_INFORME = [
+    "id_visita", "cuv_visita", "fecha_visita", "hora_visita", "temperatura_dia", "motivo_evaluacion",
+    "nombre_personal_visita", "cargo_personal_visita", "consultor_ist", "consultor_cargo", "consultor_zonal",
+    "equipo_temp", "equipo_vel_air", "patron_tbs", "ver_tbs_ini", "ver_tbs_fin",
+    "patron_tbh", "ver_tbh_ini", "ver_tbh_fin", "patron_tg", "ver_tg_ini", "ver_tg_fin"
+]
+COLUMNAS_MEDICION_INFORME = [
+    "id_medicion", "visita_id", "nombre_area", "sector_especifico", "puesto_trabajo",
+    "t_bul_seco", "t_globo", "hum_rel", "vel_air", "ppd", "pmv", "resultado_medicion", "met", "clo",
+    "caract_constructivas", "ingreso_salida_aire"
+]
+COLUMNAS_EQUIPO_INFORME = [
+    "id_equipo", "nombre_equipo", "cod_equipo", "n_serie_equipo", "marca_equipo", "modelo_equipo",
+    "fecha_calibracion", "prox_calibracion", "empresa_certificadora", "num_certificado", "url_certificado"
+]
+
+# Tipos declarados de las columnas del informe. Las mediciones llegan como float aunque el
+# driver las entregue como Decimal u object; área, sector y puesto se repiten mucho dentro
+# de una visita y se guardan como categóricas. Las columnas no listadas se dejan como vienen.
+TIPOS_INFORME = {
+    "temperatura_dia": "float64",
+    "patron_tbs": "float64", "ver_tbs_ini": "float64", "ver_tbs_fin": "float64",
+    "patron_tbh": "float64", "ver_tbh_ini": "float64", "ver_tbh_fin": "float64",
+    "patron_tg": "float64", "ver_tg_ini": "float64", "ver_tg_fin": "float64",
+    "t_bul_seco": "float64", "t_globo": "float64", "hum_rel": "float64", "vel_air": "float64",
+    "ppd": "float64", "pmv": "float64", "met": "float64", "clo": "float64",
+    "nombre_area": "category", "sector_especifico": "category", "puesto_trabajo": "category",
+}
+
+
+def aplicar_tipos_informe(df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte las columnas presentes en 'df' a los tipos de TIPOS_INFORME."""
+    tipos = {}
+    for columna, tipo in TIPOS_INFORME.items():
+        if columna not in df.columns or df[columna].dtype == tipo:
+            continue
+        if tipo == "float64" and not pd.api.types.is_numeric_dtype(df[columna]):
+            # Decimal, texto o None desde el driver: lo no numérico queda como NaN
+            df[columna] = pd.to_numeric(df[columna], errors="coerce")
+        tipos[columna] = tipo
+    return df.astype(tipos) if tipos else df
+
+
+# Columnas de texto de las mediciones que el informe muestra con solo la primera letra en mayúscula
+COLUMNAS_TEXTO_MEDICION = ["nombre_area", "sector_especifico", "puesto_trabajo"]
+
+# str.title y str.capitalize ya dejan en minúscula el resto de cada palabra
+_FORMATOS_TEXTO = {"title": str.title, "capitalize": str.capitalize, "upper": str.upper}
+
+
+def normalizar_texto(serie: pd.Series, modo: str = "title") -> pd.Series:
+    """
+    Elimina espacios al inicio y al final y aplica el formato 'modo' ("title", "capitalize" o
+    "upper") en una sola pasada sobre los valores distintos de la serie, no sobre cada fila.
+    Una serie categórica sigue siendo categórica, con categorías ordenadas alfabéticamente
+    (el mismo orden que usa groupby con texto). Los valores faltantes se mantienen.
+    """
+    formato = _FORMATOS_TEXTO.get(modo)
+    if formato is None:
+        raise ValueError(f"Modo '{modo}' no reconocido. Use 'title', 'capitalize' o 'upper'.")
+
+    categorica = isinstance(serie.dtype, pd.CategoricalDtype)
+    if categorica:
+        serie = serie.cat.remove_unused_categories()
+        codigos, unicos = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, unicos = pd.factorize(serie)
+
+    # Valores distintos que quedan iguales después de formatear se unen en una sola categoría
+    inversa, categorias = pd.factorize(np.array([formato(str(v).strip()) for v in unicos], dtype=object),
+                                       sort=True)
+    nuevos = np.where(codigos >= 0, inversa[np.maximum(codigos, 0)] if len(inversa) else -1, -1)
+
+    if categorica:
+        return pd.Series(pd.Categorical.from_codes(nuevos, categories=categorias),
+                         index=serie.index, name=serie.name)
+    valores = np.full(len(nuevos), np.nan, dtype=object)
+    presentes = nuevos >= 0
+    valores[presentes] = np.asarray(categorias, dtype=object)[nuevos[presentes]]
+    return pd.Series(valores, index=serie.index, name=serie.name).astype(str)
+
+
+def normalizar_mediciones(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Etapa única de normalización de las mediciones, al cargarlas: tipos de TIPOS_INFORME
+    (float64 para las mediciones, categóricas para área, sector y puesto) y texto de
+    COLUMNAS_TEXTO_MEDICION formateado para el informe. Volver a aplicarla no cambia nada.
+    """
+    df = aplicar_tipos_informe(df)
+    for columna in COLUMNAS_TEXTO_MEDICION:
+        if columna in df.columns:
+            df[columna] = normalizar_texto(df[columna], "capitalize")
+    return df
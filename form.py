@@ -1,23 +1,34 @@
 import streamlit as st
+import calentamiento  # antes de pythermalcomfort: fija la cache de numba
 import pandas as pd
 from datetime import datetime, date, time
-from data_access2 import get_data   # Función que obtiene el CSV principal
-from data_access import insertar_visita, insert_verif_final_visita, insertar_medicion
-from doc_utils import generar_informe_en_word  # Función para generar el Word
+from data_access2 import get_data   # Función que obtiene el CSV principal (con cache)
+from data_access import get_codigos_equipo
+import almacen_local
+import informe_especulativo
+import datos_compartidos
 from pythermalcomfort.models import pmv_ppd_iso
 import zipfile
 import io
 from data_access import (
-    get_centro,
     get_visita,
     get_mediciones,
-    get_equipos,
-    get_all_cuvs_with_visits  # Si también deseas agregar la generación masiva
 )
-from doc_utils import generar_informe_en_word
+from data_cache import get_equipos_cached, get_all_cuvs_cached, get_centro_cached, invalidar_cache_visitas
 from informe import generar_informe_desde_cuv
 
 st.set_page_config(page_title="Informes Confort Térmico", layout="wide")
+datos_compartidos.activar_copy_on_write()
+
+# Compila (o carga desde disco) el cálculo de PMV antes de atender al usuario; solo la primera vez por proceso
+calentamiento.calentar_pmv()
+
+# Las visitas y mediciones se guardan localmente y un hilo las envía a SQL Server
+almacen_local.iniciar_sincronizador()
+_pendientes = almacen_local.resumen_pendientes()
+if _pendientes["visitas"]:
+    st.sidebar.info(f"Pendientes de enviar a la base de datos: {_pendientes['visitas']} visita(s), "
+                    f"{_pendientes['mediciones']} medición(es). Se envían automáticamente.")
 
 def get_met(puesto_trabajo):
     if puesto_trabajo == "Cajera":
@@ -50,6 +61,152 @@ def interpret_pmv(pmv_value):
         return "Fría"
 
 
+MAX_AREAS = 10
+
+
+def calcular_pmv_area(i: int, tdb, tr, vr, rh, met, clo):
+    """
+    PMV/PPD del área i. El resultado se guarda en session_state junto a sus entradas y solo se
+    recalcula cuando alguna cambia.
+    """
+    entradas = (tdb, tr, vr, rh, met, clo)
+    previo = st.session_state.get(f"pmv_calculado_{i}")
+    if previo is None or previo[0] != entradas:
+        resultados = pmv_ppd_iso(tdb=tdb, tr=tr, vr=vr, rh=rh, met=met, clo=clo,
+                                 model="7730-2005", limit_inputs=False)
+        previo = (entradas, resultados.pmv, resultados.ppd)
+        st.session_state[f"pmv_calculado_{i}"] = previo
+    return previo[1], previo[2]
+
+
+@st.fragment
+def editar_area(i: int):
+    """
+    Editor del área i. Al ser un fragmento, interactuar con sus campos solo vuelve a ejecutar esta
+    función (no la página completa). La fila completa queda en st.session_state["areas_data"][i - 1]
+    ({} mientras falten datos obligatorios) para que "Guardar áreas" la lea. Un área ya guardada
+    se muestra bloqueada: sus campos no se pueden cambiar porque la medición ya está registrada.
+    """
+    id_medicion = st.session_state.get("mediciones_ids", {}).get(f"medicion_{i}")
+    guardada = id_medicion is not None
+    titulo = f"Área {i} - Guardada (ID Medición: {id_medicion})" if guardada else f"Área {i} - Haz clic para expandir"
+    with st.expander(titulo, expanded=False):
+        if guardada:
+            st.info("Esta área ya está guardada y no se puede modificar.")
+        # Captura de datos del formulario
+        nombre_area = st.selectbox(f"Área {i}",
+                                   ["Seleccione...", "Linea de cajas", "Sala de venta", "Bodega",
+                                    "Recepción"], key=f"area_sector_{i}", disabled=guardada)
+        sector_especifico = st.selectbox(f"Sector específico {i}",
+                                         ["Seleccione...", "Centro", "Izquierda", "Derecha"],
+                                         key=f"espec_sector_{i}", disabled=guardada)
+        ##CAMBIO
+        puesto_trabajo = st.selectbox(f"Puesto de trabajo {i}",
+                                      ["Seleccione...", "Cajera(o)", "Reponedor(a)", "Bodeguero(a)",
+                                       "Recepcionista"], key=f"puesto_trabajo_{i}", disabled=guardada)
+        posicion_trabajador = st.selectbox(f"Posición {i}", ["Seleccione...", "De pie", "Sentado"],
+                                           key=f"pos_trabajador_{i}", disabled=guardada)
+        vestimenta_trabajador = st.selectbox(f"Vestimenta {i}",
+                                             ["Seleccione...", "Ligera", "Abrigada"],
+                                             key=f"vestimenta_{i}", disabled=guardada)
+        ##FINCAMBIO
+
+        # Mediciones
+        t_bul_seco = st.number_input(f"Temp. bulbo seco (°C) {i}", step=0.1, key=f"tbs_{i}", disabled=guardada)
+        t_globo = st.number_input(f"Temp. globo (°C) {i}", step=0.1, key=f"tg_{i}", disabled=guardada)
+        hum_rel = st.number_input(f"Humedad relativa (%) {i}", step=0.1, key=f"hr_{i}", disabled=guardada)
+        vel_air = st.number_input(f"Velocidad del aire (m/s) {i}", step=0.1, key=f"vel_aire_{i}", disabled=guardada)
+
+        # Cálculo de PMV y PPD
+        met = get_met(puesto_trabajo)  # Puede depender del puesto de trabajo
+        clo = 0.5 if vestimenta_trabajador == "Habitual" else 1.0
+        pmv, ppd = calcular_pmv_area(i, t_bul_seco, t_globo, vel_air, hum_rel, met, clo)
+        resultado_medicion = check_resultado_pmv(pmv)
+        if not any((t_bul_seco, t_globo, vel_air, hum_rel)):
+            # El área se guarda igual que antes, pero se avisa para no registrar una medición vacía
+            if nombre_area != "Seleccione...":
+                st.warning(f"Área {i}: todas las mediciones están en 0; revise los valores antes de guardar.")
+        else:
+            st.caption(f"PMV {pmv:.2f} ({interpret_pmv(pmv)}) · PPD {ppd:.1f}% · {resultado_medicion}")
+
+        # Condiciones y observaciones
+        cond_techumbre = st.radio(f"Techumbre aislante {i}", ["Sí", "No"], key=f"techumbre_{i}", disabled=guardada)
+        obs_techumbre = st.text_input(f"Obs. Techumbre {i}", key=f"obs_techumbre_{i}", disabled=guardada)
+        cond_techumbre = 1 if cond_techumbre == "Sí" else 0
+
+        cond_paredes = st.radio(f"Paredes aislantes {i}", ["Sí", "No"], key=f"paredes_{i}", disabled=guardada)
+        obs_paredes = st.text_input(f"Obs. Paredes {i}", key=f"obs_paredes_{i}", disabled=guardada)
+        cond_paredes = 1 if cond_paredes == "Sí" else 0
+
+        cond_vantanal = st.radio(f"Ventanas aislantes {i}", ["Sí", "No"], key=f"ventanales_{i}", disabled=guardada)
+        obs_ventanal = st.text_input(f"Obs. Ventanas {i}", key=f"obs_ventanales_{i}", disabled=guardada)
+        cond_vantanal = 1 if cond_vantanal == "Sí" else 0
+
+        cond_aire_acond = st.radio(f"Aire acondicionado {i}", ["Sí", "No"], key=f"aire_acond_{i}", disabled=guardada)
+        obs_aire_acond = st.text_input(f"Obs. Aire Acondicionado {i}", key=f"obs_aire_acond_{i}", disabled=guardada)
+        cond_aire_acond = 1 if cond_aire_acond == "Sí" else 0
+
+        cond_ventiladores = st.radio(f"Ventiladores {i}", ["Sí", "No"], key=f"ventiladores_{i}", disabled=guardada)
+        obs_ventiladores = st.text_input(f"Obs. Ventiladores {i}", key=f"obs_ventiladores_{i}", disabled=guardada)
+        cond_ventiladores = 1 if cond_ventiladores == "Sí" else 0
+
+        cond_inyeccion_extraccion = st.radio(f"Inyección/Extracción {i}", ["Sí", "No"],
+                                             key=f"inyeccion_extrac_{i}", disabled=guardada)
+        obs_inyeccion_extraccion = st.text_input(f"Obs. Inyección {i}", key=f"obs_inyeccion_{i}", disabled=guardada)
+        cond_inyeccion_extraccion = 1 if cond_inyeccion_extraccion == "Sí" else 0
+
+        cond_ventanas = st.radio(f"Ventanas abiertas {i}", ["Sí", "No"], key=f"ventanas_{i}", disabled=guardada)
+        obs_ventanas = st.text_input(f"Obs. Ventanas {i}", key=f"obs_ventanas_{i}", disabled=guardada)
+        cond_ventanas = 1 if cond_ventanas == "Sí" else 0
+
+        cond_puertas = st.radio(f"Puertas abiertas {i}", ["Sí", "No"], key=f"puertas_{i}", disabled=guardada)
+        obs_puertas = st.text_input(f"Obs. Puertas {i}", key=f"obs_puertas_{i}", disabled=guardada)
+        cond_puertas = 1 if cond_puertas == "Sí" else 0
+
+        cond_otras = st.radio(f"Puertas abiertas {i}", ["Sí", "No"], key=f"otras_{i}", disabled=guardada)
+        obs_otras = st.text_input(f"¿Se identifican otras condiciones que pueden considerarse como disconfort térmico? {i}", key=f"obs_otras_{i}", disabled=guardada)
+        cond_otras = 1 if cond_otras == "Sí" else 0
+
+    # Solo se guardan las áreas con todos los datos completos
+    fila = {}
+    if nombre_area != "Seleccione..." and sector_especifico != "Seleccione..." and puesto_trabajo != "Seleccione..." and posicion_trabajador != "Seleccione...":
+        fila = {
+            "nombre_area": nombre_area,
+            "sector_especifico": sector_especifico,
+            "puesto_trabajo": puesto_trabajo,
+            "posicion_trabajador": posicion_trabajador,
+            "vestimenta_trabajador": vestimenta_trabajador,
+            "t_bul_seco": t_bul_seco,
+            "t_globo": t_globo,
+            "hum_rel": hum_rel,
+            "vel_air": vel_air,
+            "ppd": ppd,
+            "pmv": pmv,
+            "resultado_medicion": resultado_medicion,
+            "cond_techumbre": cond_techumbre,
+            "obs_techumbre": obs_techumbre,
+            "cond_paredes": cond_paredes,
+            "obs_paredes": obs_paredes,
+            "cond_vantanal": cond_vantanal,
+            "obs_ventanal": obs_ventanal,
+            "cond_aire_acond": cond_aire_acond,
+            "obs_aire_acond": obs_aire_acond,
+            "cond_ventiladores": cond_ventiladores,
+            "obs_ventiladores": obs_ventiladores,
+            "cond_inyeccion_extraccion": cond_inyeccion_extraccion,
+            "obs_inyeccion_extraccion": obs_inyeccion_extraccion,
+            "cond_ventanas": cond_ventanas,
+            "obs_ventanas": obs_ventanas,
+            "cond_puertas": cond_puertas,
+            "obs_puertas": obs_puertas,
+            "cond_otras": cond_otras,
+            "obs_otras": obs_otras,
+            "met": met,
+            "clo": clo,
+        }
+    st.session_state["areas_data"][i - 1] = fila
+
+
 def main():
     st.header("Informes Confort Térmico")
     st.write("Versión 3.0.20250205")
@@ -68,17 +225,14 @@ def main():
         "2PACX-1vSn2sEH86jBQNbjQEhtehoFIL54cFtdH3HST5zM257XbzkFx5V3VNDCO_CyIYiIWECrl1xoohSnC-lC/"
         "pub?output=csv"
     )
-    df_cuv_info = pd.read_csv(csv_url_cuv_info)
+    df_cuv_info = get_data(csv_url_cuv_info)
 
     # --- Inicialización en session_state ---
-    if "df_filtrado" not in st.session_state:
-        st.session_state["df_filtrado"] = pd.DataFrame()
-    if "df_info_cuv" not in st.session_state:
-        st.session_state["df_info_cuv"] = pd.DataFrame()
+    # La sesión guarda el CUV buscado; el centro se comparte entre sesiones (datos_compartidos)
     if "input_cuv_str" not in st.session_state:
         st.session_state["input_cuv_str"] = ""
     if "areas_data" not in st.session_state:
-        st.session_state["areas_data"] = [{} for _ in range(10)]  # 10 áreas por defecto
+        st.session_state["areas_data"] = [{}]  # Se agregan más áreas a pedido
     if "datos_generales" not in st.session_state:
         st.session_state["datos_generales"] = {}
     if "cierre" not in st.session_state:
@@ -88,9 +242,12 @@ def main():
     input_cuv = st.text_input("Ingresa el CUV: ej. 183885")
     if st.button("Buscar"):
         cuv_ingresado = input_cuv.strip()
-        #st.session_state["input_cuv_str"] = input_cuv.strip()
-        st.session_state["df_centro"] = get_centro(cuv_ingresado)
-    df_centro = st.session_state.get("df_centro", pd.DataFrame())
+        st.session_state["input_cuv_str"] = cuv_ingresado
+        df_centro = get_centro_cached(cuv_ingresado, recargar=True)
+    elif st.session_state["input_cuv_str"]:
+        df_centro = get_centro_cached(st.session_state["input_cuv_str"])
+    else:
+        df_centro = pd.DataFrame()
     #st.write(df_centro)
     #st.write(df_centro)
 
@@ -134,60 +291,10 @@ def main():
 
             st.markdown("#### Verificación de parámetros")
             cod_equipo_t = st.selectbox("Equipo temperatura",
-                                        options=["Seleccione...",
-                                                 "T1",
-                                                 "T2",
-                                                 "T3",
-                                                 "T4",
-                                                 "T5",
-                                                 "T6",
-                                                 "T7",
-                                                 "T8",
-                                                 "T9",
-                                                 "T10",
-                                                 "T11",
-                                                 "T12",
-                                                 "T13",
-                                                 "T14",
-                                                 "T15",
-                                                 "T16",
-                                                 "T17",
-                                                 "T18",
-                                                 "T19",
-                                                 "T20",
-                                                 "T21",
-                                                 "T22",
-                                                 "T23",
-                                                 "T24",
-                                                 "T25",
-                                                 "T26",
-                                                 "T27",
-                                                 "T28",
-                                                 "T29",
-                                                 "T30",
-                                                 "T31",
-                                                 "T32"],
+                                        options=["Seleccione..."] + get_codigos_equipo("T"),
                                         index=0)
             cod_equipo_v = st.selectbox("Equipo velocidad aire",
-                                        ##CAMBIO
-                                        options=["Seleccione...",
-                                        ##FINCAMBIO
-                                                 "V1",
-                                                 "V2",
-                                                 "V3",
-                                                 "V4",
-                                                 "V5",
-                                                 "V6",
-                                                 "V7",
-                                                 "V8",
-                                                 "V9",
-                                                 "V10",
-                                                 "V11",
-                                                 "V12",
-                                                 "V13",
-                                                 "V14",
-                                                 "V15",
-                                                 ],
+                                        options=["Seleccione..."] + get_codigos_equipo("V"),
                                         index=0)
 
             ##CAMBIO
@@ -219,8 +326,8 @@ def main():
                 "Verificación TG inicial": verif_tg_inicial
             }
 
-            # Guardar la visita en la base de datos
-            id_visita = insertar_visita(
+            # Guardar la visita en el almacén local (se sincroniza con la base de datos en segundo plano)
+            id_visita = almacen_local.guardar_visita(
                 cuv_val,
                 fecha_visita,
                 hora_medicion,
@@ -243,13 +350,13 @@ def main():
 
             if id_visita:
                 st.session_state["id_visita"] = id_visita
-                st.success(f"Visita guardada con éxito. ID de la visita: {id_visita}")
+                st.success(f"Visita guardada con éxito. ID local de la visita: {id_visita}")
             else:
-                st.error("Error al guardar la visita en la base de datos.")
+                st.error("Error al guardar la visita.")
 
-        # 3. Formulario 2: Mediciones de Áreas (Formularios Independientes)
+        # 3. Mediciones de Áreas (se guardan todas juntas en una transacción)
         st.subheader("Mediciones de Áreas")
-        st.info("Completa y guarda cada área individualmente")
+        st.info("Completa las áreas evaluadas y guárdalas todas juntas")
 
         # Verificar que el ID de la visita existe antes de guardar mediciones
         id_visita = st.session_state.get("id_visita", None)
@@ -259,129 +366,46 @@ def main():
             st.session_state["mediciones_ids"] = {}
 
         if id_visita:
-            for i in range(1, 11):  # Iterar por cada área de medición
-                area_idx = i - 1
-                default_area = st.session_state.areas_data[area_idx] if area_idx < len(
-                    st.session_state.areas_data) else {}
-
-                with st.expander(f"Área {i} - Haz clic para expandir", expanded=False):
-                    with st.form(key=f"form_area_{i}"):
-
-                        # Captura de datos del formulario
-                        nombre_area = st.selectbox(f"Área {i}",
-                                                   ["Seleccione...", "Linea de cajas", "Sala de venta", "Bodega",
-                                                    "Recepción"], key=f"area_sector_{i}")
-                        sector_especifico = st.selectbox(f"Sector específico {i}",
-                                                         ["Seleccione...", "Centro", "Izquierda", "Derecha"],
-                                                         key=f"espec_sector_{i}")
-                        ##CAMBIO
-                        puesto_trabajo = st.selectbox(f"Puesto de trabajo {i}",
-                                                      ["Seleccione...", "Cajera(o)", "Reponedor(a)", "Bodeguero(a)",
-                                                       "Recepcionista"], key=f"puesto_trabajo_{i}")
-                        posicion_trabajador = st.selectbox(f"Posición {i}", ["Seleccione...", "De pie", "Sentado"],
-                                                           key=f"pos_trabajador_{i}")
-                        vestimenta_trabajador = st.selectbox(f"Vestimenta {i}",
-                                                             ["Seleccione...", "Ligera", "Abrigada"],
-                                                             key=f"vestimenta_{i}")
-                        ##FINCAMBIO
-
-                        # Mediciones
-                        t_bul_seco = st.number_input(f"Temp. bulbo seco (°C) {i}", step=0.1, key=f"tbs_{i}")
-                        t_globo = st.number_input(f"Temp. globo (°C) {i}", step=0.1, key=f"tg_{i}")
-                        hum_rel = st.number_input(f"Humedad relativa (%) {i}", step=0.1, key=f"hr_{i}")
-                        vel_air = st.number_input(f"Velocidad del aire (m/s) {i}", step=0.1, key=f"vel_aire_{i}")
-
-                        # Cálculo de PMV y PPD
-                        met = get_met(puesto_trabajo)  # Puede depender del puesto de trabajo
-                        clo = 0.5 if vestimenta_trabajador == "Habitual" else 1.0
-                        resultados = pmv_ppd_iso(tdb=t_bul_seco, tr=t_globo, vr=vel_air, rh=hum_rel, met=met, clo=clo,
-                                                 model="7730-2005", limit_inputs=False)
-                        pmv = resultados.pmv
-                        ppd = resultados.ppd
-                        resultado_medicion = check_resultado_pmv(pmv)
-
-                        # Condiciones y observaciones
-                        cond_techumbre = st.radio(f"Techumbre aislante {i}", ["Sí", "No"], key=f"techumbre_{i}")
-                        obs_techumbre = st.text_input(f"Obs. Techumbre {i}", key=f"obs_techumbre_{i}")
-                        cond_techumbre = 1 if cond_techumbre == "Sí" else 0
-
-                        cond_paredes = st.radio(f"Paredes aislantes {i}", ["Sí", "No"], key=f"paredes_{i}")
-                        obs_paredes = st.text_input(f"Obs. Paredes {i}", key=f"obs_paredes_{i}")
-                        cond_paredes = 1 if cond_paredes == "Sí" else 0
-
-                        cond_vantanal = st.radio(f"Ventanas aislantes {i}", ["Sí", "No"], key=f"ventanales_{i}")
-                        obs_ventanal = st.text_input(f"Obs. Ventanas {i}", key=f"obs_ventanales_{i}")
-                        cond_vantanal = 1 if cond_vantanal == "Sí" else 0
-
-                        cond_aire_acond = st.radio(f"Aire acondicionado {i}", ["Sí", "No"], key=f"aire_acond_{i}")
-                        obs_aire_acond = st.text_input(f"Obs. Aire Acondicionado {i}", key=f"obs_aire_acond_{i}")
-                        cond_aire_acond = 1 if cond_aire_acond == "Sí" else 0
-
-                        cond_ventiladores = st.radio(f"Ventiladores {i}", ["Sí", "No"], key=f"ventiladores_{i}")
-                        obs_ventiladores = st.text_input(f"Obs. Ventiladores {i}", key=f"obs_ventiladores_{i}")
-                        cond_ventiladores = 1 if cond_ventiladores == "Sí" else 0
-
-                        cond_inyeccion_extraccion = st.radio(f"Inyección/Extracción {i}", ["Sí", "No"],
-                                                             key=f"inyeccion_extrac_{i}")
-                        obs_inyeccion_extraccion = st.text_input(f"Obs. Inyección {i}", key=f"obs_inyeccion_{i}")
-                        cond_inyeccion_extraccion = 1 if cond_inyeccion_extraccion == "Sí" else 0
-
-                        cond_ventanas = st.radio(f"Ventanas abiertas {i}", ["Sí", "No"], key=f"ventanas_{i}")
-                        obs_ventanas = st.text_input(f"Obs. Ventanas {i}", key=f"obs_ventanas_{i}")
-                        cond_ventanas = 1 if cond_ventanas == "Sí" else 0
-
-                        cond_puertas = st.radio(f"Puertas abiertas {i}", ["Sí", "No"], key=f"puertas_{i}")
-                        obs_puertas = st.text_input(f"Obs. Puertas {i}", key=f"obs_puertas_{i}")
-                        cond_puertas = 1 if cond_puertas == "Sí" else 0
-
-                        cond_otras = st.radio(f"Puertas abiertas {i}", ["Sí", "No"], key=f"otras_{i}")
-                        obs_otras = st.text_input(f"¿Se identifican otras condiciones que pueden considerarse como disconfort térmico? {i}", key=f"obs_otras_{i}")
-                        cond_otras = 1 if cond_otras == "Sí" else 0
-
-                        # Guardar medición
-                        if st.form_submit_button(f"Guardar Área {i}"):
-                            print(f"Inserción de medición - Área {i}")
-                            print(f"ID Visita: {id_visita} (Tipo: {type(id_visita)})")
-                            print(f"Nombre Área: {nombre_area} (Tipo: {type(nombre_area)})")
-                            print(f"Sector Específico: {sector_especifico} (Tipo: {type(sector_especifico)})")
-                            print(f"Puesto Trabajo: {puesto_trabajo} (Tipo: {type(puesto_trabajo)})")
-                            print(f"Posición Trabajador: {posicion_trabajador} (Tipo: {type(posicion_trabajador)})")
-                            print(f"Vestimenta Trabajador: {vestimenta_trabajador} (Tipo: {type(vestimenta_trabajador)})")
-                            print(f"T Bulbo Seco: {t_bul_seco} (Tipo: {type(t_bul_seco)})")
-                            print(f"T Globo: {t_globo} (Tipo: {type(t_globo)})")
-                            print(f"Humedad Relativa: {hum_rel} (Tipo: {type(hum_rel)})")
-                            print(f"Velocidad Aire: {vel_air} (Tipo: {type(vel_air)})")
-                            print(f"PPD: {ppd} (Tipo: {type(ppd)})")
-                            print(f"PMV: {pmv} (Tipo: {type(pmv)})")
-                            print(f"Resultado Medición: {resultado_medicion} (Tipo: {type(resultado_medicion)})")
-                            print(f"Condición Techumbre: {cond_techumbre} (Tipo: {type(cond_techumbre)})")
-                            print(f"Observación Techumbre: {obs_techumbre} (Tipo: {type(obs_techumbre)})")
-                            # Solo insertar si todos los datos están completos
-                            if nombre_area != "Seleccione..." and sector_especifico != "Seleccione..." and puesto_trabajo != "Seleccione..." and posicion_trabajador != "Seleccione...":
-
-                                id_medicion = insertar_medicion(id_visita, nombre_area, sector_especifico,
-                                                                puesto_trabajo, posicion_trabajador,
-                                                                vestimenta_trabajador, t_bul_seco, t_globo, hum_rel,
-                                                                vel_air, ppd, pmv,
-                                                                resultado_medicion, cond_techumbre, obs_techumbre,
-                                                                cond_paredes, obs_paredes,
-                                                                cond_vantanal, obs_ventanal, cond_aire_acond,
-                                                                obs_aire_acond, cond_ventiladores,
-                                                                obs_ventiladores, cond_inyeccion_extraccion,
-                                                                obs_inyeccion_extraccion, cond_ventanas,
-                                                                obs_ventanas, cond_puertas, obs_puertas, cond_otras, obs_otras, met, clo)
-
-                                if id_medicion:
-                                    # Almacenar el ID de la medición en session_state pareado con el número de formulario
-                                    st.session_state["mediciones_ids"][f"medicion_{i}"] = id_medicion
-                                    st.success(f"Área {i} guardada con éxito. ID de la medición: {id_medicion}")
-                                    for key, id_medicion in st.session_state["mediciones_ids"].items():
-                                        st.write(
-                                            f"**{key.replace('_', ' ').capitalize()}** - ID Medición: {id_medicion}")
-                                else:
-                                    st.error(f"No se pudo guardar la medición para el área {i}.")
-                            else:
-                                st.warning(f"Completa todos los campos antes de guardar el Área {i}.")
+            # Resultado del último guardado (se muestra después del rerun que bloquea las áreas guardadas)
+            guardadas = st.session_state.pop("areas_guardadas", None)
+            if guardadas:
+                st.success(f"{guardadas} área(s) guardada(s) con éxito.")
+                for key, id_medicion in st.session_state["mediciones_ids"].items():
+                    st.write(
+                        f"**{key.replace('_', ' ').capitalize()}** - ID Medición: {id_medicion}")
+
+            # Cada área es un fragmento: editar un área solo vuelve a ejecutar ese bloque
+            for i in range(1, len(st.session_state["areas_data"]) + 1):
+                editar_area(i)
+
+            col_agregar, col_guardar = st.columns(2)
+            if col_agregar.button("Agregar área", disabled=len(st.session_state["areas_data"]) >= MAX_AREAS):
+                st.session_state["areas_data"].append({})
+                st.rerun()
+            submit_areas = col_guardar.button("Guardar áreas")
+            filas_areas = {i: fila for i, fila in enumerate(st.session_state["areas_data"], start=1) if fila}
+
+            if submit_areas:
+                # Las áreas ya guardadas en esta sesión no se vuelven a insertar (sus campos están bloqueados)
+                pendientes = {i: fila for i, fila in filas_areas.items()
+                              if f"medicion_{i}" not in st.session_state["mediciones_ids"]}
+                if not pendientes:
+                    if st.session_state["mediciones_ids"]:
+                        st.warning("Todas las áreas completas ya están guardadas. Agrega un área nueva para "
+                                   "registrar otra medición.")
+                    else:
+                        st.warning("Completa todos los campos de al menos un área nueva antes de guardar.")
+                else:
+                    ids_medicion = almacen_local.guardar_mediciones(id_visita, list(pendientes.values()))
+                    if ids_medicion:
+                        for i, id_medicion in zip(pendientes, ids_medicion):
+                            # Almacenar el ID de la medición en session_state pareado con el número de área
+                            st.session_state["mediciones_ids"][f"medicion_{i}"] = id_medicion
+                        # Se vuelve a ejecutar la página para mostrar bloqueadas las áreas recién guardadas
+                        st.session_state["areas_guardadas"] = len(ids_medicion)
+                        st.rerun()
+                    else:
+                        st.error("No se pudieron guardar las mediciones. Ninguna área fue guardada, intenta nuevamente.")
 
         # 4. Formulario 3: Cierre
 
@@ -412,12 +436,14 @@ def main():
             id_visita = st.session_state.get("id_visita", None)
 
             if id_visita:
-                # Intentamos actualizar el registro en la base de datos
-                actualizado = insert_verif_final_visita(id_visita, verif_tbs_final, verif_tbh_final, verif_tg_final,
-                                                        comentarios_finales)
+                # Se guarda localmente; el sincronizador actualiza la visita en la base de datos
+                actualizado = almacen_local.guardar_verif_final(id_visita, verif_tbs_final, verif_tbh_final,
+                                                                verif_tg_final, comentarios_finales)
 
                 if actualizado:
                     st.success("Formulario 3 guardado y visita actualizada correctamente.")
+                    # El informe se empieza a generar mientras el usuario revisa el cierre
+                    informe_especulativo.iniciar(id_visita, df_centro, get_equipos_cached())
 
                     # Guardar el estado de actualización en session_state
                     st.session_state["visita_actualizada"] = True
@@ -436,11 +462,23 @@ def main():
             st.write("Los datos han sido guardados. ¿Deseas generar el informe basado en la base de datos?")
 
             if st.button("Sí, generar informe automáticamente", key="generar_informe"):
-                cuv = cuv_val
-                informe_docx = generar_informe_desde_cuv(cuv)
-
-                if informe_docx:
-                    st.session_state["informe_docx"] = informe_docx
+                # Informe ya generado en segundo plano al cerrar la visita (si los datos no cambiaron)
+                informe_anticipado = informe_especulativo.obtener(st.session_state["id_visita"])
+                if informe_anticipado is not None:
+                    st.session_state["informe_docx"] = informe_anticipado
+                else:
+                    # El informe se genera desde la base de datos: primero se intenta enviar lo pendiente
+                    almacen_local.sincronizar_pendientes(forzar=True)
+                    estado = almacen_local.estado_visita(st.session_state["id_visita"])
+                    if estado and estado["sincronizada"]:
+                        invalidar_cache_visitas()
+                        informe_docx = generar_informe_desde_cuv(cuv_val)
+                        if informe_docx:
+                            st.session_state["informe_docx"] = informe_docx
+                    else:
+                        st.warning("La visita está guardada en este equipo pero aún no se pudo enviar a la base de datos "
+                                   f"({estado.get('ultimo_error') if estado else 'sin estado'}). "
+                                   "Se enviará automáticamente cuando haya conexión; intenta generar el informe más tarde.")
 
 
         # Mostrar el botón de descarga solo si ya se generó el informe
@@ -459,6 +497,8 @@ def main():
     else:
         st.info("Ingresa un CUV y haz clic en 'Buscar' para ver la información y generar el informe.")
 
+    datos_compartidos.mostrar_memoria_sesion()
+
 
 if __name__ == "__main__":
     main()
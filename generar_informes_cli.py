@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Generación masiva de informes de confort térmico desde la línea de comandos.
+
+Ejemplos:
+    python generar_informes_cli.py --salida informes/ --todos
+    python generar_informes_cli.py --salida informes/ --cuv 178050 183885
+    python generar_informes_cli.py --salida informes/ --desde 2025-01-01 --hasta 2025-03-31 --region "Metropolitana"
+    python generar_informes_cli.py --salida informes/ --consultor "Evelyn Toro Toro" --zip informes.zip --workers 4
+    python generar_informes_cli.py --salida informes/ --todos --pdf
+
+Cada informe generado se registra en un archivo de checkpoint dentro del directorio de salida;
+si la ejecución se interrumpe, al volver a lanzarla con los mismos argumentos se retoma
+desde el último CUV completado.
+"""
+import os
+import re
+import sys
+import json
+import time
+import logging
+import zipfile
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import calentamiento
+import instrumentacion
+
+CHECKPOINT_FILE = ".checkpoint.jsonl"
+
+# Catálogo de equipos por proceso de trabajo (se carga una vez en el inicializador)
+_df_equipos = None
+# Error del inicializador del proceso; cada CUV que recibe ese proceso lo informa en el checkpoint
+_error_inicializacion = None
+
+
+def nombre_archivo_informe(cuv, nombre_ct="") -> str:
+    """Nombre del .docx, igual al usado en la descarga masiva de supermain.py, sin caracteres inválidos."""
+    nombre = f"informe_termico_{cuv}_{nombre_ct}".strip("_")
+    return re.sub(r'[\\/:*?"<>|]+', "-", nombre) + ".docx"
+
+
+def leer_checkpoint(directorio: str) -> dict:
+    """Retorna {cuv: nombre_archivo} de los informes ya generados en ejecuciones anteriores."""
+    ruta = os.path.join(directorio, CHECKPOINT_FILE)
+    hechos = {}
+    if not os.path.exists(ruta):
+        return hechos
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                # Línea truncada por una interrupción: se ignora y el CUV se vuelve a generar
+                continue
+            if registro.get("estado") == "ok" and os.path.exists(os.path.join(directorio, registro["archivo"])):
+                hechos[str(registro["cuv"])] = registro["archivo"]
+    return hechos
+
+
+def registrar_checkpoint(directorio: str, registro: dict):
+    """Agrega un registro al checkpoint y fuerza su escritura a disco."""
+    with open(os.path.join(directorio, CHECKPOINT_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _inicializar_worker():
+    global _df_equipos, _error_inicializacion
+    # Una excepción aquí rompería el pool completo (BrokenProcessPool) sin indicar qué falló:
+    # se guarda y se informa como error de cada CUV
+    try:
+        # El primer informe de cada proceso no paga la compilación de numba
+        calentamiento.calentar_pmv()
+        from data_access import get_equipos_informe
+        _df_equipos = get_equipos_informe()
+    except Exception as e:
+        logging.error(f"Error al inicializar el proceso de generación: {e}")
+        _error_inicializacion = f"Error al inicializar el proceso de generación: {e}"
+
+
+def generar_un_informe(cuv):
+    """
+    Tarea de un proceso de trabajo: consulta los datos del CUV y genera el informe.
+    Retorna (cuv, nombre_archivo, bytes) o (cuv, None, mensaje_error).
+    """
+    from data_access import get_datos_informe
+    from report_cache import generar_informe_cacheado
+
+    if _error_inicializacion:
+        return cuv, None, _error_inicializacion
+    try:
+        df_centro, df_visitas, df_mediciones, df_equipos = get_datos_informe(cuv, _df_equipos)
+        if df_centro.empty or df_visitas.empty:
+            return cuv, None, "Sin información de centro o visita"
+        nombre_ct = df_centro.iloc[0].get("nombre_ct", "")
+        informe = generar_informe_cacheado(df_centro, df_visitas, df_mediciones, df_equipos)
+        return cuv, nombre_archivo_informe(cuv, nombre_ct), informe.getvalue()
+    except Exception as e:
+        return cuv, None, str(e)
+
+
+def seleccionar_cuvs(cuv=None, archivo_cuvs=None, todos=False, desde=None, hasta=None,
+                     region=None, consultor=None) -> list:
+    """Lista de CUV a procesar: lista explícita, archivo, todos o filtros sobre las visitas."""
+    if cuv:
+        return [str(c).strip() for c in cuv]
+    if archivo_cuvs:
+        with open(archivo_cuvs, encoding="utf-8") as f:
+            return [linea.strip() for linea in f if linea.strip()]
+
+    from data_access import get_all_cuvs_with_visits, get_cuvs_filtrados
+    if todos:
+        return [str(c) for c in get_all_cuvs_with_visits()]
+    return [str(c) for c in get_cuvs_filtrados(desde, hasta, region, consultor)]
+
+
+def empaquetar_zip(directorio: str, archivos: list, ruta_zip: str):
+    """Empaqueta los informes generados en un ZIP (se escribe a un temporal y luego se renombra)."""
+    tmp = ruta_zip + ".tmp"
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+        for archivo in sorted(archivos):
+            zf.write(os.path.join(directorio, archivo), arcname=archivo)
+    os.replace(tmp, ruta_zip)
+
+
+def _nombre_pdf(archivo_docx: str) -> str:
+    return os.path.splitext(archivo_docx)[0] + ".pdf"
+
+
+def _escribir_atomico(ruta: str, contenido: bytes):
+    with open(ruta + ".tmp", "wb") as f:
+        f.write(contenido)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def ejecutar(cuvs: list, directorio: str, workers: int = 1, ruta_zip: str = None, progreso=None,
+             pdf: bool = False) -> dict:
+    """
+    Genera los informes de 'cuvs' en 'directorio', saltando los ya registrados en el checkpoint.
+    Si se entrega 'progreso', se llama como progreso(completados, total) después de cada CUV.
+    Si 'pdf' es True, cada informe se convierte además a PDF con el pool de LibreOffice
+    (conversion_pdf), en paralelo con la generación de los siguientes; cada PDF se escribe apenas
+    termina su conversión y el progreso solo cuenta un CUV cuando su PDF está escrito.
+    Retorna un resumen con los contadores de la ejecución.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    hechos = leer_checkpoint(directorio)
+    pendientes = [c for c in cuvs if c not in hechos]
+    logging.info(f"{len(cuvs)} CUV seleccionados, {len(hechos)} ya generados, {len(pendientes)} pendientes.")
+
+    resumen = {"total": len(cuvs), "previos": len(cuvs) - len(pendientes), "ok": 0, "error": 0}
+    inicio = time.perf_counter()
+    inicio_ts = time.time()
+    # Con 'pdf', un CUV cuenta como completado cuando su PDF está escrito (o falló), no antes
+    completados = resumen["previos"]
+
+    def avanzar():
+        nonlocal completados
+        completados += 1
+        if progreso:
+            progreso(completados, resumen["total"])
+
+    with ProcessPoolExecutor(max_workers=max(1, workers), initializer=_inicializar_worker) as pool:
+        # Sin otra referencia a la lista: as_completed suelta cada futuro (y su .docx) al entregarlo
+        futuros = as_completed([pool.submit(generar_un_informe, cuv) for cuv in pendientes])
+
+        # El pool de LibreOffice (con sus hilos) se crea después de lanzar los procesos de generación
+        conversiones, sin_pdf = None, []
+        if pdf:
+            from conversion_pdf import ConversionesEnCurso
+            resumen["pdf_ok"] = resumen["pdf_error"] = 0
+
+            def guardar_pdf(archivo, resultado):
+                # Un PDF faltante no invalida el .docx: en la próxima ejecución se vuelve a intentar
+                if isinstance(resultado, Exception):
+                    resumen["pdf_error"] += 1
+                    logging.error(f"No se pudo convertir {archivo} a PDF: {resultado}")
+                else:
+                    _escribir_atomico(os.path.join(directorio, _nombre_pdf(archivo)), resultado)
+                    resumen["pdf_ok"] += 1
+                avanzar()
+
+            conversiones = ConversionesEnCurso(guardar_pdf)
+            # Informes de ejecuciones anteriores que quedaron sin PDF
+            sin_pdf = [hechos[c] for c in cuvs if c in hechos
+                       and not os.path.exists(os.path.join(directorio, _nombre_pdf(hechos[c])))]
+            completados -= len(sin_pdf)
+        if progreso:
+            progreso(completados, resumen["total"])
+        for archivo in sin_pdf:
+            with open(os.path.join(directorio, archivo), "rb") as f:
+                conversiones.enviar(archivo, f.read())
+
+        for i, futuro in enumerate(futuros, 1):
+            cuv, archivo, resultado = futuro.result()
+            if archivo is None:
+                resumen["error"] += 1
+                logging.error(f"[{i}/{len(pendientes)}] CUV {cuv}: {resultado}")
+                registrar_checkpoint(directorio, {"cuv": cuv, "estado": "error", "detalle": resultado,
+                                                  "fecha": datetime.now()})
+                avanzar()
+                continue
+
+            # Escritura atómica: el checkpoint solo se registra cuando el archivo está completo
+            _escribir_atomico(os.path.join(directorio, archivo), resultado)
+            registrar_checkpoint(directorio, {"cuv": cuv, "estado": "ok", "archivo": archivo,
+                                              "fecha": datetime.now()})
+            hechos[cuv] = archivo
+            resumen["ok"] += 1
+            logging.info(f"[{i}/{len(pendientes)}] CUV {cuv}: {archivo}")
+            if conversiones is None:
+                avanzar()
+            else:
+                # Guarda los PDF que ya terminaron y encola este (espera si hay demasiados en curso)
+                conversiones.recoger()
+                conversiones.enviar(archivo, resultado)
+
+        if conversiones is not None:
+            conversiones.terminar()
+
+    resumen["segundos"] = round(time.perf_counter() - inicio, 1)
+    if instrumentacion.esta_activo():
+        # Agrega las mediciones escritas por todos los procesos del lote
+        resumen["etapas"] = instrumentacion.resumen_desde_log(desde_ts=inicio_ts)
+
+    if ruta_zip:
+        archivos = [hechos[c] for c in cuvs if c in hechos]
+        if pdf:
+            archivos += [_nombre_pdf(a) for a in archivos if os.path.exists(os.path.join(directorio, _nombre_pdf(a)))]
+        empaquetar_zip(directorio, archivos, ruta_zip)
+        resumen["zip"] = ruta_zip
+
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generación masiva de informes de confort térmico.")
+    seleccion = parser.add_argument_group("selección de CUV")
+    seleccion.add_argument("--cuv", nargs="+", help="Lista de CUV a generar")
+    seleccion.add_argument("--archivo-cuvs", help="Archivo de texto con un CUV por línea")
+    seleccion.add_argument("--todos", action="store_true", help="Todos los CUV con visitas registradas")
+    seleccion.add_argument("--desde", help="Fecha de visita mínima (YYYY-MM-DD)")
+    seleccion.add_argument("--hasta", help="Fecha de visita máxima (YYYY-MM-DD)")
+    seleccion.add_argument("--region", help="Región del centro de trabajo (region_ct)")
+    seleccion.add_argument("--consultor", help="Nombre del consultor IST")
+    parser.add_argument("--salida", required=True, help="Directorio de salida (también guarda el checkpoint)")
+    parser.add_argument("--zip", help="Ruta del ZIP a generar con todos los informes al finalizar")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos de generación en paralelo")
+    parser.add_argument("--pdf", action="store_true", help="Convertir también cada informe a PDF (LibreOffice)")
+    args = parser.parse_args(argv)
+
+    if not (args.cuv or args.archivo_cuvs or args.todos or args.desde or args.hasta or args.region or args.consultor):
+        parser.error("Indique --cuv, --archivo-cuvs, --todos o al menos un filtro (--desde, --hasta, --region, --consultor).")
+
+    for fecha in (args.desde, args.hasta):
+        if fecha:
+            try:
+                datetime.strptime(fecha, "%Y-%m-%d")
+            except ValueError:
+                parser.error(f"Fecha inválida '{fecha}', use el formato YYYY-MM-DD.")
+
+    if args.pdf:
+        from conversion_pdf import pdf_disponible
+        if not pdf_disponible():
+            parser.error("--pdf requiere LibreOffice y su módulo 'uno' (python3-uno) en este intérprete.")
+
+    cuvs = seleccionar_cuvs(args.cuv, args.archivo_cuvs, args.todos, args.desde, args.hasta,
+                            args.region, args.consultor)
+    resumen = ejecutar(cuvs, args.salida, args.workers, args.zip, pdf=args.pdf)
+    print(json.dumps(resumen, ensure_ascii=False))
+    return 0 if resumen["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
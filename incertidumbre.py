@@ -0,0 +1,145 @@
+"""
+Incertidumbre de medición del resultado CUMPLE / NO CUMPLE de cada área (Monte Carlo).
+
+El PMV de un área se calcula con el promedio de sus mediciones, sin considerar que los
+instrumentos tienen una exactitud limitada y que su lectura se aleja del patrón durante la visita.
+Este módulo propaga esas dos fuentes hasta el PMV con un Monte Carlo vectorizado: para todas las
+áreas de un informe se generan las muestras en un solo arreglo y se evalúan con una sola llamada
+a pmv_ppd_iso.
+
+Fuentes consideradas (distribuciones uniformes, igual para todas las mediciones de la visita,
+porque se usa el mismo instrumento):
+  - exactitud del instrumento (EXACTITUD, configurable por variables de entorno; por defecto
+    la de un medidor de estrés térmico típico, ±0,5 °C y ±5 % HR, y la de ISO 7726 para la
+    velocidad del aire);
+  - verificación en terreno: la mayor diferencia entre la lectura inicial o final del
+    instrumento y el patrón (patron_tbs / ver_tbs_ini / ver_tbs_fin, y lo mismo para tg).
+met y clo son valores asignados, no medidos, y no se varían.
+
+Uso:
+    df = incertidumbre.analizar_areas(df_mediciones, df_visitas, decisiones={"Bodega": "CUMPLE"})
+    # nombre_area, pmv, decision, prob_cumple, pmv_min, pmv_max, limitrofe
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from pythermalcomfort.models import pmv_ppd_iso
+
+# Muestras por área (0 desactiva el análisis en los informes)
+INCERTIDUMBRE_MUESTRAS = int(os.getenv('INCERTIDUMBRE_MUESTRAS', '20000'))
+# Un resultado es limítrofe si menos de esta fracción de las muestras coincide con él
+INCERTIDUMBRE_CONFIANZA = float(os.getenv('INCERTIDUMBRE_CONFIANZA', '0.95'))
+# Semilla fija: el mismo informe da siempre el mismo resultado
+INCERTIDUMBRE_SEMILLA = int(os.getenv('INCERTIDUMBRE_SEMILLA', '0'))
+
+# Semiamplitud de la exactitud de cada instrumento; vel_air es absoluta + relativa a la lectura
+EXACTITUD = {
+    "t_bul_seco": float(os.getenv('EXACTITUD_TBS', '0.5')),
+    "t_globo": float(os.getenv('EXACTITUD_TG', '0.5')),
+    "hum_rel": float(os.getenv('EXACTITUD_HR', '5.0')),
+    "vel_air": (float(os.getenv('EXACTITUD_VEL_ABS', '0.05')), float(os.getenv('EXACTITUD_VEL_REL', '0.05'))),
+}
+
+# Columna de medición -> campos de la visita con el patrón y las verificaciones inicial y final
+VERIFICACIONES = {
+    "t_bul_seco": ("patron_tbs", "ver_tbs_ini", "ver_tbs_fin"),
+    "t_globo": ("patron_tg", "ver_tg_ini", "ver_tg_fin"),
+}
+
+_COLUMNAS = ["t_bul_seco", "t_globo", "vel_air", "hum_rel", "met", "clo"]
+
+
+def error_verificacion(df_visitas) -> dict:
+    """
+    {columna: mayor |verificación - patrón|} de la visita (0 si no hay datos de verificación).
+    """
+    errores = {}
+    fila = df_visitas.iloc[0] if df_visitas is not None and not df_visitas.empty else {}
+    for columna, (patron, inicial, final) in VERIFICACIONES.items():
+        ref = pd.to_numeric(fila.get(patron), errors="coerce")
+        lecturas = pd.to_numeric(pd.Series([fila.get(inicial), fila.get(final)], dtype=object), errors="coerce")
+        diferencias = (lecturas - ref).abs().dropna()
+        errores[columna] = float(diferencias.max()) if len(diferencias) else 0.0
+    return errores
+
+
+def _promedios_area(df_mediciones) -> pd.DataFrame:
+    """Promedios por área, igual que doc_utils.calcular_analisis_area (met 1,1 y clo 0,5 si faltan)."""
+    promedios = df_mediciones.groupby("nombre_area", observed=True)[_COLUMNAS].mean()
+    promedios["met"] = promedios["met"].replace(0, np.nan).fillna(1.1)
+    promedios["clo"] = promedios["clo"].replace(0, np.nan).fillna(0.5)
+    return promedios.dropna()
+
+
+def analizar_areas(df_mediciones, df_visitas=None, decisiones: dict = None, muestras: int = None,
+                   semilla: int = None) -> pd.DataFrame:
+    """
+    Probabilidad de que cada área cumpla (-1 < PMV < 1) considerando la incertidumbre de medición.
+
+    'decisiones' ({área: "CUMPLE"/"NO CUMPLE"}) es el resultado que informa el documento; si se
+    omite se usa el del PMV de los promedios. Un área es limítrofe cuando menos de
+    INCERTIDUMBRE_CONFIANZA de las muestras coincide con su resultado.
+
+    Retorna un DataFrame con nombre_area, pmv (de los promedios), decision, prob_cumple y el
+    intervalo central de INCERTIDUMBRE_CONFIANZA del PMV (pmv_min, pmv_max), limitrofe.
+    Las áreas sin datos completos se omiten.
+    """
+    muestras = INCERTIDUMBRE_MUESTRAS if muestras is None else muestras
+    semilla = INCERTIDUMBRE_SEMILLA if semilla is None else semilla
+    columnas = ["nombre_area", "pmv", "decision", "prob_cumple", "pmv_min", "pmv_max", "limitrofe"]
+    if muestras <= 0 or df_mediciones is None or df_mediciones.empty:
+        return pd.DataFrame(columns=columnas)
+
+    promedios = _promedios_area(df_mediciones)
+    if promedios.empty:
+        return pd.DataFrame(columns=columnas)
+    n_areas = len(promedios)
+    rng = np.random.default_rng(semilla)
+    verificacion = error_verificacion(df_visitas)
+
+    def perturbar(columna, semiamplitud):
+        # (áreas, muestras): el mismo error de instrumento para todas las mediciones del área
+        base = promedios[columna].to_numpy()[:, None]
+        return base + rng.uniform(-1.0, 1.0, (n_areas, muestras)) * np.asarray(semiamplitud).reshape(-1, 1)
+
+    tdb = perturbar("t_bul_seco", EXACTITUD["t_bul_seco"])
+    tdb += rng.uniform(-1.0, 1.0, tdb.shape) * verificacion["t_bul_seco"]
+    tr = perturbar("t_globo", EXACTITUD["t_globo"])
+    tr += rng.uniform(-1.0, 1.0, tr.shape) * verificacion["t_globo"]
+    vel_abs, vel_rel = EXACTITUD["vel_air"]
+    vr = np.clip(perturbar("vel_air", vel_abs + vel_rel * promedios["vel_air"].to_numpy()), 0.0, None)
+    rh = np.clip(perturbar("hum_rel", EXACTITUD["hum_rel"]), 0.0, 100.0)
+    met = np.broadcast_to(promedios["met"].to_numpy()[:, None], tdb.shape)
+    clo = np.broadcast_to(promedios["clo"].to_numpy()[:, None], tdb.shape)
+
+    pmv = pmv_ppd_iso(
+        tdb=tdb.ravel(), tr=tr.ravel(), vr=vr.ravel(), rh=rh.ravel(), met=met.ravel(), clo=clo.ravel(),
+        model="7730-2005", limit_inputs=False, round_output=False
+    ).pmv.reshape(n_areas, muestras)
+    nominal = pmv_ppd_iso(
+        tdb=promedios["t_bul_seco"].to_numpy(), tr=promedios["t_globo"].to_numpy(),
+        vr=promedios["vel_air"].to_numpy(), rh=promedios["hum_rel"].to_numpy(),
+        met=promedios["met"].to_numpy(), clo=promedios["clo"].to_numpy(),
+        model="7730-2005", limit_inputs=False
+    ).pmv
+
+    prob_cumple = ((pmv > -1) & (pmv < 1)).mean(axis=1)
+    cola = (1.0 - INCERTIDUMBRE_CONFIANZA) / 2
+    pmv_min, pmv_max = np.quantile(pmv, [cola, 1.0 - cola], axis=1)
+
+    df = pd.DataFrame({
+        "nombre_area": promedios.index.astype(str),
+        "pmv": np.atleast_1d(nominal),
+        "prob_cumple": prob_cumple,
+        "pmv_min": pmv_min,
+        "pmv_max": pmv_max,
+    })
+    decisiones = decisiones or {}
+    df["decision"] = [
+        str(decisiones.get(area, "CUMPLE" if -1 < p < 1 else "NO CUMPLE")).upper()
+        for area, p in zip(df["nombre_area"], df["pmv"])
+    ]
+    coincide = np.where(df["decision"] == "CUMPLE", df["prob_cumple"], 1.0 - df["prob_cumple"])
+    df["limitrofe"] = coincide < INCERTIDUMBRE_CONFIANZA
+    return df[columnas]
@@ -1,74 +1,105 @@
 import streamlit as st
-import pandas as pd
 import io
+import functools
+import os
+import logging
 import zipfile
-from data_access import (
-    get_centro,
-    get_visita,
-    get_mediciones,
-    get_equipos,
-    get_all_cuvs_with_visits
-)
-from doc_utils import generar_informe_en_word
+import calentamiento
+from data_access import get_datos_informe
+from data_cache import get_equipos_cached, get_all_cuvs_cached
+import servicio_informes
+from jobs import encolar_trabajo, listar_trabajos
+from conversion_pdf import pdf_disponible, convertir_a_pdf, ConversionesEnCurso, ConversionPDFError
 
 
 def generar_informe_desde_cuv(cuv):
     """Genera un informe basado en el CUV y devuelve el archivo en formato BytesIO."""
-    df_centro = get_centro(cuv)
-    df_visitas = get_visita(cuv)
-    df_mediciones = get_mediciones(df_visitas.iloc[0].get("id_visita")) if not df_visitas.empty else pd.DataFrame()
-    df_equipos = get_equipos()
+    if servicio_informes.servicio_configurado():
+        # El servicio consulta los datos y genera el informe en sus propios procesos
+        try:
+            return servicio_informes.solicitar_informe(cuv=cuv)
+        except servicio_informes.SinDatosError:
+            st.error(f"No se encontró suficiente información para generar el informe del CUV {cuv}.")
+            return None
+        except servicio_informes.ServicioInformesError as e:
+            # Sin conexión, cola llena, tiempo máximo excedido o error del servicio
+            logging.warning(f"{e} Se genera el informe localmente.")
+
+    from report_cache import generar_informe_cacheado
+
+    df_centro, df_visitas, df_mediciones, df_equipos = get_datos_informe(cuv, get_equipos_cached())
 
     if df_centro.empty or df_visitas.empty:
         st.error(f"No se encontró suficiente información para generar el informe del CUV {cuv}.")
         return None
 
-    informe_docx = generar_informe_en_word(df_centro, df_visitas, df_mediciones, df_equipos)
-    return informe_docx
+    # Ya se intentó con el servicio (o no está configurado): se genera en este proceso
+    try:
+        return generar_informe_cacheado(df_centro, df_visitas, df_mediciones, df_equipos)
+    except Exception as e:
+        logging.error(f"Error generando el informe del CUV {cuv}: {e}")
+        st.error(f"Error generando el informe del CUV {cuv}: {e}")
+        return None
 
 
-def generar_informes_masivos():
-    """Genera informes para todos los CUVs con visitas registradas y los empaqueta en un archivo ZIP."""
-    cuvs = get_all_cuvs_with_visits()
+def generar_informes_masivos(incluir_pdf=False):
+    """
+    Genera informes para todos los CUVs con visitas registradas y los empaqueta en un archivo ZIP.
+    Con 'incluir_pdf', cada informe se envía al pool de LibreOffice mientras se generan los siguientes
+    y el PDF se agrega al ZIP junto al .docx apenas termina su conversión.
+    """
+    cuvs = get_all_cuvs_cached()
     total = len(cuvs)
 
     if total == 0:
         st.warning("No hay CUVs con visitas registradas.")
         return None
 
+    df_equipos = get_equipos_cached()
+
     zip_buffer = io.BytesIO()
     with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
         progress_bar = st.progress(0)
 
+        def agregar_pdf(cuv, resultado):
+            if isinstance(resultado, ConversionPDFError):
+                st.error(f"No se pudo convertir a PDF el informe del CUV {cuv}: {resultado}")
+            else:
+                zip_file.writestr(f"informe_{cuv}.pdf", resultado)
+
+        conversiones = ConversionesEnCurso(agregar_pdf) if incluir_pdf else None
+
         for i, cuv in enumerate(cuvs):
             try:
-                df_centro = get_centro(cuv)
-                if df_centro.empty:
-                    continue
-
-                df_visitas = get_visita(cuv)
-                if df_visitas.empty:
+                df_centro, df_visitas, df_mediciones, _ = get_datos_informe(cuv, df_equipos)
+                if df_centro.empty or df_visitas.empty:
                     continue
 
-                visita_id = df_visitas.iloc[0]["id_visita"]
-                df_mediciones = get_mediciones(visita_id)
-                df_equipos = get_equipos()
-
-                doc_bytes = generar_informe_en_word(df_centro, df_visitas, df_mediciones, df_equipos)
+                doc_bytes = servicio_informes.generar_informe(df_centro, df_visitas, df_mediciones, df_equipos,
+                                                              prioridad="lote")
 
                 # Agregar el informe al archivo ZIP
                 zip_file.writestr(f"informe_{cuv}.docx", doc_bytes.getvalue())
+                if conversiones is not None:
+                    conversiones.recoger()
+                    conversiones.enviar(cuv, doc_bytes.getvalue())
 
             except Exception as e:
                 st.error(f"Error generando informe para CUV {cuv}: {str(e)}")
 
             progress_bar.progress((i + 1) / total)
 
+        if conversiones is not None:
+            conversiones.terminar()
+
     zip_buffer.seek(0)
     return zip_buffer
 
 
 def main():
+    if not servicio_informes.servicio_configurado():
+        # Sin servicio de informes, el informe se genera en este proceso
+        calentamiento.calentar_pmv()
     st.header("Informes Confort Térmico")
     st.write("Versión 4.0 (Generación Automática)")
     st.write("Bienvenido Rodrigo... (usuario)")
@@ -77,16 +108,25 @@ def main():
     st.subheader("Generar Informe Individual")
     input_cuv = st.text_input("Ingresa el CUV: ej. 178050")
 
+    incluir_pdf = st.checkbox("Incluir PDF", value=False, disabled=not pdf_disponible(),
+                              help=None if pdf_disponible() else "LibreOffice (con su módulo python3-uno) no está instalado en el servidor.")
+
     if st.button("Buscar y Generar Informe"):
         informe = generar_informe_desde_cuv(input_cuv)
         if informe:
             st.success("Informe generado correctamente.")
             st.download_button("Descargar Informe", data=informe, file_name=f"informe_{input_cuv}.docx")
+            if incluir_pdf:
+                try:
+                    st.download_button("Descargar PDF", data=convertir_a_pdf(informe),
+                                       file_name=f"informe_{input_cuv}.pdf", mime="application/pdf")
+                except ConversionPDFError as e:
+                    st.error(f"No se pudo convertir el informe a PDF: {e}")
 
     # Sección para generación automática masiva
     st.subheader("Generación Automática de Informes")
     if st.button("Generar Informes para Todos los CUVs"):
-        zip_file = generar_informes_masivos()
+        zip_file = generar_informes_masivos(incluir_pdf)
         if zip_file:
             st.success("Informes generados correctamente.")
             st.download_button(
@@ -96,6 +136,56 @@ def main():
                 mime="application/zip"
             )
 
+    # Sección para generación en segundo plano (la ejecuta `python jobs.py`, fuera de esta sesión)
+    st.subheader("Generación en Segundo Plano")
+    solicitante = st.text_input("Solicitante", key="solicitante_trabajos")
+    region = st.text_input("Región (vacío = todos los CUVs)", key="region_trabajo")
+    if st.button("Encolar generación"):
+        if region.strip():
+            parametros = {"region": region.strip()}
+            descripcion = f"Región {region.strip()}"
+        else:
+            parametros = {"todos": True}
+            descripcion = "Todos los CUVs"
+        if incluir_pdf:
+            parametros["pdf"] = True
+            descripcion += " (con PDF)"
+        id_trabajo = encolar_trabajo(solicitante.strip(), parametros, descripcion)
+        st.success(f"Trabajo {id_trabajo} encolado. Puedes cerrar la página y volver a descargarlo más tarde.")
+
+    mostrar_trabajos(solicitante.strip() or None)
+
+
+def _leer_archivo(ruta) -> bytes:
+    with open(ruta, "rb") as f:
+        return f.read()
+
+
+def mostrar_trabajos(solicitante=None):
+    """Lista los trabajos en segundo plano con su avance y el botón de descarga cuando terminan."""
+    trabajos = listar_trabajos(solicitante)
+    if not trabajos:
+        return
+    if st.button("Actualizar estado"):
+        pass  # El clic provoca un rerun que vuelve a leer la cola
+    for trabajo in trabajos:
+        st.write(f"**#{trabajo['id']}** {trabajo['descripcion']} - {trabajo['solicitante']} - {trabajo['estado']}")
+        if trabajo["estado"] == "en_proceso" and trabajo["total"]:
+            st.progress(trabajo["completados"] / trabajo["total"])
+        elif trabajo["estado"] == "terminado" and trabajo["resultado"] and os.path.exists(trabajo["resultado"]):
+            if trabajo["error"]:
+                st.warning(trabajo["error"])
+            # El ZIP se lee solo al hacer clic en la descarga, no en cada rerun
+            st.download_button(
+                label=f"Descargar trabajo #{trabajo['id']}",
+                data=functools.partial(_leer_archivo, trabajo["resultado"]),
+                file_name=os.path.basename(trabajo["resultado"]),
+                mime="application/zip",
+                key=f"descargar_trabajo_{trabajo['id']}"
+            )
+        elif trabajo["estado"] == "error":
+            st.error(trabajo["error"])
+
 
 # Permite que `supermain.py` se pueda ejecutar como script independiente
 if __name__ == "__main__":
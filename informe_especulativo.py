@@ -0,0 +1,201 @@
+"""
+Generación anticipada del informe de una visita recién cerrada.
+
+Cuando el formulario guarda la verificación final, el informe se genera en segundo plano a partir
+de lo que se guardó en el almacén local (visita, mediciones y verificación final) más los id que
+ya asignó SQL Server, sin volver a consultar la base de datos. Al pedir el informe se entrega ese
+resultado si el contenido guardado de la visita no cambió desde que se lanzó; si cambió (por
+ejemplo, se agregaron áreas), se descarta y el formulario genera el informe como siempre.
+
+El informe incluye los id de SQL Server, por lo que solo se genera (y se entrega) cuando la
+visita y todas sus mediciones ya tienen id_remoto; si aún falta alguno, la tarea en segundo plano
+intenta sincronizar y, si no lo logra, obtener() retorna None y el formulario sigue el camino
+habitual (sincronizar y generar desde la base de datos). Las especulaciones que nadie pide se
+descartan al vencer ESPECULATIVO_TTL o al superar ESPECULATIVO_MAX.
+
+Con el servicio de informes configurado, el informe se genera en el servicio (prioridad "lote",
+para no adelantarse a los pedidos de la interfaz) y el proceso de Streamlit no carga python-docx;
+sin servicio, o si no responde, se genera en este proceso (servicio_informes.generar_informe).
+
+Uso:
+    informe_especulativo.iniciar(id_visita_local, df_centro, df_equipos)
+    informe = informe_especulativo.obtener(id_visita_local)   # BytesIO o None
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import almacen_local
+from esquema_informe import (
+    COLUMNAS_CENTRO_INFORME,
+    COLUMNAS_VISITA_INFORME,
+    COLUMNAS_MEDICION_INFORME,
+    aplicar_tipos_informe,
+    normalizar_mediciones,
+)
+
+# Segundos que obtener() espera un informe que aún se está generando antes de descartarlo
+ESPECULATIVO_ESPERA = float(os.getenv('ESPECULATIVO_ESPERA', '30'))
+# Segundos que se conserva un informe anticipado no pedido, y máximo de informes por proceso
+ESPECULATIVO_TTL = float(os.getenv('ESPECULATIVO_TTL', '1800'))
+ESPECULATIVO_MAX = int(os.getenv('ESPECULATIVO_MAX', '20'))
+
+# id local de la visita -> {"huella", "df_centro", "futuro", "creado"}
+_especulaciones = {}
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="informe-especulativo")
+
+
+def _huella(visita: dict, df_centro: pd.DataFrame) -> str:
+    """
+    Huella del contenido de la visita guardada. No incluye los id remotos: que el sincronizador
+    envíe la visita a SQL Server no cambia el informe.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([visita["cuv"], visita["datos"], visita["verif_final"],
+                         [m["datos"] for m in visita["mediciones"]]],
+                        sort_keys=True, ensure_ascii=False, default=str).encode())
+    h.update(pd.util.hash_pandas_object(df_centro, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def _ids_completos(visita: dict) -> bool:
+    """True si SQL Server ya asignó id a la visita y a todas sus mediciones."""
+    return visita["id_remoto"] is not None and all(m["id_remoto"] is not None for m in visita["mediciones"])
+
+
+def _dataframes(visita: dict, df_centro: pd.DataFrame):
+    """Arma (df_visitas, df_mediciones) con las columnas y tipos que entrega data_access.get_datos_informe."""
+    from data_access import get_mapa_equipos
+
+    datos = visita["datos"]
+    verif = visita["verif_final"] or {}
+    mapa = get_mapa_equipos()
+    df_visitas = pd.DataFrame([{
+        "id_visita": visita["id_remoto"],
+        "cuv_visita": datos["cuv"],
+        "fecha_visita": datos["fecha_visita"],
+        "hora_visita": datos["hora_medicion"],
+        "temperatura_dia": datos["temp_max"],
+        "motivo_evaluacion": datos["motivo_evaluacion"],
+        "nombre_personal_visita": datos["nombre_personal"],
+        "cargo_personal_visita": datos["cargo"],
+        "consultor_ist": datos["consultor_ist"],
+        "consultor_cargo": datos["consultor_cargo"],
+        "consultor_zonal": datos["consultor_zonal"],
+        "equipo_temp": mapa.get(datos["cod_equipo_t"]),
+        "equipo_vel_air": mapa.get(datos["cod_equipo_v"]),
+        "patron_tbs": datos["patron_tbs"],
+        "ver_tbs_ini": datos["verif_tbs_inicial"],
+        "ver_tbs_fin": verif.get("verif_tbs_final"),
+        "patron_tbh": datos["patron_tbh"],
+        "ver_tbh_ini": datos["verif_tbh_inicial"],
+        "ver_tbh_fin": verif.get("verif_tbh_final"),
+        "patron_tg": datos["patron_tg"],
+        "ver_tg_ini": datos["verif_tg_inicial"],
+        "ver_tg_fin": verif.get("verif_tg_final"),
+    }], columns=COLUMNAS_VISITA_INFORME)
+
+    filas = []
+    for medicion in visita["mediciones"]:
+        fila = {columna: medicion["datos"].get(columna) for columna in COLUMNAS_MEDICION_INFORME}
+        fila["id_medicion"] = medicion["id_remoto"]
+        fila["visita_id"] = visita["id_remoto"]
+        filas.append(fila)
+    df_mediciones = pd.DataFrame(filas, columns=COLUMNAS_MEDICION_INFORME)
+    return aplicar_tipos_informe(df_visitas), normalizar_mediciones(df_mediciones)
+
+
+def _generar(id_visita_local: int, visita: dict, huella: str, df_centro: pd.DataFrame, df_equipos: pd.DataFrame):
+    """Bytes del informe, o None si la visita no llega a estar sincronizada con los mismos datos."""
+    import servicio_informes
+
+    inicio = time.perf_counter()
+    if not _ids_completos(visita):
+        almacen_local.sincronizar_pendientes(forzar=True)
+        visita = almacen_local.leer_visita(id_visita_local)
+        if visita is None or not _ids_completos(visita) or _huella(visita, df_centro) != huella:
+            logging.info(f"Informe anticipado de la visita local {id_visita_local} omitido: "
+                         f"la visita aún no está sincronizada.")
+            return None
+    df_visitas, df_mediciones = _dataframes(visita, df_centro)
+    informe = servicio_informes.generar_informe(df_centro.copy(), df_visitas, df_mediciones, df_equipos,
+                                                prioridad="lote")
+    logging.info(f"Informe anticipado de la visita local {id_visita_local} listo en "
+                 f"{time.perf_counter() - inicio:.2f} s.")
+    return informe.getvalue()
+
+
+def _purgar():
+    """Descarta (con _lock tomado) las especulaciones vencidas y las más antiguas sobre ESPECULATIVO_MAX."""
+    ahora = time.monotonic()
+    vencidas = [k for k, e in _especulaciones.items() if ahora - e["creado"] > ESPECULATIVO_TTL]
+    por_antiguedad = sorted((k for k in _especulaciones if k not in vencidas),
+                            key=lambda k: _especulaciones[k]["creado"])
+    sobrantes = por_antiguedad[:max(0, len(por_antiguedad) - ESPECULATIVO_MAX)]
+    for clave in vencidas + sobrantes:
+        _especulaciones.pop(clave)["futuro"].cancel()
+
+
+def iniciar(id_visita_local: int, df_centro: pd.DataFrame, df_equipos: pd.DataFrame):
+    """Lanza en segundo plano la generación del informe de la visita con lo guardado localmente."""
+    visita = almacen_local.leer_visita(id_visita_local)
+    if visita is None or df_centro is None or df_centro.empty:
+        return
+    columnas = [c for c in COLUMNAS_CENTRO_INFORME if c in df_centro.columns]
+    df_centro = aplicar_tipos_informe(df_centro[columnas].head(1).reset_index(drop=True))
+    huella = _huella(visita, df_centro)
+
+    with _lock:
+        actual = _especulaciones.get(id_visita_local)
+        if actual is None or actual["huella"] != huella:
+            if actual is not None:
+                actual["futuro"].cancel()
+            _especulaciones[id_visita_local] = {
+                "huella": huella,
+                "df_centro": df_centro,
+                "futuro": _executor.submit(_generar, id_visita_local, visita, huella, df_centro, df_equipos),
+                "creado": time.monotonic(),
+            }
+        _purgar()
+
+
+def obtener(id_visita_local: int):
+    """
+    Informe anticipado (BytesIO) de la visita, o None si no se lanzó, falló, la visita no llegó a
+    sincronizarse o los datos guardados cambiaron desde entonces. En todos esos casos el
+    resultado se descarta.
+    """
+    with _lock:
+        especulacion = _especulaciones.get(id_visita_local)
+    if especulacion is None:
+        return None
+
+    visita = almacen_local.leer_visita(id_visita_local)
+    vigente = (visita is not None and _ids_completos(visita)
+               and _huella(visita, especulacion["df_centro"]) == especulacion["huella"])
+    contenido = None
+    if vigente:
+        try:
+            contenido = especulacion["futuro"].result(timeout=ESPECULATIVO_ESPERA)
+        except Exception as e:
+            logging.warning(f"Informe anticipado de la visita local {id_visita_local} no disponible: {e}")
+    else:
+        logging.info(f"Informe anticipado de la visita local {id_visita_local} descartado: los datos cambiaron "
+                     f"o la visita no está sincronizada.")
+
+    with _lock:
+        if _especulaciones.get(id_visita_local) is especulacion:
+            del _especulaciones[id_visita_local]
+    if contenido is None:
+        especulacion["futuro"].cancel()
+        return None
+
+    return BytesIO(contenido)
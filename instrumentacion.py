@@ -0,0 +1,147 @@
+"""
+Medición opcional de tiempos por etapa de la generación de informes y de las consultas a la base de datos.
+
+Se activa con la variable de entorno INFORME_TIMING=1 (o llamando a activar()). Cada etapa medida
+se escribe como una línea JSON en INFORME_TIMING_LOG y se acumula en memoria, de modo que al final
+de un lote se puede obtener el p50/p95 por etapa con resumen_etapas() o resumen_desde_log().
+
+Uso:
+    with medir("informe.pmv_areas", cuv=cuv):
+        ...
+
+    @medido("db.get_centro")
+    def get_centro(cuv): ...
+"""
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from collections import defaultdict, deque
+
+INFORME_TIMING_LOG = os.getenv('INFORME_TIMING_LOG', os.path.join('.cache', 'tiempos.jsonl'))
+# Máximo de muestras en memoria por etapa (las más antiguas se descartan)
+MAX_MUESTRAS = 10000
+
+_activo = os.getenv('INFORME_TIMING', '0').lower() in ('1', 'true', 'si', 'sí')
+_muestras = defaultdict(lambda: deque(maxlen=MAX_MUESTRAS))
+_lock = threading.Lock()
+
+
+def activar(ruta_log: str = None):
+    """Activa la medición (y opcionalmente cambia el archivo de log)."""
+    global _activo, INFORME_TIMING_LOG
+    _activo = True
+    if ruta_log:
+        INFORME_TIMING_LOG = ruta_log
+
+
+def desactivar():
+    global _activo
+    _activo = False
+
+
+def esta_activo() -> bool:
+    return _activo
+
+
+def registrar(etapa: str, segundos: float, **atributos):
+    """Agrega una medición a la memoria y al log JSON."""
+    with _lock:
+        _muestras[etapa].append(segundos)
+    if not INFORME_TIMING_LOG:
+        return
+    registro = {"etapa": etapa, "ms": round(segundos * 1000, 3), "pid": os.getpid(), "ts": time.time()}
+    registro.update(atributos)
+    try:
+        os.makedirs(os.path.dirname(INFORME_TIMING_LOG) or ".", exist_ok=True)
+        # Una sola escritura por línea en modo append: segura entre procesos del mismo lote
+        with open(INFORME_TIMING_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        logging.warning(f"No se pudo escribir la medición de tiempos: {e}")
+
+
+@contextmanager
+def medir(etapa: str, **atributos):
+    """Mide el tiempo del bloque y lo registra bajo 'etapa'. Si la medición está desactivada no hace nada."""
+    if not _activo:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(etapa, time.perf_counter() - inicio, **atributos)
+
+
+def medido(etapa: str):
+    """Decorador equivalente a envolver la función completa en medir(etapa)."""
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            if not _activo:
+                return func(*args, **kwargs)
+            with medir(etapa):
+                return func(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    k = (len(valores_ordenados) - 1) * p
+    i = int(k)
+    j = min(i + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[i] + (valores_ordenados[j] - valores_ordenados[i]) * (k - i)
+
+
+def _resumir(muestras: dict) -> dict:
+    resumen = {}
+    for etapa, valores in sorted(muestras.items()):
+        ordenados = sorted(valores)
+        resumen[etapa] = {
+            "n": len(ordenados),
+            "total_ms": round(sum(ordenados) * 1000, 1),
+            "p50_ms": round(_percentil(ordenados, 0.50) * 1000, 1),
+            "p95_ms": round(_percentil(ordenados, 0.95) * 1000, 1),
+            "max_ms": round(ordenados[-1] * 1000, 1) if ordenados else 0.0,
+        }
+    return resumen
+
+
+def resumen_etapas() -> dict:
+    """p50/p95 por etapa de las mediciones hechas en este proceso."""
+    with _lock:
+        copia = {etapa: list(valores) for etapa, valores in _muestras.items()}
+    return _resumir(copia)
+
+
+def resumen_desde_log(ruta_log: str = None, desde_ts: float = None) -> dict:
+    """
+    p50/p95 por etapa a partir del log JSON (agrega las mediciones de todos los procesos de un lote).
+    Si se indica 'desde_ts', solo se consideran registros posteriores a ese instante (time.time()).
+    """
+    ruta_log = ruta_log or INFORME_TIMING_LOG
+    muestras = defaultdict(list)
+    if not ruta_log or not os.path.exists(ruta_log):
+        return {}
+    with open(ruta_log, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+            if desde_ts is not None and registro.get("ts", 0) < desde_ts:
+                continue
+            muestras[registro["etapa"]].append(registro["ms"] / 1000)
+    return _resumir(muestras)
+
+
+def reiniciar():
+    """Descarta las mediciones acumuladas en memoria."""
+    with _lock:
+        _muestras.clear()
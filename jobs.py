@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Cola local de trabajos de generación masiva de informes.
+
+La interfaz (informe.py) solo encola el trabajo y consulta su avance; la generación la
+realizan uno o más procesos independientes lanzados con:
+
+    python jobs.py --procesos 2
+
+La cola vive en una base SQLite local (JOBS_DB), por lo que sobrevive a reruns de Streamlit,
+cierres del navegador y reinicios del worker. Cuando hay varios solicitantes, el siguiente
+trabajo se elige para el solicitante con menos trabajos en proceso (y, a igualdad, el más antiguo).
+"""
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime
+
+import calentamiento
+
+JOBS_DB = os.getenv('JOBS_DB', os.path.join('.cache', 'jobs.sqlite3'))
+JOBS_DIR = os.getenv('JOBS_DIR', os.path.join('.cache', 'trabajos'))
+# Un trabajo "en_proceso" sin latido durante este tiempo se considera abandonado y se reencola
+JOBS_TIMEOUT_LATIDO = int(os.getenv('JOBS_TIMEOUT_LATIDO', '600'))
+# Cada cuántos segundos el worker renueva el latido de su trabajo, aunque ningún CUV haya terminado
+JOBS_INTERVALO_LATIDO = int(os.getenv('JOBS_INTERVALO_LATIDO', str(max(1, JOBS_TIMEOUT_LATIDO // 4))))
+
+ESTADOS = ("pendiente", "en_proceso", "terminado", "error")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    solicitante TEXT NOT NULL,
+    descripcion TEXT,
+    parametros TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    completados INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    resultado TEXT,
+    error TEXT,
+    worker TEXT,
+    creado TEXT NOT NULL,
+    iniciado TEXT,
+    actualizado TEXT,
+    terminado TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_trabajos_estado ON trabajos (estado, id);
+"""
+
+
+def _conexion() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(JOBS_DB) or ".", exist_ok=True)
+    connection = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def _ahora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def encolar_trabajo(solicitante: str, parametros: dict, descripcion: str = "") -> int:
+    """
+    Agrega un trabajo a la cola y retorna su id.
+    'parametros' son los argumentos de generar_informes_cli.seleccionar_cuvs
+    (por ejemplo {"todos": True} o {"region": "Metropolitana"}), más "pdf": True
+    para incluir también los informes en PDF.
+    """
+    connection = _conexion()
+    try:
+        cursor = connection.execute(
+            "INSERT INTO trabajos (solicitante, descripcion, parametros, creado) VALUES (?, ?, ?, ?)",
+            (solicitante or "anónimo", descripcion, json.dumps(parametros, ensure_ascii=False), _ahora()),
+        )
+        logging.info(f"Trabajo {cursor.lastrowid} encolado por {solicitante}: {descripcion}")
+        return cursor.lastrowid
+    finally:
+        connection.close()
+
+
+def obtener_trabajo(id_trabajo: int):
+    """Retorna el trabajo como diccionario, o None si no existe."""
+    connection = _conexion()
+    try:
+        fila = connection.execute("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+        return dict(fila) if fila else None
+    finally:
+        connection.close()
+
+
+def listar_trabajos(solicitante: str = None, limite: int = 20) -> list:
+    """Últimos trabajos (de un solicitante o de todos), del más reciente al más antiguo."""
+    connection = _conexion()
+    try:
+        if solicitante:
+            filas = connection.execute(
+                "SELECT * FROM trabajos WHERE solicitante = ? ORDER BY id DESC LIMIT ?", (solicitante, limite)
+            ).fetchall()
+        else:
+            filas = connection.execute("SELECT * FROM trabajos ORDER BY id DESC LIMIT ?", (limite,)).fetchall()
+        return [dict(f) for f in filas]
+    finally:
+        connection.close()
+
+
+def _reencolar_abandonados(connection):
+    """Devuelve a la cola los trabajos cuyo worker dejó de reportar avance."""
+    limite = datetime.fromtimestamp(time.time() - JOBS_TIMEOUT_LATIDO).isoformat(timespec="seconds")
+    cursor = connection.execute(
+        "UPDATE trabajos SET estado = 'pendiente', worker = NULL "
+        "WHERE estado = 'en_proceso' AND actualizado < ?",
+        (limite,),
+    )
+    if cursor.rowcount:
+        logging.warning(f"{cursor.rowcount} trabajo(s) abandonado(s) devuelto(s) a la cola.")
+
+
+def tomar_siguiente(worker: str):
+    """
+    Reserva de forma atómica el siguiente trabajo pendiente para 'worker'.
+    Se prioriza al solicitante con menos trabajos en proceso para repartir el pool de forma justa.
+    """
+    connection = _conexion()
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        _reencolar_abandonados(connection)
+        fila = connection.execute(
+            """
+            SELECT t.id FROM trabajos t
+            WHERE t.estado = 'pendiente'
+            ORDER BY (SELECT COUNT(*) FROM trabajos e
+                      WHERE e.estado = 'en_proceso' AND e.solicitante = t.solicitante),
+                     t.id
+            LIMIT 1
+            """
+        ).fetchone()
+        if fila is None:
+            connection.execute("COMMIT")
+            return None
+        ahora = _ahora()
+        connection.execute(
+            "UPDATE trabajos SET estado = 'en_proceso', worker = ?, iniciado = COALESCE(iniciado, ?), actualizado = ? "
+            "WHERE id = ?",
+            (worker, ahora, ahora, fila["id"]),
+        )
+        connection.execute("COMMIT")
+        return obtener_trabajo(fila["id"])
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+
+def _actualizar(id_trabajo: int, **campos):
+    campos["actualizado"] = _ahora()
+    asignaciones = ", ".join(f"{k} = ?" for k in campos)
+    connection = _conexion()
+    try:
+        connection.execute(f"UPDATE trabajos SET {asignaciones} WHERE id = ?", (*campos.values(), id_trabajo))
+    finally:
+        connection.close()
+
+
+def _latido(id_trabajo: int, detener: threading.Event):
+    """Renueva 'actualizado' cada JOBS_INTERVALO_LATIDO hasta que se active 'detener'."""
+    while not detener.wait(JOBS_INTERVALO_LATIDO):
+        try:
+            _actualizar(id_trabajo)
+        except sqlite3.Error as e:
+            logging.warning(f"No se pudo registrar el latido del trabajo {id_trabajo}: {e}")
+
+
+def ejecutar_trabajo(trabajo: dict, workers_por_trabajo: int = 1):
+    """
+    Ejecuta un trabajo reservado y registra su avance y resultado en la cola.
+    Un hilo renueva el latido mientras dura el trabajo, de modo que un CUV lento no hace que
+    otro worker lo considere abandonado y lo reencole.
+    """
+    from generar_informes_cli import seleccionar_cuvs, ejecutar
+
+    id_trabajo = trabajo["id"]
+    directorio = os.path.join(JOBS_DIR, str(id_trabajo))
+    ruta_zip = os.path.join(JOBS_DIR, f"informes_trabajo_{id_trabajo}.zip")
+
+    detener_latido = threading.Event()
+    hilo_latido = threading.Thread(target=_latido, args=(id_trabajo, detener_latido), daemon=True)
+    hilo_latido.start()
+    try:
+        parametros = json.loads(trabajo["parametros"])
+        pdf = parametros.pop("pdf", False)
+        cuvs = seleccionar_cuvs(**parametros)
+        resumen = ejecutar(
+            cuvs, directorio, workers_por_trabajo, ruta_zip,
+            progreso=lambda completados, total: _actualizar(id_trabajo, completados=completados, total=total),
+            pdf=pdf,
+        )
+        _actualizar(id_trabajo, estado="terminado", resultado=ruta_zip, terminado=_ahora(),
+                    error=f"{resumen['error']} CUV con error" if resumen["error"] else None)
+        logging.info(f"Trabajo {id_trabajo} terminado: {resumen}")
+    except Exception as e:
+        logging.error(f"Trabajo {id_trabajo} falló: {e}")
+        _actualizar(id_trabajo, estado="error", error=str(e), terminado=_ahora())
+    finally:
+        detener_latido.set()
+        hilo_latido.join()
+
+
+def bucle_worker(workers_por_trabajo: int = 1, espera: float = 2.0):
+    """Toma y ejecuta trabajos indefinidamente."""
+    nombre = f"{socket.gethostname()}:{os.getpid()}"
+    calentamiento.calentar_pmv()
+    logging.info(f"Worker {nombre} iniciado.")
+    while True:
+        trabajo = tomar_siguiente(nombre)
+        if trabajo is None:
+            time.sleep(espera)
+            continue
+        ejecutar_trabajo(trabajo, workers_por_trabajo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker de la cola de generación masiva de informes.")
+    parser.add_argument("--procesos", type=int, default=1, help="Trabajos que se ejecutan en paralelo")
+    parser.add_argument("--workers-por-trabajo", type=int, default=1, help="Procesos de generación por trabajo")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.procesos <= 1:
+        bucle_worker(args.workers_por_trabajo)
+        return 0
+
+    procesos = [
+        multiprocessing.Process(target=bucle_worker, args=(args.workers_por_trabajo,), daemon=False)
+        for _ in range(args.procesos)
+    ]
+    for p in procesos:
+        p.start()
+    for p in procesos:
+        p.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,14 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, date, time
 
-from data_access2 import get_data  # Función que obtiene el CSV principal
+import datos_compartidos
+from data_access2 import get_data, buscar_por_cuv  # Funciones que obtienen el CSV principal (con cache)
 from doc_utils import generar_informe_en_word  # Función para generar el Word
 
 from pythermalcomfort.models import pmv_ppd_iso
 
 st.set_page_config(page_title="Informes Confort Térmico", layout="wide")
+datos_compartidos.activar_copy_on_write()
 
 
 def interpret_pmv(pmv_value):
@@ -45,13 +46,10 @@ def main():
         "2PACX-1vSn2sEH86jBQNbjQEhtehoFIL54cFtdH3HST5zM257XbzkFx5V3VNDCO_CyIYiIWECrl1xoohSnC-lC/"
         "pub?output=csv"
     )
-    df_cuv_info = pd.read_csv(csv_url_cuv_info)
+    df_cuv_info = get_data(csv_url_cuv_info)
 
     # --- Inicialización en session_state ---
-    if "df_filtrado" not in st.session_state:
-        st.session_state["df_filtrado"] = pd.DataFrame()
-    if "df_info_cuv" not in st.session_state:
-        st.session_state["df_info_cuv"] = pd.DataFrame()
+    # Las hojas viven una vez por proceso (data_access2); la sesión solo guarda el CUV buscado
     if "input_cuv_str" not in st.session_state:
         st.session_state["input_cuv_str"] = ""
     if "areas_data" not in st.session_state:
@@ -65,13 +63,11 @@ def main():
     input_cuv = st.text_input("Ingresa el CUV: ej. 183885")
     if st.button("Buscar"):
         st.session_state["input_cuv_str"] = input_cuv.strip()
-        df_main["CUV"] = df_main["CUV"].astype(str).str.strip()
-        df_cuv_info["CUV"] = df_cuv_info["CUV"].astype(str).str.strip()
-        st.session_state["df_filtrado"] = df_main[df_main["CUV"] == st.session_state["input_cuv_str"]]
-        st.session_state["df_info_cuv"] = df_cuv_info[df_cuv_info["CUV"] == st.session_state["input_cuv_str"]]
 
-    df_filtrado = st.session_state["df_filtrado"]
-    df_info_cuv = st.session_state["df_info_cuv"]
+    # Búsqueda O(1) por el índice de CUV de cada hoja; se repite en cada rerun en vez de guardar
+    # las filas encontradas en la sesión
+    df_filtrado = buscar_por_cuv(csv_url_main, st.session_state["input_cuv_str"])
+    df_info_cuv = buscar_por_cuv(csv_url_cuv_info, st.session_state["input_cuv_str"])
 
     if not df_filtrado.empty:
         # 1. Datos generales
@@ -403,6 +399,8 @@ def main():
     else:
         st.info("Ingresa un CUV y haz clic en 'Buscar' para ver la información y generar el informe.")
 
+    datos_compartidos.mostrar_memoria_sesion()
+
 
 if __name__ == "__main__":
     main()
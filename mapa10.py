@@ -1,4 +1,5 @@
 import streamlit as st
+import pmv_escalar
 from pythermalcomfort.models import pmv_ppd_iso
 from scipy.optimize import brentq
 import numpy as np
@@ -110,9 +111,7 @@ def calcular_ajuste_optimo(tdb_initial, tr_initial, vr, rh, met, clo, target_pmv
     for i in range(max_iter):
         # Calcular PMV actual con las condiciones actuales (usando limit_inputs=False)
         try:
-            current_pmv = pmv_ppd_iso(
-                tdb=tdb_adj, tr=tr_adj, vr=vr, rh=rh, met=met, clo=clo, limit_inputs=False
-            ).pmv
+            current_pmv = pmv_escalar.pmv(tdb_adj, tr_adj, vr, rh, met, clo)
         except Exception as e:
             st.error(f"Error al calcular PMV en la iteración {i+1}: {str(e)}")
             current_pmv = np.nan
@@ -145,9 +144,7 @@ def calcular_ajuste_optimo(tdb_initial, tr_initial, vr, rh, met, clo, target_pmv
         # Calcular la temperatura candidata usando brentq
         try:
             candidate2 = brentq(
-                lambda x: pmv_ppd_iso(
-                    tdb=x, tr=x, vr=vr, rh=rh, met=met, clo=clo, limit_inputs=False
-                ).pmv - target_pmv,
+                lambda x: pmv_escalar.pmv(x, x, vr, rh, met, clo) - target_pmv,
                 lower_bound, upper_bound, xtol=0.1
             )
         except Exception as e:
@@ -163,9 +160,7 @@ def calcular_ajuste_optimo(tdb_initial, tr_initial, vr, rh, met, clo, target_pmv
 
         # Recalcular PMV con los nuevos valores
         try:
-            new_pmv = pmv_ppd_iso(
-                tdb=tdb_adj, tr=tr_adj, vr=vr, rh=rh, met=met, clo=clo, limit_inputs=False
-            ).pmv
+            new_pmv = pmv_escalar.pmv(tdb_adj, tr_adj, vr, rh, met, clo)
         except Exception as e:
             st.error(f"Error al recalcular PMV en la iteración {i+1}: {str(e)}")
             new_pmv = np.nan
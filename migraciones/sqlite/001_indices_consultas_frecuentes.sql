@@ -0,0 +1,12 @@
+-- Equivalente SQLite de migraciones/sqlserver/001_indices_consultas_frecuentes.sql.
+-- SQLite no tiene INCLUDE; los índices de visitas y equipos quedan cubrientes para
+-- SELECT DISTINCT cuv_visita y el mapa de equipos (id_equipo es el rowid).
+
+CREATE INDEX IF NOT EXISTS ix_visitas_cuv_fecha
+    ON higiene_Visitas_prod (cuv_visita, fecha_visita DESC, hora_visita DESC);
+
+CREATE INDEX IF NOT EXISTS ix_mediciones_visita
+    ON higiene_mediciones_prod (visita_id);
+
+CREATE INDEX IF NOT EXISTS ix_equipos_dicc
+    ON higiene_Equipos_Medicion (equipo_dicc);
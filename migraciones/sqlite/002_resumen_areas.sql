@@ -0,0 +1,35 @@
+-- Equivalente SQLite de migraciones/sqlserver/002_resumen_areas.sql.
+
+CREATE TABLE IF NOT EXISTS resumen_areas_visita (
+    id_visita INTEGER NOT NULL,
+    area TEXT NOT NULL,
+    cuv TEXT,
+    nombre_ct TEXT,
+    region_ct TEXT,
+    comuna_ct TEXT,
+    fecha_visita TEXT,
+    consultor_ist TEXT,
+    consultor_zonal TEXT,
+    n_mediciones INTEGER NOT NULL,
+    t_bul_seco_prom REAL,
+    t_globo_prom REAL,
+    hum_rel_prom REAL,
+    vel_air_prom REAL,
+    pmv_prom REAL,
+    pmv_min REAL,
+    pmv_max REAL,
+    ppd_prom REAL,
+    mediciones_cumplen INTEGER NOT NULL,
+    cumple INTEGER NOT NULL,
+    max_id_medicion INTEGER NOT NULL,
+    PRIMARY KEY (id_visita, area)
+);
+
+CREATE INDEX IF NOT EXISTS ix_resumen_fecha
+    ON resumen_areas_visita (fecha_visita);
+
+CREATE TABLE IF NOT EXISTS resumen_areas_estado (
+    id INTEGER PRIMARY KEY,
+    max_id_medicion INTEGER NOT NULL,
+    actualizado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,9 @@
+-- Equivalente SQLite de migraciones/sqlserver/003_guid_envio.sql.
+-- SQLite no tiene ADD COLUMN IF NOT EXISTS: la columna guid_envio la agrega
+-- data_access_sqlite.crear_esquema, que migrar.py ejecuta antes de las migraciones.
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_visitas_guid_envio
+    ON higiene_Visitas_prod (guid_envio) WHERE guid_envio IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mediciones_guid_envio
+    ON higiene_mediciones_prod (guid_envio) WHERE guid_envio IS NOT NULL;
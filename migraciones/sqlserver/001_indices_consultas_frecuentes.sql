@@ -0,0 +1,35 @@
+-- Índices para las consultas frecuentes de la aplicación y de la exportación masiva.
+-- Cada índice se crea solo si no existe, por lo que el script se puede reejecutar.
+
+-- Última visita de un CUV (data_access.get_ultima_visita / get_visita) y SELECT DISTINCT cuv_visita.
+-- Incluye las columnas del informe para que la consulta TOP 1 no tenga que leer la tabla base.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_visitas_cuv_fecha' AND object_id = OBJECT_ID('higiene_Visitas_prod'))
+    CREATE NONCLUSTERED INDEX ix_visitas_cuv_fecha
+    ON higiene_Visitas_prod (cuv_visita, fecha_visita DESC, hora_visita DESC)
+    INCLUDE (id_visita, temperatura_dia, motivo_evaluacion, nombre_personal_visita, cargo_personal_visita,
+             consultor_ist, consultor_cargo, consultor_zonal, equipo_temp, equipo_vel_air,
+             patron_tbs, ver_tbs_ini, ver_tbs_fin, patron_tbh, ver_tbh_ini, ver_tbh_fin,
+             patron_tg, ver_tg_ini, ver_tg_fin);
+GO
+
+-- Mediciones de una visita (data_access.get_mediciones_informe), cubriendo las columnas del informe.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_mediciones_visita' AND object_id = OBJECT_ID('higiene_mediciones_prod'))
+    CREATE NONCLUSTERED INDEX ix_mediciones_visita
+    ON higiene_mediciones_prod (visita_id)
+    INCLUDE (id_medicion, nombre_area, sector_especifico, puesto_trabajo, t_bul_seco, t_globo, hum_rel, vel_air,
+             ppd, pmv, resultado_medicion, met, clo, caract_constructivas, ingreso_salida_aire);
+GO
+
+-- Resolución de códigos de equipo (data_access.get_mapa_equipos).
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_equipos_dicc' AND object_id = OBJECT_ID('higiene_Equipos_Medicion'))
+    CREATE NONCLUSTERED INDEX ix_equipos_dicc
+    ON higiene_Equipos_Medicion (equipo_dicc)
+    INCLUDE (id_equipo)
+    WHERE equipo_dicc IS NOT NULL;
+GO
+
+-- get_all_cuvs_with_visits consulta higiene_Visitas; solo se indexa si es una tabla (no una vista).
+IF OBJECT_ID('higiene_Visitas', 'U') IS NOT NULL
+   AND NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_visitas_hist_cuv' AND object_id = OBJECT_ID('higiene_Visitas'))
+    CREATE NONCLUSTERED INDEX ix_visitas_hist_cuv ON higiene_Visitas (cuv_visita);
+GO
@@ -0,0 +1,45 @@
+-- Resumen materializado por visita y área para la analítica de temporada (analitica.py).
+-- Lo mantiene analitica.refrescar_*: incremental después de cada inserción de mediciones y
+-- completo con `python analitica.py --completo` (por ejemplo, después de Recalculoppdpmv.py).
+
+IF OBJECT_ID('resumen_areas_visita', 'U') IS NULL
+    CREATE TABLE resumen_areas_visita (
+        id_visita INT NOT NULL,
+        area NVARCHAR(200) NOT NULL,
+        cuv NVARCHAR(50),
+        nombre_ct NVARCHAR(300),
+        region_ct NVARCHAR(100),
+        comuna_ct NVARCHAR(100),
+        fecha_visita DATE,
+        consultor_ist NVARCHAR(200),
+        consultor_zonal NVARCHAR(200),
+        n_mediciones INT NOT NULL,
+        t_bul_seco_prom FLOAT,
+        t_globo_prom FLOAT,
+        hum_rel_prom FLOAT,
+        vel_air_prom FLOAT,
+        pmv_prom FLOAT,
+        pmv_min FLOAT,
+        pmv_max FLOAT,
+        ppd_prom FLOAT,
+        mediciones_cumplen INT NOT NULL,
+        cumple INT NOT NULL,
+        max_id_medicion INT NOT NULL,
+        CONSTRAINT pk_resumen_areas_visita PRIMARY KEY (id_visita, area)
+    );
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_resumen_fecha' AND object_id = OBJECT_ID('resumen_areas_visita'))
+    CREATE NONCLUSTERED INDEX ix_resumen_fecha
+    ON resumen_areas_visita (fecha_visita)
+    INCLUDE (cuv, region_ct, comuna_ct, consultor_zonal, area, pmv_prom, cumple);
+GO
+
+-- Marca de agua del refresco incremental: mayor id_medicion ya resumido.
+IF OBJECT_ID('resumen_areas_estado', 'U') IS NULL
+    CREATE TABLE resumen_areas_estado (
+        id INT PRIMARY KEY,
+        max_id_medicion INT NOT NULL,
+        actualizado DATETIME2 NOT NULL DEFAULT SYSDATETIME()
+    );
+GO
@@ -0,0 +1,23 @@
+-- Identificador de envío generado por el cliente (almacen_local) para visitas y mediciones.
+-- Un reintento del sincronizador con el mismo guid_envio no duplica la fila: insertar_visita e
+-- insertar_mediciones_batch devuelven el id ya asignado.
+
+IF COL_LENGTH('higiene_Visitas_prod', 'guid_envio') IS NULL
+    ALTER TABLE higiene_Visitas_prod ADD guid_envio UNIQUEIDENTIFIER NULL;
+GO
+
+IF COL_LENGTH('higiene_mediciones_prod', 'guid_envio') IS NULL
+    ALTER TABLE higiene_mediciones_prod ADD guid_envio UNIQUEIDENTIFIER NULL;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ux_visitas_guid_envio' AND object_id = OBJECT_ID('higiene_Visitas_prod'))
+    CREATE UNIQUE NONCLUSTERED INDEX ux_visitas_guid_envio
+    ON higiene_Visitas_prod (guid_envio)
+    WHERE guid_envio IS NOT NULL;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ux_mediciones_guid_envio' AND object_id = OBJECT_ID('higiene_mediciones_prod'))
+    CREATE UNIQUE NONCLUSTERED INDEX ux_mediciones_guid_envio
+    ON higiene_mediciones_prod (guid_envio)
+    WHERE guid_envio IS NOT NULL;
+GO
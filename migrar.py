@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Migraciones versionadas de la base de datos y verificación de planes de consulta.
+
+Los scripts están en migraciones/<motor>/NNN_descripcion.sql y se aplican en orden de versión;
+las versiones aplicadas se registran en la tabla schema_migraciones, por lo que volver a
+ejecutar este módulo solo aplica las pendientes.
+
+    python migrar.py                          # aplica las migraciones pendientes en SQL Server
+    python migrar.py --verificar              # además comprueba que las consultas usan los índices
+    python migrar.py --motor sqlite --verificar   # lo mismo contra la base local (data_access_sqlite)
+
+La verificación obtiene el plan de cada consulta frecuente (SHOWPLAN_XML en SQL Server,
+EXPLAIN QUERY PLAN en SQLite) y falla si no usa el índice esperado.
+"""
+import os
+import re
+import sys
+import logging
+import argparse
+
+DIR_MIGRACIONES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migraciones")
+MOTORES = ("sqlserver", "sqlite")
+
+_TABLA_MIGRACIONES = {
+    "sqlserver": """
+        IF OBJECT_ID('schema_migraciones', 'U') IS NULL
+            CREATE TABLE schema_migraciones (
+                version INT PRIMARY KEY,
+                nombre NVARCHAR(200) NOT NULL,
+                aplicada DATETIME2 NOT NULL DEFAULT SYSDATETIME()
+            )
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS schema_migraciones (
+            version INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            aplicada TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+
+# Consultas frecuentes (con valores de ejemplo) y el índice que deben usar ('indice' puede ser
+# un diccionario por motor). 'cubriente' indica que la consulta no debe volver a la tabla base (sin Key Lookup en SQL Server,
+# COVERING INDEX en SQLite). 'solo_si_tabla' omite la verificación en el motor cuando el objeto
+# indicado no es una tabla (por ejemplo, una vista), porque la migración no crea el índice.
+CONSULTAS_PLAN = [
+    {
+        "nombre": "ultima_visita",
+        "sqlserver": "SELECT TOP 1 id_visita, fecha_visita, hora_visita, consultor_ist, equipo_temp, equipo_vel_air "
+                     "FROM higiene_Visitas_prod WHERE cuv_visita = '0' ORDER BY fecha_visita DESC, hora_visita DESC",
+        "sqlite": "SELECT id_visita, fecha_visita, hora_visita, consultor_ist, equipo_temp, equipo_vel_air "
+                  "FROM higiene_Visitas_prod WHERE cuv_visita = '0' ORDER BY fecha_visita DESC, hora_visita DESC LIMIT 1",
+        "indice": "ix_visitas_cuv_fecha",
+        "cubriente": {"sqlserver": True, "sqlite": False},
+    },
+    {
+        "nombre": "mediciones_visita",
+        "sqlserver": "SELECT id_medicion, nombre_area, t_bul_seco, t_globo, hum_rel, vel_air, ppd, pmv, met, clo "
+                     "FROM higiene_mediciones_prod WHERE visita_id = 0",
+        "sqlite": "SELECT id_medicion, nombre_area, t_bul_seco, t_globo, hum_rel, vel_air, ppd, pmv, met, clo "
+                  "FROM higiene_mediciones_prod WHERE visita_id = 0",
+        "indice": "ix_mediciones_visita",
+        "cubriente": {"sqlserver": True, "sqlite": False},
+    },
+    {
+        "nombre": "mapa_equipos",
+        "sqlserver": "SELECT equipo_dicc, id_equipo FROM higiene_Equipos_Medicion WHERE equipo_dicc IS NOT NULL",
+        "sqlite": "SELECT equipo_dicc, id_equipo FROM higiene_Equipos_Medicion WHERE equipo_dicc IS NOT NULL",
+        "indice": "ix_equipos_dicc",
+        "cubriente": {"sqlserver": True, "sqlite": True},
+    },
+    {
+        # Misma consulta que data_access.get_all_cuvs_with_visits. En SQL Server ix_visitas_hist_cuv solo
+        # existe si higiene_Visitas es una tabla; en SQLite es una vista sobre higiene_Visitas_prod.
+        "nombre": "cuvs_con_visitas",
+        "sqlserver": "SELECT DISTINCT cuv_visita FROM higiene_Visitas",
+        "sqlite": "SELECT DISTINCT cuv_visita FROM higiene_Visitas",
+        "indice": {"sqlserver": "ix_visitas_hist_cuv", "sqlite": "ix_visitas_cuv_fecha"},
+        "cubriente": {"sqlserver": True, "sqlite": True},
+        "solo_si_tabla": {"sqlserver": "higiene_Visitas"},
+    },
+]
+
+
+def _conexion(motor: str):
+    if motor == "sqlite":
+        import data_access_sqlite
+        connection = data_access_sqlite.get_db_connection()
+        data_access_sqlite.crear_esquema(connection)
+        return connection
+    from data_access import get_db_connection
+    return get_db_connection()
+
+
+def migraciones_disponibles(motor: str) -> list:
+    """Lista ordenada de (version, nombre, ruta) de los scripts del motor."""
+    directorio = os.path.join(DIR_MIGRACIONES, motor)
+    migraciones = []
+    for archivo in os.listdir(directorio):
+        coincidencia = re.match(r"^(\d+)_(.+)\.sql$", archivo)
+        if coincidencia:
+            migraciones.append((int(coincidencia.group(1)), coincidencia.group(2), os.path.join(directorio, archivo)))
+    return sorted(migraciones)
+
+
+def _lotes_sqlserver(script: str) -> list:
+    """Separa un script de SQL Server en lotes por las líneas 'GO'."""
+    lotes = re.split(r"^\s*GO\s*$", script, flags=re.MULTILINE | re.IGNORECASE)
+    return [lote.strip() for lote in lotes if lote.strip()]
+
+
+def aplicar_migraciones(motor: str = "sqlserver", connection=None) -> list:
+    """Aplica las migraciones pendientes del motor y retorna las versiones aplicadas."""
+    propia = connection is None
+    connection = connection or _conexion(motor)
+    cursor = connection.cursor()
+    aplicadas = []
+    try:
+        cursor.execute(_TABLA_MIGRACIONES[motor])
+        connection.commit()
+        cursor.execute("SELECT version FROM schema_migraciones")
+        hechas = {fila[0] for fila in cursor.fetchall()}
+
+        for version, nombre, ruta in migraciones_disponibles(motor):
+            if version in hechas:
+                continue
+            with open(ruta, encoding="utf-8") as f:
+                script = f.read()
+            logging.info(f"Aplicando migración {version:03d} ({nombre}) en {motor}...")
+            if motor == "sqlite":
+                connection.executescript(script)
+            else:
+                for lote in _lotes_sqlserver(script):
+                    cursor.execute(lote)
+            cursor.execute("INSERT INTO schema_migraciones (version, nombre) VALUES (?, ?)", (version, nombre))
+            connection.commit()
+            aplicadas.append(version)
+    except Exception as e:
+        logging.error(f"Error al aplicar migraciones en {motor}: {e}")
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        if propia:
+            connection.close()
+
+    if aplicadas:
+        logging.info(f"Migraciones aplicadas: {aplicadas}")
+    else:
+        logging.info("No hay migraciones pendientes.")
+    return aplicadas
+
+
+def _plan(connection, motor: str, query: str) -> str:
+    cursor = connection.cursor()
+    try:
+        if motor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {query}")
+            return "\n".join(fila[-1] for fila in cursor.fetchall())
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(query)
+            return cursor.fetchone()[0]
+        finally:
+            cursor.execute("SET SHOWPLAN_XML OFF")
+    finally:
+        cursor.close()
+
+
+def _es_tabla(connection, motor: str, nombre: str) -> bool:
+    cursor = connection.cursor()
+    try:
+        if motor == "sqlite":
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nombre,))
+        else:
+            cursor.execute("SELECT 1 WHERE OBJECT_ID(?, 'U') IS NOT NULL", (nombre,))
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+
+
+def _usa_indice(plan: str, motor: str, indice: str, cubriente: bool) -> bool:
+    if motor == "sqlite":
+        if cubriente:
+            return f"USING COVERING INDEX {indice}" in plan
+        return re.search(rf"USING (COVERING )?INDEX {indice}\b", plan) is not None
+    # SHOWPLAN_XML: el índice aparece como Index="[ix_...]"; un Key/RID Lookup indica que no cubre
+    if f'Index="[{indice}]"' not in plan:
+        return False
+    return not (cubriente and 'Lookup="1"' in plan)
+
+
+def verificar_planes(motor: str = "sqlserver", connection=None) -> list:
+    """
+    Obtiene el plan de cada consulta de CONSULTAS_PLAN y comprueba que usa su índice.
+    Retorna una lista de diccionarios {nombre, indice, ok, plan}.
+    """
+    propia = connection is None
+    connection = connection or _conexion(motor)
+    resultados = []
+    try:
+        for consulta in CONSULTAS_PLAN:
+            indice = consulta["indice"]
+            if isinstance(indice, dict):
+                indice = indice[motor]
+            tabla = consulta.get("solo_si_tabla", {}).get(motor)
+            if tabla and not _es_tabla(connection, motor, tabla):
+                logging.info(f"[OMITIDA] {consulta['nombre']}: {tabla} no es una tabla, no tiene {indice}")
+                resultados.append({"nombre": consulta["nombre"], "indice": indice, "ok": True, "plan": None})
+                continue
+            plan = _plan(connection, motor, consulta[motor])
+            ok = _usa_indice(plan, motor, indice, consulta["cubriente"][motor])
+            resultados.append({"nombre": consulta["nombre"], "indice": indice, "ok": ok, "plan": plan})
+            if ok:
+                logging.info(f"[OK] {consulta['nombre']} usa {indice}")
+            else:
+                logging.error(f"[FALLA] {consulta['nombre']} no usa {indice}:\n{plan}")
+    finally:
+        if propia:
+            connection.close()
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones versionadas y verificación de planes de consulta.")
+    parser.add_argument("--motor", choices=MOTORES, default="sqlserver")
+    parser.add_argument("--verificar", action="store_true", help="Comprobar los planes después de migrar")
+    parser.add_argument("--solo-verificar", action="store_true", help="Comprobar los planes sin aplicar migraciones")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.solo_verificar:
+        aplicar_migraciones(args.motor)
+    if args.verificar or args.solo_verificar:
+        resultados = verificar_planes(args.motor)
+        return 0 if all(r["ok"] for r in resultados) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
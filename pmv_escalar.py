@@ -0,0 +1,137 @@
+"""
+Cálculo escalar de PMV/PPD (ISO 7730) para los ciclos del optimizador.
+
+calcular_ajuste_optimo (confortista.py, mapa10.py) y las funciones que resuelve brentq llaman a
+pythermalcomfort.pmv_ppd_iso con escalares miles de veces; cada llamada convierte sus entradas a
+arreglos, valida el modelo, calcula por separado el PPD y construye un objeto de resultado.
+Este módulo compila con numba una versión sin validaciones que devuelve PMV y PPD de una sola
+evaluación, con las mismas fórmulas que pmv_ppd_iso (limit_inputs=False, unidades SI, wme=0).
+En pythermalcomfort 2005 y 2025 usan el mismo cálculo, así que sirve para ambos modelos.
+
+Uso:
+    import pmv_escalar
+    pmv, ppd = pmv_escalar.pmv_ppd(tdb, tr, vr, rh, met, clo)   # redondeado como pmv_ppd_iso
+    pmv = pmv_escalar.pmv(tdb, tr, vr, rh, met, clo)
+
+Verificación contra pmv_ppd_iso con entradas aleatorias:
+    python pmv_escalar.py --casos 200000
+"""
+import math
+import argparse
+
+import calentamiento  # noqa: F401  (fija NUMBA_CACHE_DIR antes de importar numba)
+import numpy as np
+from numba import njit
+
+# W/m2 por met (pythermalcomfort.utilities.met_to_w_m2)
+MET_A_W_M2 = 58.15
+
+
+@njit(cache=True)
+def _pmv_ppd(tdb, tr, vr, rh, met, clo, redondear):
+    pa = rh * 10 * math.exp(16.6536 - 4030.183 / (tdb + 235))
+
+    icl = 0.155 * clo
+    m = met * MET_A_W_M2
+    mw = m
+    f_cl = 1 + 1.29 * icl if icl <= 0.078 else 1.05 + 0.645 * icl
+
+    hcf = 12.1 * math.sqrt(vr)
+    hc = hcf
+    taa = tdb + 273
+    tra = tr + 273
+    t_cla = taa + (35.5 - tdb) / (3.5 * (6.45 * icl + 0.1))
+
+    p1 = icl * f_cl
+    p2 = p1 * 3.96
+    p3 = p1 * 100
+    p4 = p1 * taa
+    p5 = (308.7 - 0.028 * mw) + (p2 * (tra / 100.0) ** 4)
+    xn = t_cla / 100
+    xf = t_cla / 50
+
+    n = 0
+    while abs(xn - xf) > 0.00015:
+        xf = (xf + xn) / 2
+        hcn = 2.38 * abs(100.0 * xf - taa) ** 0.25
+        hc = max(hcn, hcf)
+        xn = (p5 + p4 * hc - p2 * xf ** 4) / (100 + p3 * hc)
+        n += 1
+        if n > 150:
+            raise StopIteration("Max iterations exceeded")
+
+    tcl = 100 * xn - 273
+
+    hl1 = 3.05 * 0.001 * (5733 - (6.99 * mw) - pa)
+    hl2 = 0.42 * (mw - MET_A_W_M2) if mw > MET_A_W_M2 else 0.0
+    hl3 = 1.7 * 0.00001 * m * (5867 - pa)
+    hl4 = 0.0014 * m * (34 - tdb)
+    hl5 = 3.96 * f_cl * (xn ** 4 - (tra / 100.0) ** 4)
+    hl6 = f_cl * hc * (tcl - tdb)
+
+    ts = 0.303 * math.exp(-0.036 * m) + 0.028
+    pmv = ts * (mw - hl1 - hl2 - hl3 - hl4 - hl5 - hl6)
+    ppd = 100.0 - 95.0 * math.exp(-0.03353 * pmv ** 4.0 - 0.2179 * pmv ** 2.0)
+
+    if redondear:
+        # Mismo redondeo que np.round (round_output=True): PMV a 2 decimales, PPD a 1
+        pmv = np.rint(pmv * 100.0) / 100.0
+        ppd = np.rint(ppd * 10.0) / 10.0
+    return pmv, ppd
+
+
+def pmv_ppd(tdb, tr, vr, rh, met, clo, redondear: bool = True):
+    """
+    (pmv, ppd) para un punto, equivalente a pmv_ppd_iso(..., limit_inputs=False) con
+    round_output=redondear. No valida entradas: un dato faltante (NaN) da NaN.
+    """
+    return _pmv_ppd(float(tdb), float(tr), float(vr), float(rh), float(met), float(clo), redondear)
+
+
+def pmv(tdb, tr, vr, rh, met, clo, redondear: bool = True) -> float:
+    """Solo el PMV de pmv_ppd()."""
+    return _pmv_ppd(float(tdb), float(tr), float(vr), float(rh), float(met), float(clo), redondear)[0]
+
+
+def verificar(casos: int = 100000, semilla: int = 0) -> dict:
+    """
+    Compara pmv_ppd() con pmv_ppd_iso sobre 'casos' entradas aleatorias (con y sin redondeo), en
+    rangos más amplios que los de aplicación de la norma para cubrir lo que explora el optimizador.
+    Retorna {"casos", "max_dif_pmv", "max_dif_ppd", "distintos_redondeados"}.
+    """
+    from pythermalcomfort.models import pmv_ppd_iso
+
+    rng = np.random.default_rng(semilla)
+    tdb = rng.uniform(5.0, 40.0, casos)
+    tr = tdb + rng.uniform(-8.0, 12.0, casos)
+    vr = rng.uniform(0.0, 2.0, casos)
+    rh = rng.uniform(5.0, 95.0, casos)
+    met = rng.uniform(0.8, 4.0, casos)
+    clo = rng.uniform(0.0, 2.0, casos)
+
+    sin_redondeo = pmv_ppd_iso(tdb=tdb, tr=tr, vr=vr, rh=rh, met=met, clo=clo, limit_inputs=False,
+                               round_output=False)
+    redondeado = pmv_ppd_iso(tdb=tdb, tr=tr, vr=vr, rh=rh, met=met, clo=clo, limit_inputs=False)
+
+    max_pmv = max_ppd = 0.0
+    distintos = 0
+    for i in range(casos):
+        p, d = pmv_ppd(tdb[i], tr[i], vr[i], rh[i], met[i], clo[i], redondear=False)
+        max_pmv = max(max_pmv, float(abs(p - sin_redondeo.pmv[i])))
+        max_ppd = max(max_ppd, float(abs(d - sin_redondeo.ppd[i])))
+        p, d = pmv_ppd(tdb[i], tr[i], vr[i], rh[i], met[i], clo[i])
+        if p != redondeado.pmv[i] or d != redondeado.ppd[i]:
+            distintos += 1
+    return {"casos": casos, "max_dif_pmv": max_pmv, "max_dif_ppd": max_ppd, "distintos_redondeados": distintos}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica pmv_escalar contra pythermalcomfort.pmv_ppd_iso.")
+    parser.add_argument("--casos", type=int, default=100000)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+    resultado = verificar(args.casos, args.semilla)
+    print(resultado)
+    # Misma aritmética que pmv_ppd_iso: se admite solo la diferencia de redondeo de punto flotante
+    ok = resultado["max_dif_pmv"] < 1e-9 and resultado["max_dif_ppd"] < 1e-7 and not resultado["distintos_redondeados"]
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,175 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from io import BytesIO
+
+import pandas as pd
+
+import doc_utils
+import incertidumbre
+from doc_utils import generar_informe_en_word
+
+# Cache en disco de informes generados, direccionada por contenido.
+REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', os.path.join('.cache', 'informes'))
+REPORT_CACHE_MAX_MB = int(os.getenv('REPORT_CACHE_MAX_MB', '500'))
+
+# Subir este número cuando cambie la plantilla del informe sin cambiar doc_utils.py
+# (por ejemplo, textos o imágenes fijas).
+REPORT_TEMPLATE_VERSION = "1"
+
+# Recursos que se incrustan en el informe; si cambian, los informes cacheados quedan obsoletos.
+ASSET_PATHS = ["IST.jpg", "imagenes-firma", "imagenes_pdf"]
+ASSET_MANIFEST_TTL = 60
+
+# Módulos cuyo código cambia el contenido del informe (además de doc_utils.py)
+MODULOS_INFORME = ["doc_utils.py", "incertidumbre.py", "esquema_informe.py", "pmv_escalar.py"]
+
+_manifest = {"hash": None, "calculado": 0.0}
+_cache_lock = threading.Lock()
+
+
+def _hash_dataframe(h, df: pd.DataFrame):
+    """Agrega al hash el contenido, las columnas y los tipos del DataFrame."""
+    if df is None:
+        h.update(b"<none>")
+        return
+    h.update(repr(list(df.columns)).encode())
+    h.update(repr([str(t) for t in df.dtypes]).encode())
+    if not df.empty:
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+
+def _hash_template() -> str:
+    """
+    Versión de la plantilla: número declarado + código de MODULOS_INFORME + parámetros del análisis
+    de incertidumbre (INCERTIDUMBRE_*, EXACTITUD_*), que cambian los resultados del informe.
+    """
+    h = hashlib.sha256(REPORT_TEMPLATE_VERSION.encode())
+    directorio = os.path.dirname(os.path.abspath(doc_utils.__file__))
+    for modulo in MODULOS_INFORME:
+        with open(os.path.join(directorio, modulo), "rb") as f:
+            h.update(f.read())
+    h.update(repr((incertidumbre.INCERTIDUMBRE_MUESTRAS, incertidumbre.INCERTIDUMBRE_CONFIANZA,
+                   incertidumbre.INCERTIDUMBRE_SEMILLA, sorted(incertidumbre.EXACTITUD.items()))).encode())
+    return h.hexdigest()
+
+
+def _hash_assets() -> str:
+    """
+    Manifiesto de recursos (ruta, tamaño, fecha de modificación) de logos, firmas
+    e imágenes de certificados. Se recalcula como máximo cada ASSET_MANIFEST_TTL segundos.
+    """
+    ahora = time.monotonic()
+    if _manifest["hash"] is not None and ahora - _manifest["calculado"] < ASSET_MANIFEST_TTL:
+        return _manifest["hash"]
+
+    h = hashlib.sha256()
+    for base in ASSET_PATHS:
+        if os.path.isfile(base):
+            archivos = [base]
+        else:
+            archivos = [os.path.join(raiz, f) for raiz, _, fs in os.walk(base) for f in fs]
+        for ruta in sorted(archivos):
+            info = os.stat(ruta)
+            h.update(f"{ruta}|{info.st_size}|{info.st_mtime_ns}\n".encode())
+
+    _manifest["hash"] = h.hexdigest()
+    _manifest["calculado"] = ahora
+    return _manifest["hash"]
+
+
+def clave_informe(df_centros, df_visitas, df_mediciones, df_equipos) -> str:
+    """Clave de cache: hash de los DataFrames de entrada, la plantilla y los recursos."""
+    h = hashlib.sha256()
+    for df in (df_centros, df_visitas, df_mediciones, df_equipos):
+        _hash_dataframe(h, df)
+    h.update(_hash_template().encode())
+    h.update(_hash_assets().encode())
+    return h.hexdigest()
+
+
+def _ruta(clave: str) -> str:
+    return os.path.join(REPORT_CACHE_DIR, clave[:2], f"{clave}.docx")
+
+
+def leer_cache(clave: str):
+    """Retorna el informe cacheado como BytesIO, o None si no existe."""
+    ruta = _ruta(clave)
+    try:
+        with open(ruta, "rb") as f:
+            contenido = f.read()
+    except FileNotFoundError:
+        return None
+    # Se actualiza la fecha de modificación para que la expulsión sea LRU
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+    return BytesIO(contenido)
+
+
+def escribir_cache(clave: str, contenido: bytes):
+    """Guarda el informe en la cache de forma atómica y aplica el límite de tamaño."""
+    ruta = _ruta(clave)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)
+    expulsar_cache()
+
+
+def expulsar_cache(max_mb: int = None):
+    """Elimina los informes usados hace más tiempo hasta quedar bajo el límite de tamaño."""
+    max_bytes = (REPORT_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    with _cache_lock:
+        entradas = []
+        total = 0
+        for raiz, _, archivos in os.walk(REPORT_CACHE_DIR):
+            for f in archivos:
+                if not f.endswith(".docx"):
+                    continue
+                ruta = os.path.join(raiz, f)
+                try:
+                    info = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                entradas.append((info.st_mtime, info.st_size, ruta))
+                total += info.st_size
+
+        if total <= max_bytes:
+            return
+
+        for _, tamano, ruta in sorted(entradas):
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+            if total <= max_bytes:
+                break
+        logging.info(f"Cache de informes reducida a {total / 1024 / 1024:.1f} MB.")
+
+
+def generar_informe_cacheado(df_centros, df_visitas, df_mediciones, df_equipos) -> BytesIO:
+    """
+    Igual que generar_informe_en_word, pero retorna el informe desde la cache en disco
+    cuando los datos, la plantilla y los recursos no cambiaron desde la última generación.
+    """
+    # La clave se calcula antes de generar: generar_informe_en_word modifica los DataFrames.
+    clave = clave_informe(df_centros, df_visitas, df_mediciones, df_equipos)
+
+    informe = leer_cache(clave)
+    if informe is not None:
+        logging.info(f"Informe servido desde cache ({clave[:12]}).")
+        return informe
+
+    informe = generar_informe_en_word(df_centros, df_visitas, df_mediciones, df_equipos)
+    try:
+        escribir_cache(clave, informe.getvalue())
+    except OSError as e:
+        logging.warning(f"No se pudo guardar el informe en cache: {e}")
+    informe.seek(0)
+    return informe
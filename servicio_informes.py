@@ -0,0 +1,584 @@
+#!/usr/bin/env python3
+"""
+Servicio local de generación de informes con un pool de procesos ya calentados.
+
+Las aplicaciones de Streamlit envían el pedido por HTTP (TCP o socket Unix) y reciben el .docx,
+sin cargar python-docx ni numba ni competir por CPU con la interfaz. Cada proceso del pool
+compila el cálculo de PMV, carga doc_utils y el catálogo de equipos al iniciar el servicio,
+antes del primer pedido.
+
+    python servicio_informes.py --puerto 8765 --workers 2
+    python servicio_informes.py --socket /tmp/informes.sock --workers 4
+    python servicio_informes.py --sqlite --workers 2        # base local (data_access_sqlite)
+
+Endpoints:
+    POST /informe    {"cuv": "178050"} o {"datos": {"centro": ..., "visitas": ..., "mediciones": ...,
+                     "equipos": ...}} (ver datos_a_json), más "prioridad": "interactiva" | "lote".
+                     Responde el .docx; 404 si el CUV no tiene centro o visita; 503 si la cola está llena.
+    GET  /salud      Estado del pool (503 si no hay procesos listos).
+    GET  /metricas   Pedidos atendidos, en cola y en proceso, rechazos y latencias p50/p95.
+
+Los pedidos "interactiva" (un informe pedido desde la interfaz) se atienden antes que los de
+"lote", y los de lote nunca ocupan más de SERVICIO_MAX_LOTE procesos, de modo que un informe
+individual no espera detrás de una generación masiva.
+
+Las aplicaciones usan el servicio si INFORMES_SERVICIO_URL está definida ("http://127.0.0.1:8765"
+o "unix:/tmp/informes.sock"); si no, o si el servicio no responde, generan el informe localmente:
+    informe = servicio_informes.generar_informe(df_centro, df_visitas, df_mediciones, df_equipos)
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import logging
+import argparse
+import threading
+import http.client
+import socketserver
+from io import BytesIO
+from collections import deque
+from urllib.parse import urlsplit
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import calentamiento
+
+INFORMES_SERVICIO_URL = os.getenv('INFORMES_SERVICIO_URL', '')
+SERVICIO_PUERTO = int(os.getenv('SERVICIO_PUERTO', '8765'))
+SERVICIO_WORKERS = int(os.getenv('SERVICIO_WORKERS', '2'))
+# Pedidos que pueden esperar en cola (además de los que están en proceso) antes de responder 503
+SERVICIO_COLA_MAX = int(os.getenv('SERVICIO_COLA_MAX', '32'))
+# Procesos que pueden ocupar a la vez los pedidos de lote (por defecto, todos menos uno)
+SERVICIO_MAX_LOTE = int(os.getenv('SERVICIO_MAX_LOTE', '0')) or None
+# Segundos máximos de espera de un pedido (cola + generación)
+SERVICIO_TIMEOUT = float(os.getenv('SERVICIO_TIMEOUT', '120'))
+SERVICIO_MAX_BYTES = int(os.getenv('SERVICIO_MAX_BYTES', str(20 * 1024 * 1024)))
+
+PRIORIDADES = ("interactiva", "lote")
+MIME_DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class ServicioInformesError(Exception):
+    """Error al pedir un informe al servicio."""
+
+
+class ServicioNoDisponibleError(ServicioInformesError):
+    """El servicio no responde o su cola está llena; el llamador puede generar el informe localmente."""
+
+
+class SinDatosError(ServicioInformesError):
+    """El CUV no tiene centro de trabajo o visita registrados."""
+
+
+# -----------------------------------------------
+# Serialización de los DataFrames del informe
+# -----------------------------------------------
+
+def _tabla_a_json(df):
+    if df is None:
+        return None
+    return {
+        "columnas": [str(c) for c in df.columns],
+        "filas": df.astype(object).where(df.notna(), None).values.tolist(),
+    }
+
+
+def _tabla_desde_json(tabla):
+    import pandas as pd
+
+    if tabla is None:
+        return None
+    return pd.DataFrame(tabla["filas"], columns=tabla["columnas"])
+
+
+def datos_a_json(df_centro, df_visitas, df_mediciones, df_equipos=None) -> dict:
+    """
+    Paquete de datos del informe para POST /informe. Las fechas y decimales viajan como texto
+    y el servicio vuelve a aplicar los tipos de esquema_informe.
+    Sin 'df_equipos', el servicio usa el catálogo que cargó al iniciar.
+    """
+    return {
+        "centro": _tabla_a_json(df_centro),
+        "visitas": _tabla_a_json(df_visitas),
+        "mediciones": _tabla_a_json(df_mediciones),
+        "equipos": _tabla_a_json(df_equipos),
+    }
+
+
+# -----------------------------------------------
+# Procesos de trabajo
+# -----------------------------------------------
+
+# Catálogo de equipos por proceso de trabajo (se carga una vez en el inicializador)
+_df_equipos = None
+
+
+def _inicializar_worker(usar_sqlite: bool):
+    global _df_equipos
+    if usar_sqlite:
+        import data_access_sqlite
+        data_access_sqlite.usar_como_data_access()
+    calentamiento.calentar_pmv()
+    # doc_utils y python-docx quedan importados antes del primer pedido
+    import report_cache  # noqa: F401
+    from data_access import get_equipos_informe
+    try:
+        _df_equipos = get_equipos_informe()
+    except Exception as e:
+        # Sin catálogo, cada pedido lo consulta (get_datos_informe con df_equipos=None)
+        logging.warning(f"No se pudo cargar el catálogo de equipos en el proceso {os.getpid()}: {e}")
+
+
+def _estado_worker():
+    return os.getpid(), calentamiento.duracion_calentamiento()
+
+
+def _informe_por_cuv(cuv):
+    """Consulta los datos del CUV y genera el informe. Retorna (nombre_archivo, bytes)."""
+    from data_access import get_datos_informe
+    from report_cache import generar_informe_cacheado
+    from generar_informes_cli import nombre_archivo_informe
+
+    df_centro, df_visitas, df_mediciones, df_equipos = get_datos_informe(cuv, _df_equipos)
+    if df_centro.empty or df_visitas.empty:
+        raise SinDatosError(f"Sin información de centro o visita para el CUV {cuv}.")
+    nombre_ct = df_centro.iloc[0].get("nombre_ct", "")
+    informe = generar_informe_cacheado(df_centro, df_visitas, df_mediciones, df_equipos)
+    return nombre_archivo_informe(cuv, nombre_ct), informe.getvalue()
+
+
+def _informe_por_datos(datos):
+    """Genera el informe con los DataFrames recibidos (ver datos_a_json). Retorna (nombre_archivo, bytes)."""
+    from esquema_informe import aplicar_tipos_informe, normalizar_mediciones
+    from report_cache import generar_informe_cacheado
+    from generar_informes_cli import nombre_archivo_informe
+
+    df_centro = _tabla_desde_json(datos.get("centro"))
+    df_visitas = _tabla_desde_json(datos.get("visitas"))
+    if df_centro is None or df_centro.empty or df_visitas is None or df_visitas.empty:
+        raise SinDatosError("Sin información de centro o visita.")
+    df_centro = aplicar_tipos_informe(df_centro)
+    df_visitas = aplicar_tipos_informe(df_visitas)
+    df_mediciones = _tabla_desde_json(datos.get("mediciones"))
+    if df_mediciones is not None:
+        df_mediciones = normalizar_mediciones(df_mediciones)
+    df_equipos = _tabla_desde_json(datos.get("equipos"))
+    df_equipos = _df_equipos if df_equipos is None else aplicar_tipos_informe(df_equipos)
+    centro = df_centro.iloc[0]
+    informe = generar_informe_cacheado(df_centro, df_visitas, df_mediciones, df_equipos)
+    return nombre_archivo_informe(centro.get("cuv", ""), centro.get("nombre_ct", "")), informe.getvalue()
+
+
+# -----------------------------------------------
+# Pool con cola por prioridad
+# -----------------------------------------------
+
+def _percentiles_ms(valores) -> dict:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return {"n": 0, "p50_ms": 0.0, "p95_ms": 0.0}
+    return {
+        "n": len(ordenados),
+        "p50_ms": round(ordenados[int((len(ordenados) - 1) * 0.50)] * 1000, 1),
+        "p95_ms": round(ordenados[int((len(ordenados) - 1) * 0.95)] * 1000, 1),
+    }
+
+
+class ServicioInformes:
+    """
+    Pool de 'workers' procesos de generación. Los pedidos esperan en una cola por prioridad y se
+    entregan al pool solo cuando hay un proceso libre, de modo que la prioridad se respeta.
+    """
+
+    def __init__(self, workers: int = None, cola_max: int = None, max_lote: int = None, usar_sqlite: bool = False):
+        self.workers = max(1, workers or SERVICIO_WORKERS)
+        self.cola_max = SERVICIO_COLA_MAX if cola_max is None else cola_max
+        self.max_lote = max(1, max_lote or SERVICIO_MAX_LOTE or self.workers - 1)
+        self.usar_sqlite = usar_sqlite
+        # Reentrante: un futuro que ya terminó ejecuta su callback (_terminado) dentro de _despachar
+        self._lock = threading.RLock()
+        self._colas = {prioridad: deque() for prioridad in PRIORIDADES}
+        self._en_proceso = {prioridad: 0 for prioridad in PRIORIDADES}
+        self._contadores = {"atendidos": 0, "sin_datos": 0, "errores": 0, "rechazados": 0, "abandonados": 0,
+                            "reinicios_pool": 0}
+        self._latencias = {prioridad: deque(maxlen=1000) for prioridad in PRIORIDADES}
+        self._esperas = {prioridad: deque(maxlen=1000) for prioridad in PRIORIDADES}
+        self._procesos = {}
+        self._executor = None
+        self._iniciado = None
+
+    def iniciar(self):
+        """Crea el pool y espera a que cada proceso termine de calentarse."""
+        inicio = time.perf_counter()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_inicializar_worker,
+                                             initargs=(self.usar_sqlite,))
+        # Un pedido por proceso: ProcessPoolExecutor crea los procesos a medida que recibe tareas
+        for futuro in [self._executor.submit(_estado_worker) for _ in range(self.workers)]:
+            pid, segundos = futuro.result()
+            self._procesos[pid] = segundos
+        self._iniciado = time.time()
+        logging.info(f"Servicio de informes listo: {len(self._procesos)} procesos en "
+                     f"{time.perf_counter() - inicio:.1f} s.")
+
+    def cerrar(self):
+        """Cancela los pedidos en cola y termina los procesos del pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def enviar(self, funcion, argumento, prioridad: str = "interactiva") -> Future:
+        """Encola un pedido; lanza ServicioNoDisponibleError si la cola está llena."""
+        futuro = Future()
+        with self._lock:
+            if sum(len(c) for c in self._colas.values()) >= self.cola_max:
+                self._contadores["rechazados"] += 1
+                raise ServicioNoDisponibleError("La cola del servicio de informes está llena.")
+            self._colas[prioridad].append({"funcion": funcion, "argumento": argumento, "prioridad": prioridad,
+                                           "futuro": futuro, "encolado": time.monotonic()})
+            self._despachar()
+        return futuro
+
+    def abandonar(self, futuro: Future):
+        """
+        El cliente dejó de esperar el pedido (tiempo máximo excedido). Si aún está en cola se quita y
+        no llega a generarse; si ya está en proceso, su resultado se descarta al terminar.
+        """
+        with self._lock:
+            self._contadores["abandonados"] += 1
+            if futuro.cancel():
+                for cola in self._colas.values():
+                    for tarea in cola:
+                        if tarea["futuro"] is futuro:
+                            cola.remove(tarea)
+                            return
+
+    def _siguiente(self):
+        if self._colas["interactiva"]:
+            return self._colas["interactiva"].popleft()
+        if self._colas["lote"] and self._en_proceso["lote"] < self.max_lote:
+            return self._colas["lote"].popleft()
+        return None
+
+    def _despachar(self):
+        # Se llama con self._lock tomado
+        while sum(self._en_proceso.values()) < self.workers:
+            tarea = self._siguiente()
+            if tarea is None:
+                return
+            if not tarea["futuro"].set_running_or_notify_cancel():
+                continue
+            tarea["iniciado"] = time.monotonic()
+            self._esperas[tarea["prioridad"]].append(tarea["iniciado"] - tarea["encolado"])
+            self._en_proceso[tarea["prioridad"]] += 1
+            tarea["pool"] = self._executor
+            try:
+                futuro_pool = self._executor.submit(tarea["funcion"], tarea["argumento"])
+            except BrokenProcessPool as e:
+                self._en_proceso[tarea["prioridad"]] -= 1
+                tarea["futuro"].set_exception(e)
+                self._reiniciar_pool(tarea["pool"])
+                continue
+            futuro_pool.add_done_callback(lambda f, t=tarea: self._terminado(t, f))
+
+    def _reiniciar_pool(self, pool):
+        # Un proceso murió (por ejemplo, sin memoria): se reemplaza el pool completo, una sola vez
+        # aunque fallen varias tareas del mismo pool
+        if pool is not self._executor:
+            return
+        logging.error("Un proceso del servicio de informes terminó inesperadamente; se reinicia el pool.")
+        self._contadores["reinicios_pool"] += 1
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_inicializar_worker,
+                                             initargs=(self.usar_sqlite,))
+
+    def _terminado(self, tarea, futuro_pool):
+        error = futuro_pool.exception()
+        with self._lock:
+            self._en_proceso[tarea["prioridad"]] -= 1
+            self._latencias[tarea["prioridad"]].append(time.monotonic() - tarea["encolado"])
+            if error is None:
+                self._contadores["atendidos"] += 1
+            elif isinstance(error, SinDatosError):
+                self._contadores["sin_datos"] += 1
+            else:
+                self._contadores["errores"] += 1
+            if isinstance(error, BrokenProcessPool):
+                self._reiniciar_pool(tarea["pool"])
+            self._despachar()
+        if error is None:
+            tarea["futuro"].set_result(futuro_pool.result())
+        else:
+            tarea["futuro"].set_exception(error)
+
+    def salud(self):
+        """(listo, detalle). No está listo antes de calentar el pool."""
+        listo = self._iniciado is not None and len(self._procesos) > 0
+        return listo, {
+            "estado": "ok" if listo else "iniciando",
+            "workers": self.workers,
+            "procesos_calentados": len(self._procesos),
+            "calentamiento_pmv_s": {str(pid): s for pid, s in self._procesos.items()},
+            "activo_desde": self._iniciado,
+        }
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                **self._contadores,
+                "en_cola": {p: len(c) for p, c in self._colas.items()},
+                "en_proceso": dict(self._en_proceso),
+                "workers": self.workers,
+                "max_lote": self.max_lote,
+                "cola_max": self.cola_max,
+                "espera_cola": {p: _percentiles_ms(v) for p, v in self._esperas.items()},
+                "latencia": {p: _percentiles_ms(v) for p, v in self._latencias.items()},
+            }
+
+
+# -----------------------------------------------
+# Servidor HTTP
+# -----------------------------------------------
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        # client_address no es una tupla en sockets Unix
+        logging.info("servicio_informes: " + formato % args)
+
+    def _responder(self, codigo: int, cuerpo: bytes, tipo: str, encabezados: dict = None):
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (encabezados or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _json(self, codigo: int, datos: dict, encabezados: dict = None):
+        self._responder(codigo, json.dumps(datos, ensure_ascii=False, default=str).encode(),
+                        "application/json; charset=utf-8", encabezados)
+
+    def do_GET(self):
+        servicio = self.server.servicio
+        if self.path == "/salud":
+            listo, detalle = servicio.salud()
+            self._json(200 if listo else 503, detalle)
+        elif self.path == "/metricas":
+            self._json(200, servicio.metricas())
+        else:
+            self._json(404, {"error": "Ruta no encontrada."})
+
+    def do_POST(self):
+        if self.path != "/informe":
+            self._json(404, {"error": "Ruta no encontrada."})
+            return
+        largo = int(self.headers.get("Content-Length") or 0)
+        if largo > SERVICIO_MAX_BYTES:
+            self._json(413, {"error": "Pedido demasiado grande."})
+            return
+        try:
+            pedido = json.loads(self.rfile.read(largo) or b"{}")
+        except ValueError:
+            self._json(400, {"error": "El cuerpo debe ser JSON."})
+            return
+
+        prioridad = pedido.get("prioridad", "interactiva")
+        if prioridad not in PRIORIDADES:
+            self._json(400, {"error": f"Prioridad inválida; use {' o '.join(PRIORIDADES)}."})
+            return
+        if pedido.get("cuv"):
+            funcion, argumento = _informe_por_cuv, str(pedido["cuv"]).strip()
+        elif pedido.get("datos"):
+            funcion, argumento = _informe_por_datos, pedido["datos"]
+        else:
+            self._json(400, {"error": "Indique 'cuv' o 'datos'."})
+            return
+
+        try:
+            futuro = self.server.servicio.enviar(funcion, argumento, prioridad)
+        except ServicioNoDisponibleError as e:
+            self._json(503, {"error": str(e)}, {"Retry-After": "5"})
+            return
+        try:
+            nombre, contenido = futuro.result(timeout=SERVICIO_TIMEOUT)
+        except TimeoutError:
+            self.server.servicio.abandonar(futuro)
+            self._json(504, {"error": f"El informe no estuvo listo en {SERVICIO_TIMEOUT:.0f} s."})
+            return
+        except SinDatosError as e:
+            self._json(404, {"error": str(e)})
+            return
+        except Exception as e:
+            logging.error(f"Error generando informe en el servicio: {e}")
+            self._json(500, {"error": str(e)})
+            return
+        self._responder(200, contenido, MIME_DOCX, {"Content-Disposition": f'attachment; filename="{nombre}"'})
+
+
+class _ServidorHTTP(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def crear_servidor(servicio: ServicioInformes, host: str = "127.0.0.1", puerto: int = None, ruta_socket: str = None):
+    """Servidor HTTP (TCP o, si se indica 'ruta_socket', socket Unix) que atiende con 'servicio'."""
+    if ruta_socket:
+        if os.path.exists(ruta_socket):
+            os.remove(ruta_socket)
+        servidor = _ServidorUnix(ruta_socket, _Manejador)
+    else:
+        servidor = _ServidorHTTP((host, SERVICIO_PUERTO if puerto is None else puerto), _Manejador)
+    servidor.servicio = servicio
+    return servidor
+
+
+# -----------------------------------------------
+# Cliente
+# -----------------------------------------------
+
+class _ConexionUnix(http.client.HTTPConnection):
+    def __init__(self, ruta_socket: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.ruta_socket = ruta_socket
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.ruta_socket)
+
+
+def _conexion(url: str, timeout: float) -> http.client.HTTPConnection:
+    if url.startswith("unix:"):
+        # "unix:/tmp/informes.sock" o "unix:///tmp/informes.sock"
+        return _ConexionUnix("/" + url[len("unix:"):].lstrip("/"), timeout)
+    partes = urlsplit(url)
+    return http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=timeout)
+
+
+def servicio_configurado() -> bool:
+    """Indica si las aplicaciones deben pedir los informes al servicio (INFORMES_SERVICIO_URL)."""
+    return bool(INFORMES_SERVICIO_URL)
+
+
+def _pedir(metodo: str, ruta: str, cuerpo: dict = None, url: str = None, timeout: float = None):
+    url = url or INFORMES_SERVICIO_URL
+    conexion = _conexion(url, timeout or SERVICIO_TIMEOUT + 10)
+    try:
+        datos = json.dumps(cuerpo, ensure_ascii=False, default=str).encode() if cuerpo is not None else None
+        conexion.request(metodo, ruta, body=datos, headers={"Content-Type": "application/json"} if datos else {})
+        respuesta = conexion.getresponse()
+        return respuesta.status, respuesta.read()
+    except OSError as e:
+        raise ServicioNoDisponibleError(f"No se pudo conectar con el servicio de informes ({url}): {e}")
+    finally:
+        conexion.close()
+
+
+def _mensaje_error(contenido: bytes) -> str:
+    try:
+        return json.loads(contenido).get("error", "")
+    except ValueError:
+        return contenido.decode(errors="replace")
+
+
+def solicitar_informe(cuv=None, datos: dict = None, prioridad: str = "interactiva", url: str = None,
+                      timeout: float = None) -> BytesIO:
+    """
+    Pide al servicio el informe de un CUV o de un paquete de datos (datos_a_json) y retorna el .docx.
+    Lanza SinDatosError (404), ServicioNoDisponibleError (sin conexión o cola llena) o ServicioInformesError.
+    """
+    pedido = {"prioridad": prioridad}
+    if cuv is not None:
+        pedido["cuv"] = str(cuv).strip()
+    else:
+        pedido["datos"] = datos
+    estado, contenido = _pedir("POST", "/informe", pedido, url, timeout)
+    if estado == 200:
+        return BytesIO(contenido)
+    if estado == 404:
+        raise SinDatosError(_mensaje_error(contenido))
+    if estado == 503:
+        raise ServicioNoDisponibleError(_mensaje_error(contenido))
+    raise ServicioInformesError(f"El servicio respondió {estado}: {_mensaje_error(contenido)}")
+
+
+def consultar_salud(url: str = None) -> dict:
+    """Estado del servicio (GET /salud); incluye "listo": False si no responde."""
+    try:
+        estado, contenido = _pedir("GET", "/salud", url=url, timeout=5)
+    except ServicioNoDisponibleError as e:
+        return {"listo": False, "error": str(e)}
+    return {"listo": estado == 200, **json.loads(contenido)}
+
+
+def consultar_metricas(url: str = None) -> dict:
+    """Métricas del servicio (GET /metricas)."""
+    _, contenido = _pedir("GET", "/metricas", url=url, timeout=5)
+    return json.loads(contenido)
+
+
+def generar_informe(df_centro, df_visitas, df_mediciones, df_equipos=None, prioridad: str = "interactiva") -> BytesIO:
+    """
+    Genera el informe en el servicio si está configurado; si no lo está, no responde o responde con
+    error (tiempo máximo excedido, error interno, pedido demasiado grande), lo genera en este
+    proceso (report_cache.generar_informe_cacheado). SinDatosError se propaga al llamador.
+    """
+    if servicio_configurado():
+        try:
+            return solicitar_informe(datos=datos_a_json(df_centro, df_visitas, df_mediciones, df_equipos),
+                                     prioridad=prioridad)
+        except SinDatosError:
+            raise
+        except ServicioInformesError as e:
+            logging.warning(f"{e} Se genera el informe localmente.")
+
+    from report_cache import generar_informe_cacheado
+    return generar_informe_cacheado(df_centro, df_visitas, df_mediciones, df_equipos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio local de generación de informes de confort térmico.")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección en que escucha (TCP)")
+    parser.add_argument("--puerto", type=int, default=SERVICIO_PUERTO, help="Puerto TCP")
+    parser.add_argument("--socket", help="Escuchar en este socket Unix en vez de TCP")
+    parser.add_argument("--workers", type=int, default=SERVICIO_WORKERS, help="Procesos de generación")
+    parser.add_argument("--cola-max", type=int, default=SERVICIO_COLA_MAX, help="Pedidos en espera antes de responder 503")
+    parser.add_argument("--max-lote", type=int, default=SERVICIO_MAX_LOTE,
+                        help="Procesos que pueden ocupar los pedidos de lote (por defecto, todos menos uno)")
+    parser.add_argument("--sqlite", action="store_true",
+                        help="Usar la base SQLite local (DB_SQLITE_PATH) en vez de SQL Server")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.sqlite:
+        import data_access_sqlite
+        data_access_sqlite.usar_como_data_access()
+
+    def terminar(*_):
+        # SIGTERM (systemd, docker stop) pasa por el mismo cierre que Ctrl+C, para no dejar procesos huérfanos
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminar)
+
+    servicio = ServicioInformes(args.workers, args.cola_max, args.max_lote, usar_sqlite=args.sqlite)
+    servicio.iniciar()
+    servidor = crear_servidor(servicio, args.host, args.puerto, args.socket)
+    logging.info(f"Servicio de informes escuchando en {args.socket or f'{args.host}:{args.puerto}'}.")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servicio.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
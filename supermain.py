@@ -2,31 +2,27 @@ import streamlit as st
 import zipfile
 import io
 
-from data_access import (
-    get_centro,
-    get_visita,
-    get_mediciones,
-    get_equipos,
-    get_all_cuvs_with_visits  # Nueva función importada
-)
-from doc_utils import generar_informe_en_word
+import calentamiento
+import datos_compartidos
+
+from data_access import get_datos_informe
+from data_cache import get_equipos_cached, get_all_cuvs_cached, get_datos_cuv_cached
+import servicio_informes
+
+datos_compartidos.activar_copy_on_write()
 
 
 def main():
+    if not servicio_informes.servicio_configurado():
+        # Sin servicio de informes, el informe se genera en este proceso
+        calentamiento.calentar_pmv()
     st.header("Informes Confort Térmico")
     st.write("Versión 4.0 (Generación Automática)")
     st.write("Bienvenido Rodrigo... (usuario)")
 
 
-    # Inicializamos en session_state las variables que usaremos para almacenar la info consultada
-    if "df_centro" not in st.session_state:
-        st.session_state["df_centro"] = None
-    if "df_visitas" not in st.session_state:
-        st.session_state["df_visitas"] = None
-    if "df_mediciones" not in st.session_state:
-        st.session_state["df_mediciones"] = None
-    if "df_equipos" not in st.session_state:
-        st.session_state["df_equipos"] = None
+    # La sesión solo guarda el CUV consultado; los DataFrames viven una vez por proceso
+    # en datos_compartidos y cada rerun recibe una vista de ellos
     if "input_cuv" not in st.session_state:
         st.session_state["input_cuv"] = ""
 
@@ -34,33 +30,17 @@ def main():
     st.subheader("Generar Informe Individual")
     input_cuv = st.text_input("Ingresa el CUV: ej. 178050")
 
-    if st.button("Buscar"):
+    buscar = st.button("Buscar")
+    if buscar:
         # Guardamos el CUV ingresado en session_state
         st.session_state["input_cuv"] = input_cuv.strip()
 
-        # Consulta de la información del centro de trabajo
-        df_centro = get_centro(st.session_state["input_cuv"])
-        # Consulta de las visitas para el CUV (se ordenan para obtener la visita más reciente)
-        df_visitas = get_visita(st.session_state["input_cuv"])
-        # Si existe al menos una visita, se selecciona la más reciente y se consultan las mediciones asociadas
-        if not df_visitas.empty:
-            visita_id = df_visitas.iloc[0].get("id_visita")
-            df_mediciones = get_mediciones(visita_id)
-        else:
-            df_mediciones = pd.DataFrame()
-        # Se obtiene la información completa de equipos de medición
-        df_equipos = get_equipos()
-
-        # Se actualizan los valores en session_state
-        st.session_state["df_centro"] = df_centro
-        st.session_state["df_visitas"] = df_visitas
-        st.session_state["df_mediciones"] = df_mediciones
-        st.session_state["df_equipos"] = df_equipos
-
-    # Mostramos el resumen de la información consultada
-    df_centro = st.session_state["df_centro"]
-    df_visitas = st.session_state["df_visitas"]
-    df_mediciones = st.session_state["df_mediciones"]
+    # Centro, visita más reciente y sus mediciones (solo las columnas que usa el informe).
+    # "Buscar" vuelve a consultar la base de datos; los demás reruns usan los datos compartidos.
+    df_centro = df_visitas = df_mediciones = None
+    if st.session_state["input_cuv"]:
+        df_centro, df_visitas, df_mediciones = get_datos_cuv_cached(st.session_state["input_cuv"], recargar=buscar)
+    df_equipos = get_equipos_cached()
 
     if df_centro is not None and not df_centro.empty:
         st.subheader("Resumen de Información del Centro de Trabajo")
@@ -93,16 +73,22 @@ def main():
 
     # Botón para generar el informe en Word
     if st.button("Generar Informe en Word"):
-        if (st.session_state["df_centro"] is not None and not st.session_state["df_centro"].empty) and \
-           (st.session_state["df_visitas"] is not None and not st.session_state["df_visitas"].empty):
+        if (df_centro is not None and not df_centro.empty) and \
+           (df_visitas is not None and not df_visitas.empty):
             # Se llama a la función generadora pasando los dataframes obtenidos
-            informe_docx = generar_informe_en_word(
-                st.session_state["df_centro"],
-                st.session_state["df_visitas"],
-                st.session_state["df_mediciones"],
-                st.session_state["df_equipos"]
-            )
-            st.session_state["nombre_ct"] = df_centro.get('nombre_ct', '')
+            # (si el servicio falla, servicio_informes lo genera en este proceso)
+            try:
+                informe_docx = servicio_informes.generar_informe(
+                    df_centro,
+                    df_visitas,
+                    df_mediciones,
+                    df_equipos
+                )
+            except Exception as e:
+                st.error(f"Error generando el informe: {str(e)}")
+                return
+            # Solo el nombre (texto), no una columna del DataFrame compartido
+            st.session_state["nombre_ct"] = str(df_centro.iloc[0].get('nombre_ct', ''))
 
 
             st.download_button(
@@ -117,40 +103,33 @@ def main():
     # Nueva sección para generación automática
     st.subheader("Generación Automática de Informes")
     if st.button("Generar Informes para Todos los CUVs"):
-        cuvs = get_all_cuvs_with_visits()
+        cuvs = get_all_cuvs_cached()
         total = len(cuvs)
 
         if total == 0:
             st.warning("No hay CUVs con visitas registradas")
             return
 
+        df_equipos = get_equipos_cached()
+
         zip_buffer = io.BytesIO()
         with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
             progress_bar = st.progress(0)
 
             for i, cuv in enumerate(cuvs):
                 try:
-                    # Obtener datos del centro
-                    df_centro = get_centro(cuv)
-                    if df_centro.empty:
-                        continue
-
-                    # Obtener última visita
-                    df_visitas = get_visita(cuv)
-                    if df_visitas.empty:
+                    # Obtener datos del centro, última visita y mediciones
+                    df_centro, df_visitas, df_mediciones, _ = get_datos_informe(cuv, df_equipos)
+                    if df_centro.empty or df_visitas.empty:
                         continue
 
-                    # Obtener mediciones
-                    visita_id = df_visitas.iloc[0]["id_visita"]
-                    df_mediciones = get_mediciones(visita_id)
-                    df_equipos = get_equipos()
-
                     # Generar informe
-                    doc_bytes = generar_informe_en_word(
+                    doc_bytes = servicio_informes.generar_informe(
                         df_centro,
                         df_visitas,
                         df_mediciones,
-                        df_equipos
+                        df_equipos,
+                        prioridad="lote"
                     )
 
                     centro = df_centro.iloc[0]
@@ -175,6 +154,8 @@ def main():
             mime="application/zip"
         )
 
+    datos_compartidos.mostrar_memoria_sesion()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file